@@ -0,0 +1,122 @@
+import csv
+import io
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from tracing import propagate
+
+REQUIRED_FIELDS = ['name', 'description', 'category', 'offer', 'promoCode', 'url']
+AIRTABLE_CHUNK_SIZE = 10
+AIRTABLE_RATE_PER_SECOND = float(os.environ.get('AIRTABLE_RATE_PER_SECOND', '5'))
+AIRTABLE_CONCURRENCY = int(os.environ.get('AIRTABLE_CONCURRENCY', '3'))
+MERGE_FIELDS = ['Name', 'URL']
+
+
+class RateLimiter:
+    """Не больше rate запросов в секунду на все потоки импорта"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        time.sleep(max(slot - now, 0))
+
+
+def validate_partner(row: Dict[str, Any]) -> Optional[str]:
+    for field in REQUIRED_FIELDS:
+        if not row.get(field):
+            return f'Поле {field} обязательно'
+    return None
+
+
+def airtable_fields(row: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {
+        'Name': row['name'],
+        'Description': row['description'],
+        'Category': row['category'],
+        'Offer': row['offer'],
+        'PromoCode': row['promoCode'],
+        'URL': row['url'],
+    }
+    if row.get('logo'):
+        fields['Logo'] = [{'url': row['logo']}]
+    return fields
+
+
+def parse_rows(body_data: Any) -> Optional[List[Any]]:
+    """Строки импорта из JSON-массива, {'partners': [...]} или {'csv': '...'}; None — одиночный режим"""
+    if isinstance(body_data, list):
+        return body_data
+    if isinstance(body_data.get('partners'), list):
+        return body_data['partners']
+    if isinstance(body_data.get('csv'), str):
+        reader = csv.DictReader(io.StringIO(body_data['csv']))
+        return [{key.strip(): (value or '').strip() for key, value in row.items() if key} for row in reader]
+    return None
+
+
+def _write_chunk(url: str, headers: Dict[str, str], chunk: List[Dict[str, Any]], limiter: RateLimiter) -> List[Dict[str, Any]]:
+    import requests
+
+    from http_client import request
+
+    payload = {
+        'performUpsert': {'fieldsToMergeOn': MERGE_FIELDS},
+        'records': [{'fields': airtable_fields(item['row'])} for item in chunk],
+        'typecast': True,
+    }
+    limiter.wait()
+    try:
+        response = request('airtable', 'PATCH', url, idempotent=True, headers=headers, json=payload)
+    except requests.RequestException as e:
+        return [{'index': item['index'], 'result': 'error', 'error': str(e)} for item in chunk]
+
+    if response.status_code != 200:
+        error = f'Airtable responded {response.status_code}'
+        return [{'index': item['index'], 'result': 'error', 'error': error} for item in chunk]
+
+    data = response.json()
+    created = set(data.get('createdRecords', []))
+    return [
+        {
+            'index': item['index'],
+            'result': 'created' if record['id'] in created else 'updated',
+            'id': record['id'],
+        }
+        for item, record in zip(chunk, data.get('records', []))
+    ]
+
+
+def import_partners(rows: List[Any], url: str, headers: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    Проверка всех строк до записи, затем upsert по Name+URL пачками по 10
+    записей с ограничением частоты и числа параллельных запросов к Airtable
+    """
+    results: List[Dict[str, Any]] = []
+    valid: List[Dict[str, Any]] = []
+
+    for index, row in enumerate(rows):
+        error = validate_partner(row) if isinstance(row, dict) else 'Строка должна быть объектом'
+        if error:
+            results.append({'index': index, 'result': 'invalid', 'error': error})
+        else:
+            valid.append({'index': index, 'row': row})
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    chunks = [valid[i:i + AIRTABLE_CHUNK_SIZE] for i in range(0, len(valid), AIRTABLE_CHUNK_SIZE)]
+    limiter = RateLimiter(AIRTABLE_RATE_PER_SECOND)
+
+    with ThreadPoolExecutor(max_workers=AIRTABLE_CONCURRENCY) as executor:
+        for chunk_results in executor.map(propagate(lambda chunk: _write_chunk(url, headers, chunk, limiter)), chunks):
+            results.extend(chunk_results)
+
+    return sorted(results, key=lambda item: item['index'])
@@ -0,0 +1,129 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tracing import record
+
+CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', '10'))
+MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', '2'))
+MAX_RETRY_SLEEP = float(os.environ.get('HTTP_MAX_RETRY_SLEEP', '5'))
+POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '10'))
+BACKOFF_BASE = 0.25
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_lock = threading.Lock()
+_sessions: Dict[str, requests.Session] = {}
+_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def get_session(host: str) -> requests.Session:
+    """Keep-alive сессия на хост: живёт между тёплыми вызовами контейнера"""
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+        return session
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _observe(upstream: str, elapsed_ms: float, outcome: str) -> None:
+    record('http', elapsed_ms, f'{upstream} {outcome}')
+    with _lock:
+        stats = _stats.setdefault(upstream, {
+            'requests': 0,
+            'retries': 0,
+            'total_ms': 0.0,
+            'outcomes': {},
+            'histogram_ms': {str(bucket): 0 for bucket in LATENCY_BUCKETS_MS} | {'inf': 0},
+        })
+        stats['requests'] += 1
+        stats['total_ms'] += elapsed_ms
+        stats['outcomes'][outcome] = stats['outcomes'].get(outcome, 0) + 1
+        bucket = next((str(b) for b in LATENCY_BUCKETS_MS if elapsed_ms <= b), 'inf')
+        stats['histogram_ms'][bucket] += 1
+
+
+def _count_retry(upstream: str) -> None:
+    with _lock:
+        if upstream in _stats:
+            _stats[upstream]['retries'] += 1
+
+
+def request(upstream: str, method: str, url: str, idempotent: Optional[bool] = None, **kwargs: Any) -> requests.Response:
+    """
+    HTTP-запрос к внешнему сервису с таймаутами и повторами.
+    429 повторяется всегда (запрос не был принят), 5xx и сетевые ошибки —
+    только для идемпотентных запросов. Retry-After учитывается, если
+    ожидание не превышает MAX_RETRY_SLEEP, иначе ответ возвращается сразу.
+    """
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+    session = get_session(urlsplit(url).netloc)
+
+    attempt = 0
+    while True:
+        started = time.monotonic()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            _observe(upstream, (time.monotonic() - started) * 1000, type(e).__name__)
+            if not idempotent or attempt >= MAX_RETRIES:
+                raise
+            delay = BACKOFF_BASE * 2 ** attempt
+        else:
+            _observe(upstream, (time.monotonic() - started) * 1000, str(response.status_code))
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+            if not retryable or attempt >= MAX_RETRIES:
+                return response
+            delay = _retry_after(response)
+            if delay is None:
+                delay = BACKOFF_BASE * 2 ** attempt
+            elif delay > MAX_RETRY_SLEEP:
+                return response
+
+        attempt += 1
+        _count_retry(upstream)
+        time.sleep(min(delay * random.uniform(1.0, 1.5), MAX_RETRY_SLEEP))
+
+
+def http_stats() -> Dict[str, Dict[str, Any]]:
+    """Задержки по внешним сервисам: гистограмма, исходы, число повторов"""
+    with _lock:
+        return {
+            upstream: {
+                **stats,
+                'outcomes': dict(stats['outcomes']),
+                'histogram_ms': dict(stats['histogram_ms']),
+                'avg_ms': round(stats['total_ms'] / stats['requests'], 1) if stats['requests'] else 0,
+            }
+            for upstream, stats in _stats.items()
+        }
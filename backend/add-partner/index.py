@@ -1,72 +1,58 @@
 import json
 import os
 from typing import Dict, Any
-import requests
 
+from bulk import airtable_fields, import_partners, parse_rows, validate_partner
+from responses import admin_password_matches, compressed, error, json_response, preflight
+from tracing import traced
+
+PARTNERS_SYNC_TIMEOUT = float(os.environ.get('PARTNERS_SYNC_TIMEOUT', '1'))
+
+@traced
+@compressed
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    API для добавления нового партнёра в Airtable (только для админа)
-    Args: event - dict с httpMethod, body с данными партнёра
+    API для добавления партнёров в Airtable (только для админа): один партнёр
+    или пакетный импорт JSON-массивом / CSV с upsert по Name и URL
+    Args: event - dict с httpMethod, body с данными партнёра или списком партнёров
           context - объект с request_id, function_name и другими атрибутами
     Returns: HTTP ответ с результатом добавления партнёра
     '''
     method: str = event.get('httpMethod', 'POST')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Admin-Password',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight('POST, OPTIONS', 'Content-Type, X-Admin-Password')
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return error(405, 'Method not allowed')
     
     headers = event.get('headers', {})
     admin_password = headers.get('x-admin-password', headers.get('X-Admin-Password', ''))
     
-    if admin_password != os.environ.get('ADMIN_PASSWORD'):
-        return {
-            'statusCode': 403,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Forbidden'}),
-            'isBase64Encoded': False
-        }
+    if not admin_password_matches(admin_password):
+        return error(403, 'Forbidden')
     
     body_data = json.loads(event.get('body', '{}'))
+    if not isinstance(body_data, (dict, list)):
+        return error(400, 'Ожидается объект партнёра или список партнёров')
     
-    required_fields = ['name', 'description', 'category', 'offer', 'promoCode', 'url']
-    for field in required_fields:
-        if not body_data.get(field):
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': f'Поле {field} обязательно'}),
-                'isBase64Encoded': False
-            }
+    rows = parse_rows(body_data)
+    
+    if rows is None:
+        message = validate_partner(body_data)
+        if message:
+            return error(400, message)
     
     airtable_token = os.environ.get('AIRTABLE_TOKEN')
     base_id = os.environ.get('AIRTABLE_BASE_ID')
     table_name = os.environ.get('AIRTABLE_TABLE_NAME', 'Partners')
     
     if not airtable_token or not base_id:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Airtable не настроен'}),
-            'isBase64Encoded': False
-        }
+        return error(500, 'Airtable не настроен')
+    
+    import requests
+    
+    from http_client import request
     
     url = f'https://api.airtable.com/v0/{base_id}/{table_name}'
     headers = {
@@ -74,33 +60,59 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'Content-Type': 'application/json'
     }
     
-    payload = {
-        'fields': {
-            'Name': body_data['name'],
-            'Description': body_data['description'],
-            'Category': body_data['category'],
-            'Offer': body_data['offer'],
-            'PromoCode': body_data['promoCode'],
-            'URL': body_data['url'],
-        }
-    }
+    if rows is not None:
+        results = import_partners(rows, url, headers)
+        summary: Dict[str, int] = {}
+        for item in results:
+            summary[item['result']] = summary.get(item['result'], 0) + 1
+        
+        if summary.get('created') or summary.get('updated'):
+            invalidate_partners_cache()
+        
+        return json_response(200, {'success': not summary.get('error') and not summary.get('invalid'), 'summary': summary, 'results': results})
     
-    if body_data.get('logo'):
-        payload['fields']['Logo'] = [{'url': body_data['logo']}]
+    payload = {'fields': airtable_fields(body_data)}
     
-    response = requests.post(url, headers=headers, json=payload)
+    try:
+        response = request('airtable', 'POST', url, headers=headers, json=payload)
+    except requests.RequestException as e:
+        print(f"Airtable request failed: {e}")
+        response = None
     
-    if response.status_code not in [200, 201]:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Ошибка при добавлении в Airtable'}),
-            'isBase64Encoded': False
-        }
+    if response is None or response.status_code not in [200, 201]:
+        return error(500, 'Ошибка при добавлении в Airtable')
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True, 'data': response.json()}),
-        'isBase64Encoded': False
-    }
+    invalidate_partners_cache()
+    
+    return json_response(200, {'success': True, 'data': response.json()})
+
+
+def invalidate_partners_cache() -> None:
+    """
+    Подсказка функции partners после записи: ?sync=1 подтягивает изменения из
+    Airtable в зеркало Postgres. Одна попытка с коротким таймаутом, чтобы не
+    задерживать ответ: синхронизация продолжается в partners и после таймаута
+    чтения. Без PARTNERS_API_URL или при ошибке зеркало догонит Airtable по
+    PARTNERS_SYNC_INTERVAL.
+    """
+    partners_url = os.environ.get('PARTNERS_API_URL')
+    if not partners_url:
+        return
+    
+    from urllib.parse import urlsplit
+    
+    import requests
+    
+    from http_client import CONNECT_TIMEOUT, get_session
+    
+    try:
+        get_session(urlsplit(partners_url).netloc).get(
+            partners_url,
+            params={'sync': '1'},
+            headers={'X-Admin-Password': os.environ.get('ADMIN_PASSWORD', '')},
+            timeout=(min(CONNECT_TIMEOUT, 1.0), PARTNERS_SYNC_TIMEOUT)
+        )
+    except requests.ReadTimeout:
+        pass
+    except requests.RequestException as e:
+        print(f"Partners sync after write failed: {e}")
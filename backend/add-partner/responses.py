@@ -0,0 +1,156 @@
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from tracing import span
+
+COMPRESS_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', '1400'))
+COMPRESSED_CACHE_SIZE = 8
+
+JSON_HEADERS: Mapping[str, str] = MappingProxyType({
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+})
+
+_lock = threading.Lock()
+_optional: Dict[str, Any] = {}
+_compressed: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+
+
+def _optional_module(name: str) -> Any:
+    """orjson и brotli необязательны и импортируются при первом обращении, а не на холодном старте"""
+    if name not in _optional:
+        try:
+            _optional[name] = __import__(name)
+        except ImportError:
+            _optional[name] = None
+    return _optional[name]
+
+
+def encode(payload: Any) -> str:
+    """JSON без пробелов; orjson, если установлен"""
+    with span('json'):
+        orjson = _optional_module('orjson')
+        if orjson is not None:
+            return orjson.dumps(payload).decode('utf-8')
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+
+def json_response(status: int, payload: Any, headers: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else dict(JSON_HEADERS),
+        'body': encode(payload),
+        'isBase64Encoded': False
+    }
+
+
+@functools.lru_cache(maxsize=128)
+def _error_body(message: str) -> str:
+    return json.dumps({'error': message})
+
+
+def error(status: int, message: str, headers: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+    """Ответ с ошибкой; тела для одинаковых сообщений сериализуются один раз"""
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else dict(JSON_HEADERS),
+        'body': _error_body(message),
+        'isBase64Encoded': False
+    }
+
+
+@functools.lru_cache(maxsize=8)
+def _preflight_headers(methods: str, allow_headers: str) -> Mapping[str, str]:
+    return MappingProxyType({
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': methods,
+        'Access-Control-Allow-Headers': allow_headers,
+        'Access-Control-Max-Age': '86400'
+    })
+
+
+def preflight(methods: str, allow_headers: str = 'Content-Type') -> Dict[str, Any]:
+    return {
+        'statusCode': 200,
+        'headers': dict(_preflight_headers(methods, allow_headers)),
+        'body': '',
+        'isBase64Encoded': False
+    }
+
+
+def admin_password_matches(supplied: Optional[str]) -> bool:
+    """Сравнение с ADMIN_PASSWORD за постоянное время; без настроенного пароля доступа нет"""
+    expected = os.environ.get('ADMIN_PASSWORD')
+    if not supplied or not expected:
+        return False
+    import hmac
+
+    return hmac.compare_digest(supplied.encode('utf-8'), expected.encode('utf-8'))
+
+
+def _accepted_encoding(event: Dict[str, Any]) -> Optional[str]:
+    headers = event.get('headers') or {}
+    accept = next((value for key, value in headers.items() if key.lower() == 'accept-encoding'), '')
+    tokens = {part.split(';')[0].strip().lower() for part in accept.split(',')}
+    if 'br' in tokens and _optional_module('brotli') is not None:
+        return 'br'
+    if 'gzip' in tokens:
+        return 'gzip'
+    return None
+
+
+def _compress(body: str, encoding: str) -> str:
+    import base64
+    import gzip
+
+    raw = body.encode('utf-8')
+    with span('compress', encoding):
+        if encoding == 'br':
+            packed = _optional_module('brotli').compress(raw, quality=5)
+        else:
+            packed = gzip.compress(raw, compresslevel=6)
+    return base64.b64encode(packed).decode('ascii')
+
+
+def compressed(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]]) -> Callable[[Dict[str, Any], Any], Dict[str, Any]]:
+    """
+    Сжатие тела ответа gzip/brotli, если клиент это принимает и тело не меньше
+    COMPRESS_MIN_BYTES. Ответы с ETag сжимаются один раз на версию.
+    """
+    @functools.wraps(handler)
+    def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        response = handler(event, context)
+        body = response.get('body')
+        if response.get('isBase64Encoded') or not isinstance(body, str) or len(body) < COMPRESS_MIN_BYTES:
+            return response
+
+        encoding = _accepted_encoding(event)
+        if encoding is None:
+            return response
+
+        headers = response.setdefault('headers', {})
+        etag = headers.get('ETag')
+        packed = None
+        if etag:
+            with _lock:
+                packed = _compressed.get((etag, encoding))
+        if packed is None:
+            packed = _compress(body, encoding)
+            if etag:
+                with _lock:
+                    _compressed[(etag, encoding)] = packed
+                    while len(_compressed) > COMPRESSED_CACHE_SIZE:
+                        _compressed.popitem(last=False)
+
+        headers['Content-Encoding'] = encoding
+        headers['Vary'] = 'Accept-Encoding'
+        response['body'] = packed
+        response['isBase64Encoded'] = True
+        return response
+
+    return wrapper
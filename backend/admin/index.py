@@ -1,9 +1,54 @@
+import base64
+import csv
+import io
 import json
 import os
-import psycopg2
-from datetime import datetime, timedelta
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
 
+from revenue import BILLING_PERIOD_DAYS, MAX_BUCKETS, PERIODS, revenue_series
+from responses import admin_password_matches, compressed, error, json_response, preflight
+from tracing import traced
+
+SUBSCRIBERS_PAGE_SIZE = 100
+SUBSCRIBERS_MAX_PAGE_SIZE = 500
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+SEARCH_MIN_TRIGRAM_LENGTH = 3
+SEARCH_EXACT_COUNT_LIMIT = 1000
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '2000'))
+EXPORT_COLUMNS = ['id', 'email', 'name', 'promo_code', 'status', 'amount', 'next_billing', 'joined']
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+METRICS_QUERY = f"""
+    SELECT
+        (SELECT COALESCE(SUM(total), 0)::bigint FROM metrics_state_counts
+         WHERE entity = 'subscribers' AND status = 'active'),
+        (SELECT COALESCE(SUM(amount), 0)::bigint FROM (
+            SELECT DISTINCT ON (p.subscriber_id) p.amount FROM payments p
+            JOIN subscribers s ON s.id = p.subscriber_id AND s.subscription_status = 'active'
+            WHERE p.status = 'completed' AND p.completed_at > NOW() - INTERVAL '{BILLING_PERIOD_DAYS} days'
+            ORDER BY p.subscriber_id, p.completed_at DESC
+         ) latest_payments),
+        (SELECT COALESCE(SUM(signups), 0)::bigint FROM metrics_daily
+         WHERE day > CURRENT_DATE - 7),
+        (SELECT COALESCE(SUM(total), 0)::bigint FROM metrics_state_counts
+         WHERE entity = 'payments' AND status = 'completed'),
+        (SELECT COALESCE(SUM(total), 0)::bigint FROM metrics_state_counts
+         WHERE entity = 'payments' AND status = 'pending'),
+        (SELECT json_agg(json_build_object(
+                    'date', to_char(days.day, 'YYYY-MM-DD"T"HH24:MI:SS'),
+                    'count', COALESCE(m.signups, 0)
+                ) ORDER BY days.day DESC)
+         FROM generate_series(CURRENT_DATE - 29, CURRENT_DATE, INTERVAL '1 day') AS days(day)
+         LEFT JOIN metrics_daily m ON m.day = days.day::date)
+"""
+
+@traced
+@compressed
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     API для админ-панели: получение данных участников и метрик
@@ -11,167 +56,352 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight('GET, POST, OPTIONS', 'Content-Type, Authorization')
     
     headers_dict = event.get('headers', {})
     auth_header = headers_dict.get('authorization') or headers_dict.get('Authorization', '')
+    scheme, _, token = auth_header.partition(' ')
     
-    admin_password = os.environ.get('ADMIN_PASSWORD', '')
-    
-    if not auth_header or auth_header != f"Bearer {admin_password}":
-        return {
-            'statusCode': 401,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Unauthorized'}),
-            'isBase64Encoded': False
-        }
+    if scheme != 'Bearer' or not admin_password_matches(token):
+        return error(401, 'Unauthorized')
     
     if method == 'GET':
         query_params = event.get('queryStringParameters') or {}
         action = query_params.get('action', 'subscribers')
         
         if action == 'subscribers':
-            return get_subscribers()
+            return get_subscribers(query_params)
+        elif action == 'search':
+            return search_subscribers(query_params)
+        elif action == 'export':
+            return export_subscribers(query_params)
         elif action == 'metrics':
             return get_metrics()
+        elif action == 'revenue':
+            return get_revenue(query_params)
+        elif action == 'pool':
+            from db import pool_stats
+            
+            return json_response(200, {'pool': pool_stats()})
         else:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Unknown action'}),
-                'isBase64Encoded': False
-            }
+            return error(400, 'Unknown action')
+    
+    return error(405, 'Method not allowed')
+
+
+class InvalidQuery(ValueError):
+    """Некорректные параметры выборки участников"""
+
+
+def _parse_filters(query_params: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+    conditions: List[str] = []
+    params: List[Any] = []
     
+    if query_params.get('status'):
+        conditions.append('subscription_status = %s')
+        params.append(query_params['status'])
+    
+    for key, column, operator in (
+        ('created_from', 'created_at', '>='), ('created_to', 'created_at', '<'),
+        ('billing_from', 'next_billing_date', '>='), ('billing_to', 'next_billing_date', '<'),
+    ):
+        if query_params.get(key):
+            try:
+                value = datetime.fromisoformat(query_params[key])
+            except ValueError:
+                raise InvalidQuery(f'{key} должен быть датой в формате ISO')
+            conditions.append(f'{column} {operator} %s')
+            params.append(value)
+    
+    return conditions, params
+
+
+def _encode_cursor(created_at: datetime, subscriber_id: int) -> str:
+    raw = f'{created_at.isoformat()}|{subscriber_id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, subscriber_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(subscriber_id)
+    except (ValueError, UnicodeError):
+        raise InvalidQuery('Некорректный cursor')
+
+
+def _subscriber_row(row: Tuple[Any, ...]) -> Dict[str, Any]:
     return {
-        'statusCode': 405,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Method not allowed'}),
-        'isBase64Encoded': False
+        'id': row[0],
+        'email': row[1],
+        'name': row[2],
+        'promo_code': row[3],
+        'status': row[4],
+        'amount': row[5],
+        'next_billing': row[6].isoformat() if row[6] else None,
+        'joined': row[7].isoformat() if row[7] else None
     }
 
 
-def get_subscribers() -> Dict[str, Any]:
-    """Получение списка всех участников"""
-    conn = psycopg2.connect(os.environ['DATABASE_URL'])
-    cur = conn.cursor()
-    
+def get_subscribers(query_params: Dict[str, Any]) -> Dict[str, Any]:
+    """Страница участников с keyset-пагинацией по (created_at, id) и фильтрами"""
     try:
-        cur.execute("""
-            SELECT id, email, name, promo_code, subscription_status, 
-                   payment_amount, next_billing_date, created_at
-            FROM subscribers
-            ORDER BY created_at DESC
-        """)
-        
-        rows = cur.fetchall()
-        subscribers = []
+        limit = int(query_params.get('limit') or SUBSCRIBERS_PAGE_SIZE)
+        if not 1 <= limit <= SUBSCRIBERS_MAX_PAGE_SIZE:
+            raise InvalidQuery(f'limit должен быть от 1 до {SUBSCRIBERS_MAX_PAGE_SIZE}')
+        conditions, params = _parse_filters(query_params)
+        if query_params.get('cursor'):
+            conditions.append('(created_at, id) < (%s, %s)')
+            params.extend(_decode_cursor(query_params['cursor']))
+    except ValueError as e:
+        return error(400, str(e) if isinstance(e, InvalidQuery) else 'Некорректный limit')
+    
+    from db import get_connection
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
+    with get_connection() as conn:
+        cur = conn.cursor()
         
-        for row in rows:
-            subscribers.append({
-                'id': row[0],
-                'email': row[1],
-                'name': row[2],
-                'promo_code': row[3],
-                'status': row[4],
-                'amount': row[5],
-                'next_billing': row[6].isoformat() if row[6] else None,
-                'joined': row[7].isoformat() if row[7] else None
+        try:
+            cur.execute(f"""
+                SELECT id, email, name, promo_code, subscription_status, 
+                       payment_amount, next_billing_date, created_at
+                FROM subscribers
+                {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+            """, (*params, limit + 1))
+            
+            rows = cur.fetchall()
+            next_cursor = None
+            
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = _encode_cursor(rows[-1][7], rows[-1][0])
+            
+            return json_response(200, {
+                'subscribers': [_subscriber_row(row) for row in rows],
+                'next_cursor': next_cursor
             })
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'subscribers': subscribers}),
-            'isBase64Encoded': False
-        }
-        
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
-    finally:
-        cur.close()
-        conn.close()
+        except Exception as e:
+            return error(500, str(e))
+        finally:
+            cur.close()
 
 
-def get_metrics() -> Dict[str, Any]:
-    """Расчёт ключевых метрик для дашборда"""
-    conn = psycopg2.connect(os.environ['DATABASE_URL'])
-    cur = conn.cursor()
-    
+def _search_conditions(query: str) -> Tuple[str, List[Any], str, List[Any]]:
+    """
+    Условие и порядок поиска по email, имени и промокоду. Короткий запрос ищется
+    как префикс email или промокода по btree-индексам, длинный — по триграммам search_text.
+    """
+    prefix = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    if len(query) < SEARCH_MIN_TRIGRAM_LENGTH:
+        condition = '(lower(email) LIKE %s OR lower(promo_code) LIKE %s)'
+        params: List[Any] = [prefix, prefix]
+    else:
+        condition = '(search_text LIKE %s OR search_text %% %s)'
+        params = ['%' + prefix, query]
+    order = (
+        'lower(email) = %s DESC, (lower(email) LIKE %s OR lower(promo_code) LIKE %s) DESC, '
+        'similarity(search_text, %s) DESC, created_at DESC, id DESC'
+    )
+    return condition, params, order, [query, prefix, prefix, query]
+
+
+def _estimate_count(cur: Any, where: str, params: List[Any]) -> Tuple[int, bool]:
+    """
+    Число совпадений без COUNT(*) по всей таблице: точный подсчёт до
+    SEARCH_EXACT_COUNT_LIMIT строк, дальше оценка планировщика из EXPLAIN
+    """
+    cur.execute(f"SELECT count(*) FROM (SELECT 1 FROM subscribers {where} LIMIT %s) matches",
+                (*params, SEARCH_EXACT_COUNT_LIMIT + 1))
+    exact = cur.fetchone()[0]
+    if exact <= SEARCH_EXACT_COUNT_LIMIT:
+        return exact, False
+    cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM subscribers {where}", params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return max(int(plan[0]['Plan']['Plan Rows']), exact), True
+
+
+def search_subscribers(query_params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Поиск участников по email, имени и промокоду (q) с фильтрами status,
+    created_from/created_to и billing_from/billing_to. Возвращает лучшие limit
+    совпадений и их общее число, для больших выборок — оценку.
+    """
+    query = (query_params.get('q') or '').strip().lower()
     try:
-        cur.execute("SELECT COUNT(*) FROM subscribers WHERE subscription_status = 'active'")
-        total_active = cur.fetchone()[0]
-        
-        mrr = total_active * 990
-        
-        week_ago = datetime.now() - timedelta(days=7)
-        cur.execute(
-            "SELECT COUNT(*) FROM subscribers WHERE created_at >= %s",
-            (week_ago,)
-        )
-        new_this_week = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM payments WHERE status = 'completed'")
-        total_payments = cur.fetchone()[0]
+        limit = int(query_params.get('limit') or SEARCH_DEFAULT_LIMIT)
+        if not 1 <= limit <= SEARCH_MAX_LIMIT:
+            raise InvalidQuery(f'limit должен быть от 1 до {SEARCH_MAX_LIMIT}')
+        conditions, params = _parse_filters(query_params)
+    except ValueError as e:
+        return error(400, str(e) if isinstance(e, InvalidQuery) else 'Некорректный limit')
+    
+    order = 'created_at DESC, id DESC'
+    order_params: List[Any] = []
+    if query:
+        condition, condition_params, order, order_params = _search_conditions(query)
+        conditions.append(condition)
+        params.extend(condition_params)
+    
+    from db import get_connection
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
+    with get_connection() as conn:
+        cur = conn.cursor()
         
-        cur.execute("SELECT COUNT(DISTINCT payment_id) FROM payments WHERE status = 'pending'")
-        pending_payments = cur.fetchone()[0]
+        try:
+            cur.execute(f"""
+                SELECT id, email, name, promo_code, subscription_status, 
+                       payment_amount, next_billing_date, created_at
+                FROM subscribers
+                {where}
+                ORDER BY {order}
+                LIMIT %s
+            """, (*params, *order_params, limit + 1))
+            
+            rows = cur.fetchall()
+            if len(rows) <= limit:
+                total, estimated = len(rows), False
+            else:
+                rows = rows[:limit]
+                total, estimated = _estimate_count(cur, where, params)
+            
+            return json_response(200, {
+                'subscribers': [_subscriber_row(row) for row in rows],
+                'total': total,
+                'total_estimated': estimated
+            })
         
-        conversion_rate = 0
-        if total_payments + pending_payments > 0:
-            conversion_rate = round((total_payments / (total_payments + pending_payments)) * 100, 2)
+        except Exception as e:
+            return error(500, str(e))
+        finally:
+            cur.close()
+            conn.rollback()
+
+
+def export_subscribers(query_params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Выгрузка участников в NDJSON или CSV через серверный курсор: строки читаются
+    пачками по EXPORT_BATCH_SIZE и сразу пишутся в тело ответа
+    """
+    export_format = query_params.get('format', 'ndjson')
+    
+    if export_format not in EXPORT_CONTENT_TYPES:
+        return error(400, 'format должен быть ndjson или csv')
+    
+    try:
+        conditions, params = _parse_filters(query_params)
+    except InvalidQuery as e:
+        return error(400, str(e))
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    buffer = io.StringIO()
+    
+    if export_format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+    
+    from db import get_connection
+    
+    with get_connection() as conn:
+        cur = conn.cursor(name='subscribers_export')
+        cur.itersize = EXPORT_BATCH_SIZE
         
-        cur.execute("""
-            SELECT DATE_TRUNC('day', created_at) as day, COUNT(*) as count
-            FROM subscribers
-            WHERE created_at >= NOW() - INTERVAL '30 days'
-            GROUP BY day
-            ORDER BY day DESC
-        """)
+        try:
+            cur.execute(f"""
+                SELECT id, email, name, promo_code, subscription_status, 
+                       payment_amount, next_billing_date, created_at
+                FROM subscribers
+                {where}
+                ORDER BY created_at DESC, id DESC
+            """, params)
+            
+            for row in cur:
+                item = _subscriber_row(row)
+                if export_format == 'csv':
+                    writer.writerow([item[column] for column in EXPORT_COLUMNS])
+                else:
+                    buffer.write(json.dumps(item))
+                    buffer.write('\n')
         
-        chart_data = []
-        for row in cur.fetchall():
-            chart_data.append({
-                'date': row[0].isoformat(),
-                'count': row[1]
-            })
+        except Exception as e:
+            return error(500, str(e))
+        finally:
+            cur.close()
+            conn.rollback()
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': EXPORT_CONTENT_TYPES[export_format],
+            'Content-Disposition': f'attachment; filename="subscribers.{export_format}"',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': buffer.getvalue(),
+        'isBase64Encoded': False
+    }
+
+
+def get_metrics() -> Dict[str, Any]:
+    """Метрики дашборда за один запрос из metrics_daily, metrics_state_counts и последних партиций payment_events"""
+    from db import get_connection
+    
+    with get_connection() as conn:
+        cur = conn.cursor()
         
-        metrics = {
-            'total_active_subscribers': total_active,
-            'mrr': mrr,
-            'new_subscribers_week': new_this_week,
-            'conversion_rate': conversion_rate,
-            'chart_data': chart_data
-        }
+        try:
+            cur.execute(METRICS_QUERY)
+            total_active, mrr, new_this_week, total_payments, pending_payments, chart_data = cur.fetchone()
+            
+            conversion_rate = 0
+            if total_payments + pending_payments > 0:
+                conversion_rate = round((total_payments / (total_payments + pending_payments)) * 100, 2)
+            
+            metrics = {
+                'total_active_subscribers': total_active,
+                'mrr': mrr,
+                'new_subscribers_week': new_this_week,
+                'conversion_rate': conversion_rate,
+                'chart_data': chart_data
+            }
+            
+            return json_response(200, {'metrics': metrics})
+            
+        except Exception as e:
+            return error(500, str(e))
+        finally:
+            cur.close()
+
+
+def get_revenue(query_params: Dict[str, Any]) -> Dict[str, Any]:
+    """Ряды выручки, MRR, оттока и ARPU за последние N дней/недель/месяцев"""
+    period = query_params.get('period', 'month')
+    
+    try:
+        buckets = int(query_params.get('buckets') or 12)
+    except ValueError:
+        buckets = 0
+    
+    if period not in PERIODS or not 1 <= buckets <= MAX_BUCKETS:
+        return error(400, f'period: day, week или month; buckets: от 1 до {MAX_BUCKETS}')
+    
+    from db import get_connection
+    
+    with get_connection() as conn:
+        cur = conn.cursor()
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'metrics': metrics}),
-            'isBase64Encoded': False
-        }
+        try:
+            series = revenue_series(cur, period, buckets)
+            
+            return json_response(200, {'period': period, 'revenue': series})
         
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
-    finally:
-        cur.close()
-        conn.close()
+        except Exception as e:
+            return error(500, str(e))
+        finally:
+            cur.close()
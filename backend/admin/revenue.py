@@ -0,0 +1,140 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+BILLING_PERIOD_DAYS = 30
+MAX_BUCKETS = 366
+PERIODS = ('day', 'week', 'month')
+
+REVENUE_QUERY = """
+    WITH buckets AS (
+        SELECT bucket_start, bucket_start + %(step)s::interval AS bucket_end
+        FROM generate_series(%(start)s::timestamp, %(last)s::timestamp, %(step)s::interval) AS bucket_start
+    ),
+    paid AS (
+        SELECT subscriber_id, amount, completed_at,
+               completed_at + %(billing)s::interval AS covered_until,
+               LEAD(completed_at) OVER (PARTITION BY subscriber_id ORDER BY completed_at) AS renewed_at
+        FROM payments
+        WHERE status = 'completed'
+          AND completed_at >= %(start)s::timestamp - %(billing)s::interval
+          AND completed_at < %(end)s::timestamp
+    )
+    SELECT
+        b.bucket_start,
+        COALESCE(SUM(p.amount) FILTER (
+            WHERE p.completed_at >= b.bucket_start AND p.completed_at < b.bucket_end), 0)::bigint,
+        COUNT(DISTINCT p.subscriber_id) FILTER (
+            WHERE p.completed_at >= b.bucket_start AND p.completed_at < b.bucket_end),
+        COALESCE(SUM(p.amount) FILTER (
+            WHERE p.covered_until >= b.bucket_end
+              AND (p.renewed_at IS NULL OR p.renewed_at >= b.bucket_end)), 0)::bigint,
+        COUNT(DISTINCT p.subscriber_id) FILTER (
+            WHERE p.covered_until >= b.bucket_end
+              AND (p.renewed_at IS NULL OR p.renewed_at >= b.bucket_end)),
+        COALESCE(SUM(p.amount) FILTER (
+            WHERE p.covered_until < b.bucket_end
+              AND (p.renewed_at IS NULL OR p.renewed_at > p.covered_until)), 0)::bigint
+    FROM buckets b
+    LEFT JOIN paid p ON p.completed_at < b.bucket_end AND p.covered_until >= b.bucket_start
+    GROUP BY b.bucket_start
+    ORDER BY b.bucket_start
+"""
+
+_lock = threading.Lock()
+_closed_buckets: Dict[Tuple[str, datetime], Dict[str, Any]] = {}
+
+
+def _bucket_start(period: str, moment: datetime) -> datetime:
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _shift(period: str, start: datetime, count: int) -> datetime:
+    if period == 'day':
+        return start + timedelta(days=count)
+    if period == 'week':
+        return start + timedelta(weeks=count)
+    month_index = start.year * 12 + start.month - 1 + count
+    return start.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def _step(period: str) -> str:
+    return {'day': '1 day', 'week': '1 week', 'month': '1 month'}[period]
+
+
+def _bucket_row(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    bucket_start, net_revenue, paying, mrr, active, churned_mrr = row
+    return {
+        'date': bucket_start.isoformat(),
+        'net_revenue': net_revenue,
+        'paying_subscribers': paying,
+        'mrr': mrr,
+        'active_subscribers': active,
+        'churned_mrr': churned_mrr,
+        'arpu': round(mrr / active, 2) if active else 0,
+    }
+
+
+def _compute(cur: Any, period: str, start: datetime, last: datetime) -> List[Dict[str, Any]]:
+    cur.execute(REVENUE_QUERY, {
+        'step': _step(period),
+        'start': start,
+        'last': last,
+        'end': _shift(period, last, 1),
+        'billing': f'{BILLING_PERIOD_DAYS} days',
+    })
+    return [_bucket_row(row) for row in cur.fetchall()]
+
+
+def revenue_series(cur: Any, period: str, buckets: int) -> List[Dict[str, Any]]:
+    """
+    Выручка, MRR, отток MRR и ARPU по дням/неделям/месяцам из payments.
+    Закрытые периоды больше не меняются: они считаются один раз и берутся
+    из revenue_rollups, текущий период пересчитывается на каждом запросе.
+    """
+    current = _bucket_start(period, datetime.now())
+    starts = [_shift(period, current, -offset) for offset in range(buckets - 1, -1, -1)]
+    closed = starts[:-1]
+
+    with _lock:
+        known = {start: _closed_buckets[(period, start)] for start in closed if (period, start) in _closed_buckets}
+
+    missing = [start for start in closed if start not in known]
+    if missing:
+        cur.execute(
+            """SELECT bucket_start, net_revenue, paying_subscribers, mrr, active_subscribers, churned_mrr
+               FROM revenue_rollups
+               WHERE period = %s AND bucket_start >= %s AND bucket_start < %s""",
+            (period, missing[0], current)
+        )
+        for row in cur.fetchall():
+            known[row[0]] = _bucket_row(row)
+        missing = [start for start in closed if start not in known]
+
+    if missing:
+        computed = _compute(cur, period, missing[0], missing[-1])
+        cur.executemany(
+            """INSERT INTO revenue_rollups
+               (period, bucket_start, net_revenue, paying_subscribers, mrr, active_subscribers, churned_mrr)
+               VALUES (%s, %s, %s, %s, %s, %s, %s)
+               ON CONFLICT (period, bucket_start) DO NOTHING""",
+            [
+                (period, datetime.fromisoformat(item['date']), item['net_revenue'], item['paying_subscribers'],
+                 item['mrr'], item['active_subscribers'], item['churned_mrr'])
+                for item in computed
+            ]
+        )
+        cur.connection.commit()
+        for item in computed:
+            known[datetime.fromisoformat(item['date'])] = item
+
+    with _lock:
+        for start in closed:
+            _closed_buckets[(period, start)] = known[start]
+
+    return [known[start] for start in closed] + _compute(cur, period, current, current)
@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+
+from db import PoolExhausted, close_dedicated, get_connection, open_dedicated
+
+POSITIVE_TTL = float(os.environ.get('ACCESS_CACHE_POSITIVE_TTL', '300'))
+NEGATIVE_TTL = float(os.environ.get('ACCESS_CACHE_NEGATIVE_TTL', '30'))
+CACHE_MAX_ENTRIES = int(os.environ.get('ACCESS_CACHE_MAX_ENTRIES', '10000'))
+INVALIDATION_CHANNEL = 'subscriber_status'
+
+ACCESS_CHECK_SQL = (
+    "PREPARE access_check (text) AS "
+    "SELECT id, subscription_status FROM t_p48299329_nomad_hub_landing.subscribers WHERE lower(email) = $1"
+)
+
+_lock = threading.Lock()
+_verdicts: 'OrderedDict[str, Tuple[Optional[int], float]]' = OrderedDict()
+_revoked: Dict[int, float] = {}
+_confirmed: 'OrderedDict[int, None]' = OrderedDict()
+_prepared: 'weakref.WeakSet[Any]' = weakref.WeakSet()
+_listener: Optional[Any] = None
+_listening_since = float('inf')
+_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'invalidations': 0, 'listener_resets': 0}
+
+
+def _reset_listener() -> None:
+    global _listener, _listening_since
+    if _listener is not None:
+        close_dedicated(_listener)
+    _listener = None
+    _listening_since = float('inf')
+    with _lock:
+        _verdicts.clear()
+        _revoked.clear()
+        _confirmed.clear()
+        _stats['listener_resets'] += 1
+
+
+def _apply_notification(payload: str) -> None:
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        change = {'email': payload}
+    if not isinstance(change, dict):
+        return
+    _verdicts.pop(change.get('email'), None)
+    if change.get('id') is not None:
+        if change.get('status') == 'active':
+            _revoked.pop(change['id'], None)
+        else:
+            _revoked[change['id']] = time.time()
+            if len(_revoked) > CACHE_MAX_ENTRIES:
+                del _revoked[min(_revoked, key=_revoked.get)]
+
+
+def _drain_invalidations() -> None:
+    """
+    Сброс вердиктов по NOTIFY от триггера на subscribers. poll() только читает
+    уже пришедшие в сокет уведомления и не отправляет запросов в Postgres.
+    Если слушатель потерян, кеш очищается целиком. Соединение слушателя
+    занимает слот пула db.py.
+    """
+    global _listener, _listening_since
+    try:
+        if _listener is None or _listener.closed:
+            _reset_listener()
+            _listener = open_dedicated()
+            _listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            cur = _listener.cursor()
+            cur.execute(f'LISTEN {INVALIDATION_CHANNEL}')
+            cur.close()
+            _listening_since = time.time()
+
+        _listener.poll()
+        with _lock:
+            while _listener.notifies:
+                notify = _listener.notifies.pop(0)
+                _apply_notification(notify.payload)
+                _stats['invalidations'] += 1
+    except (psycopg2.Error, PoolExhausted) as e:
+        print(f"Access cache listener error: {e}")
+        _reset_listener()
+
+
+def _cached(email: str) -> Tuple[bool, Optional[int]]:
+    with _lock:
+        entry = _verdicts.get(email)
+        if entry is None or entry[1] < time.monotonic():
+            _stats['misses'] += 1
+            return False, None
+        _verdicts.move_to_end(email)
+        _stats['hits'] += 1
+        return True, entry[0]
+
+
+def _store(email: str, member_id: Optional[int]) -> None:
+    ttl = POSITIVE_TTL if member_id is not None else NEGATIVE_TTL
+    with _lock:
+        _verdicts[email] = (member_id, time.monotonic() + ttl)
+        _verdicts.move_to_end(email)
+        while len(_verdicts) > CACHE_MAX_ENTRIES:
+            _verdicts.popitem(last=False)
+
+
+def _query_member(email: str) -> Optional[Tuple[int, str]]:
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            if conn not in _prepared:
+                try:
+                    cur.execute(ACCESS_CHECK_SQL)
+                except psycopg2.errors.DuplicatePreparedStatement:
+                    conn.rollback()
+                _prepared.add(conn)
+            cur.execute('EXECUTE access_check (%s)', (email,))
+            result = cur.fetchone()
+            conn.rollback()
+            return result
+        finally:
+            cur.close()
+
+
+def active_member_id(email: str) -> Optional[int]:
+    """id участника с активной подпиской или None; вердикты кешируются по email"""
+    email = email.strip().lower()
+    _drain_invalidations()
+
+    found, member_id = _cached(email)
+    if found:
+        return member_id
+
+    member = _query_member(email)
+    member_id = member[0] if member and member[1] == 'active' else None
+    _store(email, member_id)
+    return member_id
+
+
+def is_revoked(member_id: int, issued_at: float, email: str) -> bool:
+    """
+    Статус участника мог смениться после выдачи токена: пришёл NOTIFY о
+    деактивации в ту же секунду, что и iat, или позже. Токен старше начала
+    прослушивания канала один раз подтверждается по БД, и участник
+    запоминается до потери слушателя.
+    """
+    _drain_invalidations()
+    with _lock:
+        revoked_at = _revoked.get(member_id)
+        confirmed = member_id in _confirmed
+    if revoked_at is not None and revoked_at >= issued_at:
+        return True
+    if confirmed or issued_at >= _listening_since:
+        return False
+
+    if active_member_id(email) != member_id:
+        return True
+    with _lock:
+        _confirmed[member_id] = None
+        while len(_confirmed) > CACHE_MAX_ENTRIES:
+            _confirmed.popitem(last=False)
+    return False
+
+
+def access_stats() -> Dict[str, int]:
+    with _lock:
+        stats = dict(_stats)
+        stats['entries'] = len(_verdicts)
+        stats['revoked'] = len(_revoked)
+    return stats
@@ -0,0 +1,93 @@
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from http_client import request
+
+THROTTLE_BACKOFF = float(os.environ.get('PARTNERS_THROTTLE_BACKOFF', '30'))
+MAX_PAGE_SIZE = 100
+PARTNER_FIELDS = ['Name', 'Logo', 'Description', 'Category', 'Offer', 'PromoCode', 'URL']
+
+
+class CatalogUnavailable(Exception):
+    """Airtable не ответил или ограничил частоту запросов"""
+
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def airtable_configured() -> bool:
+    return bool(os.environ.get('AIRTABLE_TOKEN') and os.environ.get('AIRTABLE_BASE_ID'))
+
+
+def normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    fields = record.get('fields', {})
+    return {
+        'id': record['id'],
+        'name': fields.get('Name', ''),
+        'logo': fields.get('Logo', [{}])[0].get('url', '') if fields.get('Logo') else '',
+        'description': fields.get('Description', ''),
+        'category': fields.get('Category', 'Быт'),
+        'offer': fields.get('Offer', ''),
+        'promoCode': fields.get('PromoCode', ''),
+        'url': fields.get('URL', ''),
+    }
+
+
+def _escape_formula(value: str) -> str:
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+def _request_page(params: Dict[str, Any]) -> Dict[str, Any]:
+    base_id = os.environ.get('AIRTABLE_BASE_ID')
+    table_name = os.environ.get('AIRTABLE_TABLE_NAME', 'Partners')
+    url = f'https://api.airtable.com/v0/{base_id}/{table_name}'
+    headers = {
+        'Authorization': f'Bearer {os.environ.get("AIRTABLE_TOKEN")}',
+        'Content-Type': 'application/json'
+    }
+
+    try:
+        response = request('airtable', 'GET', url, headers=headers, params=params)
+    except requests.RequestException as e:
+        raise CatalogUnavailable(f'Airtable request failed: {e}')
+
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.headers.get('Retry-After') or THROTTLE_BACKOFF)
+        except ValueError:
+            retry_after = THROTTLE_BACKOFF
+        raise CatalogUnavailable('Airtable rate limit', retry_after)
+    if response.status_code != 200:
+        raise CatalogUnavailable(f'Airtable responded {response.status_code}')
+
+    return response.json()
+
+
+def modified_since_formula(moment: str) -> str:
+    return f"IS_AFTER(LAST_MODIFIED_TIME(), '{_escape_formula(moment)}')"
+
+
+def iter_pages(
+    formula: Optional[str] = None,
+    page_size: int = MAX_PAGE_SIZE,
+    offset: Optional[str] = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+    """
+    Постраничный обход таблицы Airtable по offset. Каждая страница отдаётся
+    сразу после получения вместе с курсором следующей страницы.
+    """
+    params: Dict[str, Any] = {'pageSize': min(page_size, MAX_PAGE_SIZE), 'fields[]': PARTNER_FIELDS}
+    if formula:
+        params['filterByFormula'] = formula
+
+    while True:
+        if offset:
+            params['offset'] = offset
+        data = _request_page(params)
+        offset = data.get('offset')
+        yield data.get('records', []), offset
+        if not offset:
+            return
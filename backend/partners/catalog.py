@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import psycopg2
+
+from db import PoolExhausted
+from mirror import load_catalog_json, sync_due, sync_partners
+
+CATALOG_TTL = float(os.environ.get('PARTNERS_CACHE_TTL', '300'))
+CATALOG_STALE_TTL = float(os.environ.get('PARTNERS_CACHE_STALE_TTL', '3600'))
+
+_lock = threading.Lock()
+_refreshing = threading.Event()
+_cache: Dict[str, Any] = {
+    'body': None,
+    'etag': None,
+    'last_modified': None,
+    'fetched_at': 0.0,
+}
+_stats: Dict[str, int] = {'hits': 0, 'stale_hits': 0, 'refreshes': 0, 'refresh_errors': 0, 'syncs': 0}
+
+
+def _store(body: str) -> None:
+    etag = '"' + hashlib.sha1(body.encode('utf-8')).hexdigest() + '"'
+    now = time.time()
+    with _lock:
+        if etag != _cache['etag']:
+            _cache['body'] = body
+            _cache['etag'] = etag
+            _cache['last_modified'] = formatdate(now, usegmt=True)
+        _cache['fetched_at'] = now
+
+
+def refresh(sync: bool = True) -> bool:
+    """
+    Перезагрузка снимка из зеркала в Postgres. Если зеркало пора обновить,
+    сначала выполняется синхронизация с Airtable. При ошибке остаётся
+    последняя удачная копия.
+    """
+    with _lock:
+        _stats['refreshes'] += 1
+    try:
+        if sync:
+            from airtable import airtable_configured
+
+            if airtable_configured() and sync_due():
+                sync_partners()
+                with _lock:
+                    _stats['syncs'] += 1
+        _store(load_catalog_json())
+        return True
+    except (psycopg2.Error, PoolExhausted) as e:
+        with _lock:
+            _stats['refresh_errors'] += 1
+        print(f"Partners catalog refresh failed: {e}")
+        return False
+
+
+def _refresh_in_background() -> None:
+    if _refreshing.is_set():
+        return
+    _refreshing.set()
+
+    def run() -> None:
+        try:
+            refresh()
+        finally:
+            _refreshing.clear()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_catalog() -> Optional[Dict[str, Any]]:
+    """
+    Снимок каталога: свежий — из кеша, устаревший в пределах stale-окна — из кеша
+    с фоновым обновлением, иначе синхронная загрузка из зеркала, а синхронизация
+    с Airtable уходит в фон. None, если данных нет совсем.
+    """
+    age = time.time() - _cache['fetched_at']
+
+    if _cache['body'] is not None and age < CATALOG_TTL:
+        with _lock:
+            _stats['hits'] += 1
+    elif _cache['body'] is not None and age < CATALOG_TTL + CATALOG_STALE_TTL:
+        with _lock:
+            _stats['stale_hits'] += 1
+        _refresh_in_background()
+    else:
+        refresh(sync=False)
+        _refresh_in_background()
+
+    with _lock:
+        if _cache['body'] is None:
+            return None
+        return {
+            'body': _cache['body'],
+            'etag': _cache['etag'],
+            'last_modified': _cache['last_modified'],
+        }
+
+
+def invalidate() -> None:
+    with _lock:
+        _cache['fetched_at'] = 0.0
+
+
+def is_not_modified(request_headers: Dict[str, str], snapshot: Dict[str, Any]) -> bool:
+    """Проверка условного запроса If-None-Match / If-Modified-Since"""
+    headers = {k.lower(): v for k, v in (request_headers or {}).items()}
+
+    if_none_match = headers.get('if-none-match')
+    if if_none_match:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return snapshot['etag'] in tags or '*' in tags
+
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since and snapshot['last_modified']:
+        try:
+            return parsedate_to_datetime(snapshot['last_modified']) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def catalog_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
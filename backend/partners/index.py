@@ -1,12 +1,18 @@
 import json
 import os
-from typing import Dict, Any, List
-import requests
-import psycopg2
+from typing import Dict, Any
 
+from tokens import issue_token, near_expiry, verify_token
+from responses import JSON_HEADERS, admin_password_matches, compressed, error, json_response, preflight
+from tracing import traced
+
+CACHE_CONTROL = f"public, max-age=60, stale-while-revalidate={int(os.environ.get('PARTNERS_CACHE_STALE_TTL', '3600'))}"
+
+@traced
+@compressed
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    API для работы с партнёрами клуба: проверка доступа, получение списка партнёров из Airtable
+    API для работы с партнёрами клуба: проверка доступа, каталог партнёров из зеркала Airtable в Postgres
     Args: event - dict с httpMethod, body, queryStringParameters
           context - объект с request_id, function_name и другими атрибутами
     Returns: HTTP ответ с данными партнёров или результатом проверки доступа
@@ -14,106 +20,112 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight('GET, POST, OPTIONS', 'Content-Type, X-User-Id')
     
     if method == 'POST':
+        from ratelimit import throttle
+        
         body_data = json.loads(event.get('body', '{}'))
         email = body_data.get('email', '').strip().lower()
         
+        rejected = throttle(event, 'access', email)
+        if rejected:
+            return rejected
+        
+        from access import active_member_id, is_revoked
+        
+        if body_data.get('token'):
+            claims = verify_token(body_data['token'])
+            if claims is not None:
+                if not near_expiry(claims) and not is_revoked(claims['sid'], claims['iat'], claims['em']):
+                    return json_response(200, {'authorized': True})
+                email = claims['em']
+            elif not email:
+                return json_response(200, {'authorized': False})
+        
         if not email:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Email обязателен'}),
-                'isBase64Encoded': False
-            }
+            return error(400, 'Email обязателен')
         
-        conn = psycopg2.connect(os.environ['DATABASE_URL'])
-        cur = conn.cursor()
+        member_id = active_member_id(email)
+        result: Dict[str, Any] = {'authorized': member_id is not None}
         
-        try:
-            cur.execute(
-                f"SELECT status FROM t_p48299329_nomad_hub_landing.subscribers WHERE email = '{email}'"
-            )
-            result = cur.fetchone()
-            
-            authorized = result is not None and result[0] == 'active'
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'authorized': authorized}),
-                'isBase64Encoded': False
-            }
-        finally:
-            cur.close()
-            conn.close()
+        if member_id is not None:
+            token = issue_token(member_id, email)
+            if token:
+                result['token'] = token
+        
+        return json_response(200, result)
     
     if method == 'GET':
-        airtable_token = os.environ.get('AIRTABLE_TOKEN')
-        base_id = os.environ.get('AIRTABLE_BASE_ID')
-        table_name = os.environ.get('AIRTABLE_TABLE_NAME', 'Partners')
+        from catalog import get_catalog, invalidate, is_not_modified
+        from mirror import sync_partners
         
-        if not airtable_token or not base_id:
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'partners': []}),
-                'isBase64Encoded': False
-            }
+        query_params = event.get('queryStringParameters') or {}
+        request_headers = event.get('headers', {})
+        admin_password = request_headers.get('x-admin-password', request_headers.get('X-Admin-Password', ''))
         
-        url = f'https://api.airtable.com/v0/{base_id}/{table_name}'
-        headers = {
-            'Authorization': f'Bearer {airtable_token}',
-            'Content-Type': 'application/json'
-        }
+        is_admin = admin_password_matches(admin_password)
+        
+        if query_params.get('sync') and is_admin:
+            result = sync_partners(force=True, full=bool(query_params.get('full')))
+            invalidate()
+            return json_response(200 if result['status'] != 'failed' else 502, {'sync': result})
+        
+        if query_params.get('stats') and is_admin:
+            from access import access_stats
+            from catalog import catalog_stats
+            from db import pool_stats
+            
+            return json_response(200, {'pool': pool_stats(), 'catalog': catalog_stats(), 'access': access_stats()})
+        
+        if query_params.get('refresh') and is_admin:
+            invalidate()
+        
+        if any(query_params.get(key) for key in ('category', 'q', 'limit', 'cursor')):
+            return get_partners_page(query_params)
+        
+        snapshot = get_catalog()
         
-        response = requests.get(url, headers=headers)
+        if snapshot is None:
+            return json_response(200, {'partners': []})
         
-        if response.status_code != 200:
+        cache_headers = {
+            'ETag': snapshot['etag'],
+            'Last-Modified': snapshot['last_modified'],
+            'Cache-Control': CACHE_CONTROL,
+        }
+        
+        if is_not_modified(event.get('headers', {}), snapshot):
             return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'partners': []}),
+                'statusCode': 304,
+                'headers': {'Access-Control-Allow-Origin': '*', **cache_headers},
+                'body': '',
                 'isBase64Encoded': False
             }
         
-        data = response.json()
-        partners: List[Dict[str, Any]] = []
-        
-        for record in data.get('records', []):
-            fields = record.get('fields', {})
-            partners.append({
-                'id': record['id'],
-                'name': fields.get('Name', ''),
-                'logo': fields.get('Logo', [{}])[0].get('url', '') if fields.get('Logo') else '',
-                'description': fields.get('Description', ''),
-                'category': fields.get('Category', 'Быт'),
-                'offer': fields.get('Offer', ''),
-                'promoCode': fields.get('PromoCode', ''),
-                'url': fields.get('URL', ''),
-            })
-        
         return {
             'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'partners': partners}),
+            'headers': {**JSON_HEADERS, **cache_headers},
+            'body': snapshot['body'],
             'isBase64Encoded': False
         }
     
-    return {
-        'statusCode': 405,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Method not allowed'}),
-        'isBase64Encoded': False
-    }
\ No newline at end of file
+    return error(405, 'Method not allowed')
+
+
+def get_partners_page(query_params: Dict[str, Any]) -> Dict[str, Any]:
+    """Страница каталога из зеркала в Postgres: фильтр по категории, поиск q, курсор"""
+    from mirror import MAX_PAGE_SIZE, search_partners
+    
+    try:
+        limit = int(query_params.get('limit') or MAX_PAGE_SIZE)
+        offset = int(query_params.get('cursor') or 0)
+    except ValueError:
+        limit, offset = 0, 0
+    
+    if not 1 <= limit <= MAX_PAGE_SIZE or offset < 0:
+        return error(400, f'limit должен быть от 1 до {MAX_PAGE_SIZE}')
+    
+    page = search_partners(query_params.get('category'), (query_params.get('q') or '').strip(), limit, offset)
+    
+    return json_response(200, page)
@@ -0,0 +1,272 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from db import get_connection
+
+SYNC_INTERVAL = float(os.environ.get('PARTNERS_SYNC_INTERVAL', '300'))
+FULL_SYNC_INTERVAL = float(os.environ.get('PARTNERS_FULL_SYNC_INTERVAL', '86400'))
+SYNC_LEASE = float(os.environ.get('PARTNERS_SYNC_LEASE', '300'))
+WATERMARK_OVERLAP = timedelta(minutes=2)
+SEARCH_CONFIG = 'russian'
+MAX_PAGE_SIZE = 100
+
+PARTNER_COLUMNS = """
+    json_build_object(
+        'id', airtable_id,
+        'name', name,
+        'logo', logo,
+        'description', description,
+        'category', category,
+        'offer', offer,
+        'promoCode', promo_code,
+        'url', url
+    )
+"""
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _stage_page(records: List[Dict[str, Any]]) -> None:
+    """Страница Airtable в partners_sync_staging отдельной короткой транзакцией"""
+    from airtable import normalize_record
+
+    rows = []
+    for record in records:
+        partner = normalize_record(record)
+        created_at = record.get('createdTime')
+        rows.append((
+            partner['id'], partner['name'], partner['logo'], partner['description'], partner['category'],
+            partner['offer'], partner['promoCode'], partner['url'],
+            datetime.fromisoformat(created_at.replace('Z', '+00:00')).replace(tzinfo=None) if created_at else None,
+        ))
+    if not rows:
+        return
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            execute_values(
+                cur,
+                """INSERT INTO partners_sync_staging
+                   (airtable_id, name, logo, description, category, offer, promo_code, url, airtable_created_at)
+                   VALUES %s
+                   ON CONFLICT (airtable_id) DO UPDATE SET
+                   name = EXCLUDED.name,
+                   logo = EXCLUDED.logo,
+                   description = EXCLUDED.description,
+                   category = EXCLUDED.category,
+                   offer = EXCLUDED.offer,
+                   promo_code = EXCLUDED.promo_code,
+                   url = EXCLUDED.url,
+                   airtable_created_at = EXCLUDED.airtable_created_at""",
+                rows,
+                page_size=len(rows)
+            )
+            conn.commit()
+        finally:
+            cur.close()
+
+
+def _claim_sync() -> Optional[Tuple[Any, Any, Any]]:
+    """
+    Аренда синхронизации на SYNC_LEASE секунд; None — её держит другой контейнер.
+    Вместе с арендой очищается staging от прерванного прохода.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """UPDATE partners_sync_state SET lease_until = %s
+                   WHERE id = 1 AND (lease_until IS NULL OR lease_until < %s)
+                   RETURNING watermark, last_full_sync_at, synced_at""",
+                (_utcnow() + timedelta(seconds=SYNC_LEASE), _utcnow())
+            )
+            state = cur.fetchone()
+            if state is not None:
+                cur.execute("TRUNCATE partners_sync_staging")
+            conn.commit()
+        finally:
+            cur.close()
+    return state
+
+
+def _release_sync() -> None:
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("UPDATE partners_sync_state SET lease_until = NULL WHERE id = 1")
+            conn.commit()
+        finally:
+            cur.close()
+
+
+def _apply_staging(started_at: datetime, full: bool) -> Tuple[int, int]:
+    """Перенос staging в partners одной короткой транзакцией; возвращает (upserted, deleted)"""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """INSERT INTO partners
+                   (airtable_id, name, logo, description, category, offer, promo_code, url, airtable_created_at)
+                   SELECT airtable_id, name, logo, description, category, offer, promo_code, url, airtable_created_at
+                   FROM partners_sync_staging
+                   ON CONFLICT (airtable_id) DO UPDATE SET
+                   name = EXCLUDED.name,
+                   logo = EXCLUDED.logo,
+                   description = EXCLUDED.description,
+                   category = EXCLUDED.category,
+                   offer = EXCLUDED.offer,
+                   promo_code = EXCLUDED.promo_code,
+                   url = EXCLUDED.url,
+                   airtable_created_at = EXCLUDED.airtable_created_at,
+                   deleted = FALSE,
+                   synced_at = CURRENT_TIMESTAMP"""
+            )
+            upserted = cur.rowcount
+
+            deleted = 0
+            if full:
+                cur.execute(
+                    """UPDATE partners SET deleted = TRUE, synced_at = CURRENT_TIMESTAMP
+                       WHERE NOT deleted
+                         AND NOT EXISTS (SELECT 1 FROM partners_sync_staging s WHERE s.airtable_id = partners.airtable_id)"""
+                )
+                deleted = cur.rowcount
+
+            cur.execute("TRUNCATE partners_sync_staging")
+            cur.execute(
+                """UPDATE partners_sync_state SET watermark = %s, synced_at = %s, lease_until = NULL,
+                   last_full_sync_at = CASE WHEN %s THEN %s ELSE last_full_sync_at END
+                   WHERE id = 1""",
+                (started_at, _utcnow(), full, started_at)
+            )
+            conn.commit()
+        finally:
+            cur.close()
+    return upserted, deleted
+
+
+def sync_partners(force: bool = False, full: bool = False) -> Dict[str, Any]:
+    """
+    Зеркалирование Airtable в таблицу partners. Обычно забираются только
+    записи, изменённые после прошлой синхронизации (LAST_MODIFIED_TIME);
+    раз в FULL_SYNC_INTERVAL проход полный и помечает удалённые записи.
+    Одновременно синхронизирует один контейнер: он берёт аренду lease_until
+    и складывает страницы в partners_sync_staging по мере получения, без
+    транзакции на время запросов к Airtable. Затем staging переносится в
+    partners одной короткой транзакцией, которая снимает аренду.
+    """
+    from airtable import CatalogUnavailable, iter_pages, modified_since_formula
+
+    state = _claim_sync()
+    if state is None:
+        return {'status': 'skipped', 'reason': 'sync in progress'}
+
+    applied = False
+    try:
+        watermark, last_full_sync_at, synced_at = state
+        started_at = _utcnow()
+
+        if not force and synced_at and started_at - synced_at < timedelta(seconds=SYNC_INTERVAL):
+            return {'status': 'skipped', 'reason': 'fresh'}
+
+        full = (
+            full
+            or watermark is None
+            or last_full_sync_at is None
+            or started_at - last_full_sync_at >= timedelta(seconds=FULL_SYNC_INTERVAL)
+        )
+        formula = None if full else modified_since_formula(f'{(watermark - WATERMARK_OVERLAP).isoformat()}Z')
+
+        try:
+            for records, _ in iter_pages(formula):
+                _stage_page(records)
+        except CatalogUnavailable as e:
+            print(f"Partners sync failed: {e}")
+            return {'status': 'failed', 'error': str(e)}
+
+        upserted, deleted = _apply_staging(started_at, full)
+        applied = True
+        return {'status': 'synced', 'mode': 'full' if full else 'incremental', 'upserted': upserted, 'deleted': deleted}
+    finally:
+        if not applied:
+            try:
+                _release_sync()
+            except Exception as e:
+                print(f"Partners sync lease release failed: {e}")
+
+
+def sync_due() -> bool:
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT synced_at FROM partners_sync_state WHERE id = 1")
+            row = cur.fetchone()
+            conn.rollback()
+        finally:
+            cur.close()
+    return row is None or row[0] is None or _utcnow() - row[0] >= timedelta(seconds=SYNC_INTERVAL)
+
+
+def load_catalog_json() -> str:
+    """Весь каталог одной строкой JSON, собранной в Postgres"""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"""
+                SELECT COALESCE(json_agg({PARTNER_COLUMNS} ORDER BY airtable_created_at, airtable_id), '[]'::json)::text
+                FROM partners
+                WHERE NOT deleted
+            """)
+            body = cur.fetchone()[0]
+            conn.rollback()
+        finally:
+            cur.close()
+    return '{"partners": ' + body + '}'
+
+
+def search_partners(category: Optional[str], query: Optional[str], limit: int, offset: int) -> Dict[str, Any]:
+    """Фильтр по категории и полнотекстовый/триграммный поиск по названию, описанию и офферу"""
+    conditions = ['NOT deleted']
+    params: Dict[str, Any] = {'limit': limit + 1, 'offset': offset, 'config': SEARCH_CONFIG}
+    order = 'airtable_created_at, airtable_id'
+
+    if category:
+        conditions.append('category = %(category)s')
+        params['category'] = category
+
+    if query:
+        conditions.append(
+            "(search_vector @@ websearch_to_tsquery(%(config)s::regconfig, %(query)s) OR search_text ILIKE %(like)s)"
+        )
+        params['query'] = query
+        params['like'] = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        order = (
+            "ts_rank(search_vector, websearch_to_tsquery(%(config)s::regconfig, %(query)s)) DESC, "
+            "similarity(search_text, %(query)s) DESC, airtable_id"
+        )
+
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"""
+                SELECT {PARTNER_COLUMNS}
+                FROM partners
+                WHERE {' AND '.join(conditions)}
+                ORDER BY {order}
+                LIMIT %(limit)s OFFSET %(offset)s
+            """, params)
+            partners = [row[0] for row in cur.fetchall()]
+            conn.rollback()
+        finally:
+            cur.close()
+
+    next_cursor = None
+    if len(partners) > limit:
+        partners = partners[:limit]
+        next_cursor = str(offset + limit)
+    return {'partners': partners, 'next_cursor': next_cursor}
@@ -0,0 +1,134 @@
+import math
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from responses import error
+
+LIMITS: Dict[str, Tuple[float, float]] = {
+    kind: (per_minute, per_minute / 60)
+    for kind, per_minute in (
+        ('ip', float(os.environ.get('RATE_LIMIT_IP_PER_MINUTE', '30'))),
+        ('email', float(os.environ.get('RATE_LIMIT_EMAIL_PER_MINUTE', '5'))),
+    )
+}
+SHARED = os.environ.get('RATE_LIMIT_SHARED', '0') == '1'
+MAX_BUCKETS = int(os.environ.get('RATE_LIMIT_MAX_BUCKETS', '10000'))
+SHED_RETRY_AFTER = 1
+
+_lock = threading.Lock()
+_buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+_stats: Dict[str, int] = {'allowed': 0, 'limited_local': 0, 'limited_shared': 0, 'shed': 0, 'shared_errors': 0}
+
+
+def client_ip(event: Dict[str, Any]) -> Optional[str]:
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    return identity.get('sourceIp')
+
+
+def _take_local(key: str, capacity: float, per_second: float) -> float:
+    """Токен из корзины контейнера; 0 — можно, иначе через сколько секунд появится токен"""
+    now = time.monotonic()
+    with _lock:
+        tokens, updated = _buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * per_second)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / per_second
+        _buckets[key] = (tokens, now)
+        while len(_buckets) > MAX_BUCKETS:
+            _buckets.popitem(last=False)
+    return wait
+
+
+def _take_shared(keys: List[Tuple[str, float, float]]) -> float:
+    """Те же корзины в rate_limit_buckets: лимит общий для всех контейнеров функции"""
+    import psycopg2
+
+    from db import PoolExhausted, get_connection
+
+    try:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            try:
+                wait = 0.0
+                for key, capacity, per_second in keys:
+                    cur.execute("SELECT rate_limit_take(%s, %s, %s)", (key, capacity, per_second))
+                    wait = max(wait, cur.fetchone()[0])
+                conn.commit()
+                return wait
+            finally:
+                cur.close()
+    except (psycopg2.Error, PoolExhausted) as e:
+        print(f"Shared rate limit unavailable: {e}")
+        with _lock:
+            _stats['shared_errors'] += 1
+        return 0.0
+
+
+def check(event: Dict[str, Any], scope: str, email: Optional[str] = None) -> int:
+    """
+    Token bucket по IP клиента и email для публичного действия scope.
+    Возвращает 0, если запрос можно выполнять, иначе значение Retry-After в секундах.
+    С RATE_LIMIT_SHARED=1 после локальной проверки списывается и общий счётчик в Postgres.
+    """
+    keys = [
+        (f'{scope}:{kind}:{value}', *LIMITS[kind])
+        for kind, value in (('ip', client_ip(event)), ('email', (email or '').strip().lower()))
+        if value and LIMITS[kind][0] > 0
+    ]
+
+    wait = max((_take_local(*key) for key in keys), default=0.0)
+    counter = 'limited_local'
+    if not wait and SHARED and keys:
+        wait = _take_shared(keys)
+        counter = 'limited_shared'
+
+    with _lock:
+        _stats[counter if wait else 'allowed'] += 1
+    return math.ceil(wait) if wait else 0
+
+
+def shed() -> bool:
+    """
+    Ранний отказ, пока пул соединений контейнера занят или Postgres недавно не
+    принял подключение. Если db ещё не импортирован, пул пуст и сбрасывать нечего.
+    """
+    db = sys.modules.get('db')
+    if db is None or not db.saturated():
+        return False
+    with _lock:
+        _stats['shed'] += 1
+    return True
+
+
+def throttle(event: Dict[str, Any], scope: str, email: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Готовый ответ 503 или 429 с Retry-After, если запрос выполнять не нужно; иначе None"""
+    if shed():
+        return error(503, 'Service busy', {'Retry-After': str(SHED_RETRY_AFTER)})
+    retry_after = check(event, scope, email)
+    if retry_after:
+        return error(429, 'Too many requests', {'Retry-After': str(retry_after)})
+    return None
+
+
+def prune_shared(conn: Any) -> int:
+    """Удаление корзин, которые не трогали больше суток"""
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM rate_limit_buckets WHERE updated_at < NOW() - INTERVAL '1 day'")
+        deleted = cur.rowcount
+        conn.commit()
+        return deleted
+    finally:
+        cur.close()
+
+
+def ratelimit_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,60 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+TOKEN_TTL = int(os.environ.get('ACCESS_TOKEN_TTL', '86400'))
+REFRESH_WINDOW = int(os.environ.get('ACCESS_TOKEN_REFRESH_WINDOW', '3600'))
+
+
+def _secret() -> Optional[bytes]:
+    secret = os.environ.get('ACCESS_TOKEN_SECRET')
+    return secret.encode('utf-8') if secret else None
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+def issue_token(member_id: int, email: str) -> Optional[str]:
+    """Компактный HMAC-токен доступа: id участника, email, статус и срок действия"""
+    secret = _secret()
+    if secret is None:
+        return None
+    now = int(time.time())
+    claims = {'sid': member_id, 'em': email, 'st': 'active', 'iat': now, 'exp': now + TOKEN_TTL}
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    signature = _b64encode(hmac.new(secret, payload.encode('ascii'), hashlib.sha256).digest())
+    return f'{payload}.{signature}'
+
+
+def verify_token(token: str) -> Optional[Dict[str, Any]]:
+    """Локальная проверка подписи и срока; None для поддельных и просроченных токенов"""
+    secret = _secret()
+    if secret is None or not isinstance(token, str) or not token.isascii() or token.count('.') != 1:
+        return None
+
+    payload, signature = token.split('.')
+    expected = _b64encode(hmac.new(secret, payload.encode('ascii'), hashlib.sha256).digest())
+    if not hmac.compare_digest(signature, expected):
+        return None
+
+    try:
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    if not isinstance(claims, dict) or claims.get('st') != 'active' or claims.get('exp', 0) <= time.time():
+        return None
+    return claims
+
+
+def near_expiry(claims: Dict[str, Any]) -> bool:
+    return claims['exp'] - time.time() < REFRESH_WINDOW
@@ -0,0 +1,191 @@
+import contextvars
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+TRACE_ENABLED = os.environ.get('TRACE_ENABLED', '1') == '1'
+TRACE_MAX_SPANS = int(os.environ.get('TRACE_MAX_SPANS', '50'))
+PROFILE_RATE = float(os.environ.get('TRACE_PROFILE_RATE', '0'))
+PROFILE_INTERVAL = float(os.environ.get('TRACE_PROFILE_INTERVAL_MS', '5')) / 1000
+PROFILE_TOP = 15
+
+_loaded_at = time.perf_counter()
+_invocations = 0
+_current: contextvars.ContextVar[Optional['Trace']] = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    """Спаны одного вызова handler; дополняется из любых потоков"""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.totals: Dict[str, Dict[str, float]] = {}
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def add(self, kind: str, ms: float, detail: Optional[str] = None) -> None:
+        with self.lock:
+            total = self.totals.setdefault(kind, {'count': 0, 'ms': 0.0})
+            total['count'] += 1
+            total['ms'] += ms
+            if len(self.spans) >= TRACE_MAX_SPANS:
+                self.dropped += 1
+                return
+            span: Dict[str, Any] = {
+                'kind': kind,
+                'at_ms': round((time.perf_counter() - self.started) * 1000 - ms, 2),
+                'ms': round(ms, 2),
+            }
+            if detail:
+                span['detail'] = detail
+            self.spans.append(span)
+
+
+class _Sampler:
+    """Сэмплирующий профайлер: раз в PROFILE_INTERVAL снимает стек потока handler"""
+
+    def __init__(self, thread_id: int):
+        self.thread_id = thread_id
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self.stopped.wait(PROFILE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < 4:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[' < '.join(stack)] += 1
+                self.samples += 1
+
+    def __enter__(self) -> '_Sampler':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'interval_ms': PROFILE_INTERVAL * 1000,
+            'samples': self.samples,
+            'top': [{'stack': stack, 'samples': count} for stack, count in self.stacks.most_common(PROFILE_TOP)],
+        }
+
+
+def record(kind: str, ms: float, detail: Optional[str] = None) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.add(kind, ms, detail)
+
+
+@contextmanager
+def span(kind: str, detail: Optional[str] = None) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, (time.perf_counter() - started) * 1000, detail)
+
+
+def propagate(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Обёртка для пула потоков: спаны из рабочих потоков попадают в трассу вызова"""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def _body_action(event: Dict[str, Any]) -> Optional[str]:
+    """action из JSON-тела POST; тело разбирается, только если в нём есть ключ action"""
+    body = event.get('body')
+    if not isinstance(body, str) or event.get('isBase64Encoded') or '"action"' not in body:
+        return None
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    action = data.get('action') if isinstance(data, dict) else None
+    return action if isinstance(action, str) else None
+
+
+def _tags(event: Dict[str, Any]) -> Dict[str, Any]:
+    query = event.get('queryStringParameters') or {}
+    tags = {'method': event.get('httpMethod')}
+    action = query.get('action') or _body_action(event)
+    if action:
+        tags['action'] = action
+    return tags
+
+
+def traced(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]]) -> Callable[[Dict[str, Any], Any], Dict[str, Any]]:
+    """
+    Одна JSON-строка в лог на вызов: request_id, холодный ли старт, длительность,
+    статус и спаны подключения к БД, запросов, внешних вызовов и сериализации.
+    С вероятностью TRACE_PROFILE_RATE вызов идёт под сэмплирующим профайлером.
+    """
+    @functools.wraps(handler)
+    def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        global _invocations
+        if not TRACE_ENABLED:
+            return handler(event, context)
+
+        _invocations += 1
+        cold = _invocations == 1
+        trace = Trace()
+        token = _current.set(trace)
+        sampler = _Sampler(threading.get_ident()) if PROFILE_RATE and random.random() < PROFILE_RATE else None
+        response: Optional[Dict[str, Any]] = None
+        error: Optional[str] = None
+
+        try:
+            if sampler:
+                with sampler:
+                    response = handler(event, context)
+            else:
+                response = handler(event, context)
+            return response
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            _current.reset(token)
+            line: Dict[str, Any] = {
+                'trace': 'invocation',
+                'request_id': getattr(context, 'request_id', None),
+                'function': getattr(context, 'function_name', None) or os.path.basename(os.path.dirname(os.path.abspath(__file__))),
+                'cold': cold,
+                'duration_ms': round((time.perf_counter() - trace.started) * 1000, 2),
+                'status': response.get('statusCode') if response else None,
+                **_tags(event),
+                'totals': {kind: {'count': int(t['count']), 'ms': round(t['ms'], 2)} for kind, t in trace.totals.items()},
+                'spans': trace.spans,
+            }
+            if cold:
+                line['since_load_ms'] = round((trace.started - _loaded_at) * 1000, 2)
+            if trace.dropped:
+                line['spans_dropped'] = trace.dropped
+            if error:
+                line['error'] = error
+            if sampler:
+                line['profile'] = sampler.report()
+            print(json.dumps(line, ensure_ascii=False))
+
+    return wrapper
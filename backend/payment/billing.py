@@ -0,0 +1,242 @@
+import base64
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+from psycopg2.extras import execute_values
+
+from events import record_events
+from http_client import request
+from ledger import claim_events, event_key
+from tracing import propagate
+
+BILLING_BATCH_SIZE = int(os.environ.get('BILLING_BATCH_SIZE', '50'))
+BILLING_CONCURRENCY = int(os.environ.get('BILLING_CONCURRENCY', '4'))
+BILLING_MAX_ATTEMPTS = int(os.environ.get('BILLING_MAX_ATTEMPTS', '4'))
+BILLING_RETRY_HOURS = int(os.environ.get('BILLING_RETRY_HOURS', '24'))
+BILLING_LEASE_MINUTES = 15
+BILLING_PERIOD_DAYS = 30
+NEXT_BILLING_SQL = (
+    "CASE WHEN %s THEN COALESCE((SELECT next_billing_date FROM subscribers WHERE email = %s), NOW())"
+    f" ELSE NOW() END + INTERVAL '{BILLING_PERIOD_DAYS} days'"
+)
+
+_lock = threading.Lock()
+_stats: Dict[str, int] = {'claimed': 0, 'renewed': 0, 'pending': 0, 'past_due': 0, 'expired': 0}
+
+
+def saved_payment_method(payment_data: Dict[str, Any]) -> Optional[str]:
+    """id способа оплаты из уведомления ЮKassa, если пользователь разрешил автоплатежи"""
+    method = payment_data.get('payment_method') or {}
+    return method.get('id') if method.get('saved') else None
+
+
+def _claim(conn: Any, batch_size: int) -> List[Dict[str, Any]]:
+    """
+    Аренда участников с наступившей датой списания. SKIP LOCKED и
+    billing_locked_until не дают двум воркерам взять одного участника.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""UPDATE subscribers SET billing_locked_until = NOW() + INTERVAL '{BILLING_LEASE_MINUTES} minutes'
+               WHERE id IN (
+                   SELECT id FROM subscribers
+                   WHERE subscription_status IN ('active', 'past_due')
+                     AND next_billing_date <= NOW()
+                     AND (billing_locked_until IS NULL OR billing_locked_until < NOW())
+                   ORDER BY subscription_status, next_billing_date
+                   LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+               )
+               RETURNING id, email, name, payment_method_id, payment_amount, next_billing_date, billing_attempts""",
+            (batch_size,)
+        )
+        rows = cur.fetchall()
+        conn.commit()
+    finally:
+        cur.close()
+
+    return [
+        {
+            'id': row[0], 'email': row[1], 'name': row[2], 'payment_method_id': row[3],
+            'amount': row[4] or 990, 'period': row[5].date().isoformat(), 'attempts': row[6] or 0,
+        }
+        for row in rows
+    ]
+
+
+def _charge(subscriber: Dict[str, Any], auth: str) -> Dict[str, Any]:
+    """
+    Рекуррентное списание по сохранённому способу оплаты. Ключ идемпотентности
+    строится из участника, периода и номера попытки: повтор после сбоя воркера
+    вернёт тот же платёж, а не спишет деньги второй раз.
+    """
+    if not subscriber['payment_method_id']:
+        return {'subscriber': subscriber, 'status': 'failed', 'error': 'no saved payment method'}
+
+    payload = {
+        'amount': {'value': f"{subscriber['amount']}.00", 'currency': 'RUB'},
+        'capture': True,
+        'payment_method_id': subscriber['payment_method_id'],
+        'description': 'Продление подписки НОМАД ХАБ Core Member',
+        'metadata': {
+            'email': subscriber['email'],
+            'name': subscriber['name'],
+            'renewal': subscriber['period'],
+        },
+    }
+    idempotence_key = f"renewal-{subscriber['id']}-{subscriber['period']}-{subscriber['attempts']}"
+
+    try:
+        response = request(
+            'yookassa',
+            'POST',
+            'https://api.yookassa.ru/v3/payments',
+            idempotent=True,
+            json=payload,
+            headers={'Authorization': auth, 'Idempotence-Key': idempotence_key, 'Content-Type': 'application/json'}
+        )
+    except requests.RequestException as e:
+        return {'subscriber': subscriber, 'status': 'failed', 'error': str(e)}
+
+    if response.status_code != 200:
+        return {'subscriber': subscriber, 'status': 'failed', 'error': f'YooKassa responded {response.status_code}'}
+
+    payment = response.json()
+    status = payment.get('status')
+    if status == 'succeeded':
+        return {'subscriber': subscriber, 'status': 'renewed', 'payment_id': payment['id']}
+    if status in ('pending', 'waiting_for_capture'):
+        return {'subscriber': subscriber, 'status': 'pending', 'payment_id': payment['id']}
+    reason = (payment.get('cancellation_details') or {}).get('reason', status)
+    return {'subscriber': subscriber, 'status': 'failed', 'payment_id': payment.get('id'), 'error': reason}
+
+
+def _record(conn: Any, charges: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Перевод статусов всей пачки несколькими многострочными командами. Событие
+    created пишется для каждого принятого ЮKassa списания. Если вебхук уже
+    записал оплату в ledger, участник второй раз не продлевается и succeeded
+    не дублируется.
+    """
+    accepted = [charge for charge in charges if charge['status'] in ('renewed', 'pending')]
+    renewed = [charge for charge in charges if charge['status'] == 'renewed']
+    pending = [charge for charge in charges if charge['status'] == 'pending']
+    failed = [charge for charge in charges if charge['status'] == 'failed']
+    counts = {'renewed': 0, 'pending': len(pending), 'past_due': 0, 'expired': 0}
+
+    cur = conn.cursor()
+    try:
+        if renewed:
+            claimed = claim_events(cur, [
+                (event_key('payment.succeeded', charge['payment_id']), charge['payment_id'], 'payment.succeeded')
+                for charge in renewed
+            ])
+            renewed = [
+                charge for charge in renewed
+                if event_key('payment.succeeded', charge['payment_id']) in claimed
+            ]
+            counts['renewed'] = len(renewed)
+
+        if renewed:
+            execute_values(
+                cur,
+                f"""UPDATE subscribers AS s SET subscription_status = 'active', payment_id = v.payment_id,
+                   next_billing_date = s.next_billing_date + INTERVAL '{BILLING_PERIOD_DAYS} days',
+                   billing_attempts = 0, billing_locked_until = NULL
+                   FROM (VALUES %s) AS v(id, payment_id)
+                   WHERE s.id = v.id""",
+                [(charge['subscriber']['id'], charge['payment_id']) for charge in renewed],
+                page_size=len(renewed)
+            )
+
+        if pending:
+            cur.execute(
+                f"UPDATE subscribers SET billing_locked_until = NOW() + INTERVAL '{BILLING_RETRY_HOURS} hours' WHERE id = ANY(%s)",
+                ([charge['subscriber']['id'] for charge in pending],)
+            )
+
+        record_events(cur, [
+            (
+                charge['payment_id'], 'created', charge['subscriber']['id'], charge['subscriber']['amount'],
+                {'email': charge['subscriber']['email'], 'renewal': charge['subscriber']['period']},
+            )
+            for charge in accepted
+        ] + [
+            (charge['payment_id'], 'succeeded', charge['subscriber']['id'], charge['subscriber']['amount'], {'event': 'renewal'})
+            for charge in renewed
+        ])
+
+        if failed:
+            rows = execute_values(
+                cur,
+                f"""UPDATE subscribers AS s SET
+                   billing_attempts = s.billing_attempts + 1,
+                   subscription_status = CASE WHEN s.billing_attempts + 1 >= {BILLING_MAX_ATTEMPTS} THEN 'expired' ELSE 'past_due' END,
+                   billing_locked_until = NOW() + INTERVAL '{BILLING_RETRY_HOURS} hours'
+                   FROM (VALUES %s) AS v(id)
+                   WHERE s.id = v.id
+                   RETURNING s.subscription_status""",
+                [(charge['subscriber']['id'],) for charge in failed],
+                page_size=len(failed),
+                fetch=True
+            )
+            for (status,) in rows:
+                counts[status] += 1
+            for charge in failed:
+                print(f"Renewal failed for subscriber {charge['subscriber']['id']}: {charge['error']}")
+
+        conn.commit()
+    finally:
+        cur.close()
+
+    return counts
+
+
+def run_billing(conn: Any, max_batches: int = 10) -> Dict[str, Any]:
+    """
+    Продление подписок с наступившим next_billing_date: аренда пачки,
+    параллельные списания в ЮKassa (не больше BILLING_CONCURRENCY), затем
+    перевод статусов. Pending-платежи завершит вебхук. После
+    BILLING_MAX_ATTEMPTS неудачных попыток подписка переходит в expired.
+    """
+    shop_id = os.environ.get('YUKASSA_SHOP_ID')
+    secret_key = os.environ.get('YUKASSA_SECRET_KEY')
+    if not shop_id or not secret_key:
+        return {'error': 'Payment configuration missing'}
+    auth = 'Basic ' + base64.b64encode(f'{shop_id}:{secret_key}'.encode('utf-8')).decode('utf-8')
+
+    started = time.monotonic()
+    result = {'claimed': 0, 'renewed': 0, 'pending': 0, 'past_due': 0, 'expired': 0, 'batches': 0}
+
+    with ThreadPoolExecutor(max_workers=BILLING_CONCURRENCY) as executor:
+        for _ in range(max_batches):
+            subscribers = _claim(conn, BILLING_BATCH_SIZE)
+            if not subscribers:
+                break
+            result['batches'] += 1
+            result['claimed'] += len(subscribers)
+
+            charges = list(executor.map(propagate(lambda subscriber: _charge(subscriber, auth)), subscribers))
+            for key, value in _record(conn, charges).items():
+                result[key] += value
+
+            if len(subscribers) < BILLING_BATCH_SIZE:
+                break
+
+    result['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+
+    with _lock:
+        for key in _stats:
+            _stats[key] += result[key]
+
+    return result
+
+
+def billing_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from tracing import record, span
+
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+POOL_WAIT_TIMEOUT = float(os.environ.get('DB_POOL_WAIT_TIMEOUT', '5'))
+HEALTHCHECK_IDLE_SECONDS = float(os.environ.get('DB_POOL_HEALTHCHECK_IDLE', '30'))
+MAX_IDLE_SECONDS = float(os.environ.get('DB_POOL_MAX_IDLE', '300'))
+SHED_AFTER_FAILURE_SECONDS = float(os.environ.get('DB_SHED_AFTER_FAILURE', '5'))
+
+
+class PoolExhausted(Exception):
+    """Все соединения контейнера заняты дольше POOL_WAIT_TIMEOUT"""
+
+
+_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(POOL_MAX_SIZE)
+_idle: List[Tuple[Any, float]] = []
+_connect_failed_at = float('-inf')
+_stats: Dict[str, int] = {
+    'connects': 0,
+    'reuses': 0,
+    'healthchecks': 0,
+    'stale_dropped': 0,
+    'exhausted': 0,
+    'in_use': 0,
+    'dedicated': 0,
+}
+
+
+class TracedCursor(psycopg2.extensions.cursor):
+    """Курсор, который пишет каждый запрос спаном db.query в трассу вызова"""
+
+    def execute(self, query: Any, vars: Any = None) -> Any:
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record('db.query', (time.perf_counter() - started) * 1000, _describe(query))
+
+    def executemany(self, query: Any, vars_list: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record('db.query', (time.perf_counter() - started) * 1000, _describe(query))
+
+
+def _describe(query: Any) -> str:
+    if isinstance(query, bytes):
+        query = query[:200].decode('utf-8', 'replace')
+    return ' '.join(str(query)[:200].split())[:80]
+
+
+def _connect() -> Any:
+    global _connect_failed_at
+    with span('db.connect'):
+        try:
+            conn = psycopg2.connect(os.environ['DATABASE_URL'], cursor_factory=TracedCursor)
+        except psycopg2.OperationalError:
+            _connect_failed_at = time.monotonic()
+            raise
+    with _lock:
+        _stats['connects'] += 1
+    return conn
+
+
+def _is_alive(conn: Any, idle_for: float) -> bool:
+    """Проверка соединения перед выдачей: после простоя контейнера сокет может быть мёртв"""
+    if conn.closed:
+        return False
+    if idle_for > MAX_IDLE_SECONDS:
+        return False
+    if idle_for < HEALTHCHECK_IDLE_SECONDS:
+        return True
+    with _lock:
+        _stats['healthchecks'] += 1
+    try:
+        cur = conn.cursor()
+        cur.execute('SELECT 1')
+        cur.fetchone()
+        cur.close()
+        conn.rollback()
+        return True
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        return False
+
+
+def _discard(conn: Any) -> None:
+    with _lock:
+        _stats['stale_dropped'] += 1
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _acquire() -> Any:
+    if not _slots.acquire(timeout=POOL_WAIT_TIMEOUT):
+        with _lock:
+            _stats['exhausted'] += 1
+        raise PoolExhausted('Database connection pool exhausted')
+
+    try:
+        while True:
+            with _lock:
+                if not _idle:
+                    break
+                conn, released_at = _idle.pop()
+            if _is_alive(conn, time.monotonic() - released_at):
+                with _lock:
+                    _stats['reuses'] += 1
+                    _stats['in_use'] += 1
+                return conn
+            _discard(conn)
+
+        conn = _connect()
+        with _lock:
+            _stats['in_use'] += 1
+        return conn
+    except Exception:
+        _slots.release()
+        raise
+
+
+def _release(conn: Any, broken: bool = False) -> None:
+    try:
+        if broken or conn.closed:
+            _discard(conn)
+        else:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            with _lock:
+                _idle.append((conn, time.monotonic()))
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        _discard(conn)
+    finally:
+        with _lock:
+            _stats['in_use'] -= 1
+        _slots.release()
+
+
+def open_dedicated() -> Any:
+    """
+    Долгоживущее соединение вне пула (например, для LISTEN). Оно занимает
+    слот пула, чтобы контейнер держал не больше POOL_MAX_SIZE соединений.
+    Слот берётся без ожидания; закрывать только через close_dedicated.
+    """
+    if not _slots.acquire(blocking=False):
+        with _lock:
+            _stats['exhausted'] += 1
+        raise PoolExhausted('No pool slot for a dedicated connection')
+    try:
+        conn = _connect()
+    except Exception:
+        _slots.release()
+        raise
+    with _lock:
+        _stats['dedicated'] += 1
+    return conn
+
+
+def close_dedicated(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+    finally:
+        with _lock:
+            _stats['dedicated'] -= 1
+        _slots.release()
+
+
+@contextmanager
+def get_connection() -> Iterator[Any]:
+    """Соединение из пула контейнера; переживает тёплые вызовы функции"""
+    conn = _acquire()
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        _release(conn, broken)
+
+
+def saturated() -> bool:
+    """
+    Новый запрос к БД не стоит начинать: все соединения пула заняты или
+    подключение к Postgres (например, по лимиту max_connections) недавно не удалось
+    """
+    with _lock:
+        busy = _stats['in_use'] + _stats['dedicated'] >= POOL_MAX_SIZE
+    return busy or time.monotonic() - _connect_failed_at < SHED_AFTER_FAILURE_SECONDS
+
+
+def pool_stats() -> Dict[str, int]:
+    """Счётчики пула: новые подключения против повторного использования"""
+    with _lock:
+        stats = dict(_stats)
+        stats['idle'] = len(_idle)
+    stats['max_size'] = POOL_MAX_SIZE
+    return stats
@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+PARTITIONS_AHEAD = 2
+RETENTION_MONTHS = int(os.environ.get('PAYMENT_EVENTS_RETENTION_MONTHS', '13'))
+
+_lock = threading.Lock()
+_stats: Dict[str, int] = {'recorded': 0, 'partitions_created': 0, 'partitions_detached': 0}
+
+PaymentEvent = Tuple[str, str, Optional[int], Optional[int], Dict[str, Any]]
+
+
+def event_amount(payment_data: Dict[str, Any]) -> Optional[int]:
+    """Сумма из уведомления ЮKassa в рублях"""
+    try:
+        return int(float(payment_data['amount']['value']))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def record_events(cur: Any, events: List[PaymentEvent]) -> None:
+    """
+    Добавление событий (payment_id, event_type, subscriber_id, amount, metadata)
+    в payment_events. Таблицу payments как текущее состояние платежа обновляет
+    триггер trg_payment_events_project, сами платежи больше не меняются на месте.
+    """
+    from psycopg2.extras import execute_values
+
+    if not events:
+        return
+    execute_values(
+        cur,
+        """INSERT INTO payment_events (payment_id, event_type, subscriber_id, amount, metadata)
+           SELECT v.payment_id, v.event_type, v.subscriber_id, v.amount, v.metadata::jsonb
+           FROM (VALUES %s) AS v(payment_id, event_type, subscriber_id, amount, metadata)""",
+        [
+            (payment_id, event_type, subscriber_id, amount, json.dumps(metadata))
+            for payment_id, event_type, subscriber_id, amount, metadata in events
+        ],
+        template='(%s, %s, %s::integer, %s::integer, %s)',
+        page_size=len(events)
+    )
+    with _lock:
+        _stats['recorded'] += len(events)
+
+
+def _months_before(months: int) -> date:
+    today = date.today()
+    month_index = today.year * 12 + today.month - 1 - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def maintain_partitions(conn: Any) -> Dict[str, List[str]]:
+    """
+    Месячные партиции payment_events на PARTITIONS_AHEAD месяцев вперёд и
+    отсоединение партиций старше RETENTION_MONTHS (0 — не отсоединять).
+    Отсоединённые payment_events_YYYY_MM остаются отдельными таблицами для архивации.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """SELECT payment_events_ensure_partition((date_trunc('month', CURRENT_DATE) + make_interval(months => n))::date)
+               FROM generate_series(0, %s) AS n""",
+            (PARTITIONS_AHEAD,)
+        )
+        created = [name for (name,) in cur.fetchall() if name]
+        detached: List[str] = []
+        if RETENTION_MONTHS > 0:
+            cur.execute("SELECT payment_events_detach_before(%s)", (_months_before(RETENTION_MONTHS),))
+            detached = [name for (name,) in cur.fetchall()]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    with _lock:
+        _stats['partitions_created'] += len(created)
+        _stats['partitions_detached'] += len(detached)
+    return {'created': created, 'detached': detached}
+
+
+def events_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
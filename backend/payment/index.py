@@ -1,12 +1,14 @@
 import json
 import os
-import base64
-import psycopg2
-import uuid
-from datetime import datetime, timedelta
-from typing import Dict, Any
-import requests
+from typing import Dict, Any, List, Optional
 
+from responses import admin_password_matches, compressed, error, json_response, preflight
+from tracing import traced
+
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', '500'))
+
+@traced
+@compressed
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Обработка платежей через ЮKassa и автоматическая отправка welcome-писем
@@ -14,65 +16,62 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'POST')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return preflight('POST, OPTIONS', 'Content-Type')
     
     if method == 'POST':
         body_data = json.loads(event.get('body', '{}'))
         action = body_data.get('action')
         
         if action == 'create_payment':
-            return create_payment(body_data)
+            return create_payment(event, body_data)
         elif action == 'webhook':
-            return handle_webhook(body_data)
+            return handle_webhook(event, body_data)
+        elif action == 'webhook_batch':
+            return handle_webhook_batch(event, body_data)
+        elif action == 'drain_outbox':
+            return handle_drain_outbox(event)
+        elif action == 'run_billing':
+            return handle_run_billing(event)
         else:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Unknown action'}),
-                'isBase64Encoded': False
-            }
+            return error(400, 'Unknown action')
     
-    return {
-        'statusCode': 405,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Method not allowed'}),
-        'isBase64Encoded': False
-    }
+    return error(405, 'Method not allowed')
+
 
+def is_admin(event: Dict[str, Any]) -> bool:
+    """Проверка X-Admin-Password за постоянное время"""
+    headers = event.get('headers') or {}
+    return admin_password_matches(headers.get('x-admin-password', headers.get('X-Admin-Password', '')))
 
-def create_payment(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Создание платежа в ЮKassa"""
+
+def create_payment(event: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Создание платежа в ЮKassa; лимит по IP и email проверяется до обращения к ЮKassa"""
+    from ratelimit import throttle
+    
     email = data.get('email')
     name = data.get('name', 'Участник')
     
     if not email:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Email is required'}),
-            'isBase64Encoded': False
-        }
+        return error(400, 'Email is required')
+    
+    rejected = throttle(event, 'create_payment', email)
+    if rejected:
+        return rejected
     
     shop_id = os.environ.get('YUKASSA_SHOP_ID')
     secret_key = os.environ.get('YUKASSA_SECRET_KEY')
     
     if not shop_id or not secret_key:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Payment configuration missing'}),
-            'isBase64Encoded': False
-        }
+        return error(500, 'Payment configuration missing')
+    
+    import base64
+    import uuid
+    
+    import requests
+    
+    from db import get_connection
+    from events import record_events
+    from http_client import request
     
     idempotence_key = str(uuid.uuid4())
     
@@ -86,6 +85,7 @@ def create_payment(data: Dict[str, Any]) -> Dict[str, Any]:
             "currency": "RUB"
         },
         "capture": True,
+        "save_payment_method": True,
         "confirmation": {
             "type": "redirect",
             "return_url": data.get('return_url', 'https://nomad-hub.example.com/success')
@@ -97,174 +97,359 @@ def create_payment(data: Dict[str, Any]) -> Dict[str, Any]:
         }
     }
     
-    response = requests.post(
-        'https://api.yookassa.ru/v3/payments',
-        json=payment_data,
-        headers={
-            'Authorization': f'Basic {auth_b64}',
-            'Idempotence-Key': idempotence_key,
-            'Content-Type': 'application/json'
-        }
-    )
+    try:
+        response = request(
+            'yookassa',
+            'POST',
+            'https://api.yookassa.ru/v3/payments',
+            idempotent=True,
+            json=payment_data,
+            headers={
+                'Authorization': f'Basic {auth_b64}',
+                'Idempotence-Key': idempotence_key,
+                'Content-Type': 'application/json'
+            }
+        )
+    except requests.RequestException as e:
+        print(f"YooKassa request failed: {e}")
+        return error(502, 'Payment creation failed')
     
     if response.status_code == 200:
         payment_info = response.json()
         
-        conn = psycopg2.connect(os.environ['DATABASE_URL'])
-        cur = conn.cursor()
-        
-        try:
-            cur.execute(
-                "INSERT INTO payments (payment_id, amount, status, metadata) VALUES (%s, %s, %s, %s)",
-                (payment_info['id'], 990, 'pending', json.dumps({'email': email, 'name': name}))
-            )
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            print(f"Database error: {e}")
-        finally:
-            cur.close()
-            conn.close()
+        with get_connection() as conn:
+            cur = conn.cursor()
+            
+            try:
+                record_events(cur, [(payment_info['id'], 'created', None, 990, {'email': email, 'name': name})])
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Database error: {e}")
+            finally:
+                cur.close()
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'payment_id': payment_info['id'],
-                'confirmation_url': payment_info['confirmation']['confirmation_url']
-            }),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {
+            'payment_id': payment_info['id'],
+            'confirmation_url': payment_info['confirmation']['confirmation_url']
+        })
     else:
-        return {
-            'statusCode': response.status_code,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Payment creation failed', 'details': response.text}),
-            'isBase64Encoded': False
-        }
+        return json_response(response.status_code, {'error': 'Payment creation failed', 'details': response.text})
 
 
-def handle_webhook(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Обработка webhook от ЮKassa после успешной оплаты"""
-    payment_data = data.get('object', {})
-    status = payment_data.get('status')
+def handle_webhook(event: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Обработка webhook от ЮKassa после успешной оплаты. Поддельные и битые
+    уведомления отклоняются в webhook_auth до подключения к БД и писем.
+    """
+    from webhook_auth import ACTIVATION_EVENT, WebhookRejected, activates, verify_notification
+    
+    try:
+        payment_data = verify_notification(event, data)
+    except WebhookRejected as e:
+        return error(e.status, e.message)
+    
+    if payment_data is None:
+        return json_response(200, {'status': 'ignored'})
+    
+    notification = data.get('event', ACTIVATION_EVENT)
     payment_id = payment_data.get('id')
-    metadata = payment_data.get('metadata', {})
+    metadata = payment_data.get('metadata') or {}
     
-    if status == 'succeeded':
+    deduplicated = False
+    
+    if activates(notification, payment_data):
+        from ledger import event_key, seen_recently
+        
         email = metadata.get('email')
         name = metadata.get('name', 'Участник')
+        key = event_key(notification, payment_id)
         
-        promo_code = generate_promo_code()
-        telegram_link = os.environ.get('TELEGRAM_CHAT_LINK', 'https://t.me/nomad_hub')
-        next_billing = datetime.now() + timedelta(days=30)
-        
-        conn = psycopg2.connect(os.environ['DATABASE_URL'])
+        if seen_recently(key):
+            deduplicated = True
+        else:
+            from billing import saved_payment_method
+            from events import event_amount
+            
+            try:
+                deduplicated = process_succeeded_payment(
+                    key, notification, payment_id, email, name,
+                    saved_payment_method(payment_data), bool(metadata.get('renewal')), event_amount(payment_data)
+                )
+            except Exception:
+                return error(500, 'Webhook processing failed')
+    
+    return json_response(200, {'status': 'ok', 'deduplicated': deduplicated})
+
+
+def process_succeeded_payment(key: str, event: str, payment_id: str, email: str, name: str,
+                              payment_method_id: Optional[str] = None, renewal: bool = False,
+                              amount: Optional[int] = None) -> bool:
+    """
+    Активация участника по оплате; возвращает True, если доставка оказалась повторной.
+    Для продлений welcome-письмо не отправляется. Ошибка пробрасывается: вместе
+    с транзакцией откатывается и запись в ledger, и ЮKassa должна получить 5xx,
+    чтобы доставить уведомление повторно.
+    """
+    from billing import NEXT_BILLING_SQL
+    from db import get_connection
+    from events import record_events
+    from ledger import claim_event, remember
+    from outbox import enqueue_email
+    from promo import assign_codes
+    
+    telegram_link = os.environ.get('TELEGRAM_CHAT_LINK', 'https://t.me/nomad_hub')
+    
+    with get_connection() as conn:
         cur = conn.cursor()
         
         try:
+            if not claim_event(cur, key, payment_id, event):
+                conn.commit()
+                remember(key)
+                return True
+            
             cur.execute(
-                """INSERT INTO subscribers (email, name, promo_code, payment_id, next_billing_date, telegram_chat_link)
-                   VALUES (%s, %s, %s, %s, %s, %s)
+                f"""INSERT INTO subscribers (email, name, payment_id, next_billing_date, telegram_chat_link, payment_method_id)
+                   VALUES (%s, %s, %s, {NEXT_BILLING_SQL}, %s, %s)
                    ON CONFLICT (email) DO UPDATE SET
                    payment_id = EXCLUDED.payment_id,
                    next_billing_date = EXCLUDED.next_billing_date,
-                   subscription_status = 'active'
-                   RETURNING id""",
-                (email, name, promo_code, payment_id, next_billing, telegram_link)
+                   subscription_status = 'active',
+                   payment_method_id = COALESCE(EXCLUDED.payment_method_id, subscribers.payment_method_id),
+                   billing_attempts = 0,
+                   billing_locked_until = NULL
+                   RETURNING id, promo_code""",
+                (email, name, payment_id, renewal, email, telegram_link, payment_method_id)
             )
-            subscriber_id = cur.fetchone()[0]
+            subscriber_id, promo_code = cur.fetchone()
+            if promo_code is None:
+                promo_code = assign_codes(cur, [subscriber_id])[subscriber_id]
             
-            cur.execute(
-                "UPDATE payments SET status = %s, subscriber_id = %s, completed_at = %s WHERE payment_id = %s",
-                ('completed', subscriber_id, datetime.now(), payment_id)
-            )
-            conn.commit()
+            record_events(cur, [(payment_id, 'succeeded', subscriber_id, amount, {'event': event})])
             
-            send_welcome_email(email, name, promo_code, telegram_link)
+            if not renewal:
+                enqueue_email(cur, 'welcome', email, name, {
+                    'promo_code': promo_code,
+                    'telegram_link': telegram_link
+                })
+            conn.commit()
+            remember(key)
             
         except Exception as e:
             conn.rollback()
             print(f"Webhook processing error: {e}")
+            raise
         finally:
             cur.close()
-            conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'status': 'ok'}),
-        'isBase64Encoded': False
-    }
+    return False
 
 
-def generate_promo_code() -> str:
-    """Генерация уникального промокода"""
-    return f"NOMAD{uuid.uuid4().hex[:8].upper()}"
+def handle_webhook_batch(event: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Пакетная обработка уведомлений ЮKassa (повтор очереди, всплески после запуска).
+    Каждая пачка — одна транзакция с многострочными INSERT ... ON CONFLICT и UPDATE ... FROM (VALUES ...)
+    Если хоть одна пачка откатилась, ответ 500: элементы с result 'error' нужно отправить повторно.
+    """
+    if not is_admin(event):
+        return error(403, 'Forbidden')
+    
+    notifications = data.get('notifications')
+    
+    if not isinstance(notifications, list):
+        return error(400, 'notifications must be a list')
+    
+    results: List[Dict[str, Any]] = []
+    
+    for offset in range(0, len(notifications), WEBHOOK_BATCH_SIZE):
+        results.extend(process_webhook_batch(notifications[offset:offset + WEBHOOK_BATCH_SIZE], offset))
+    
+    summary: Dict[str, int] = {}
+    for item in results:
+        summary[item['result']] = summary.get(item['result'], 0) + 1
+    
+    return json_response(500 if summary.get('error') else 200, {'results': results, 'summary': summary})
 
 
-def send_welcome_email(email: str, name: str, promo_code: str, telegram_link: str):
-    """Отправка welcome-письма через SendGrid"""
-    api_key = os.environ.get('SENDGRID_API_KEY')
-    
-    if not api_key:
-        print("SendGrid API key not configured")
-        return
-    
-    message = {
-        "personalizations": [{
-            "to": [{"email": email, "name": name}],
-            "subject": "Добро пожаловать в НОМАД ХАБ! 🚀"
-        }],
-        "from": {"email": "welcome@nomad-hub.com", "name": "НОМАД ХАБ"},
-        "content": [{
-            "type": "text/html",
-            "value": f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <h1 style="color: #E07A5F;">Добро пожаловать в НОМАД ХАБ!</h1>
-                <p>Привет, {name}! 👋</p>
-                <p>Спасибо за подписку на Core Member. Теперь у вас есть доступ ко всем возможностям клуба!</p>
-                
-                <h2 style="color: #0F1A2B;">Ваша ссылка для вступления в закрытый чат:</h2>
-                <p><a href="{telegram_link}" style="background: #E07A5F; color: white; padding: 12px 24px; text-decoration: none; border-radius: 8px; display: inline-block;">Вступить в Telegram-чат</a></p>
-                
-                <h2 style="color: #0F1A2B;">Ваш личный код для скидок у партнёров:</h2>
-                <p style="font-size: 24px; font-weight: bold; color: #E07A5F; background: #F4F1DE; padding: 16px; border-radius: 8px; display: inline-block;">{promo_code}</p>
-                
-                <p>Используйте этот код для получения скидок 5-15% у наших партнёров!</p>
-                
-                <hr style="border: none; border-top: 1px solid #ddd; margin: 32px 0;">
+def process_webhook_batch(notifications: List[Any], offset: int) -> List[Dict[str, Any]]:
+    """Одна пачка уведомлений: ledger, upsert участников, события payment_events и outbox за 4 запроса"""
+    from billing import saved_payment_method
+    from events import event_amount
+    from ledger import claim_events, event_key, remember, seen_recently
+    from webhook_auth import ACTIVATION_EVENT, WebhookRejected, activates, check_shape
+    
+    results: List[Dict[str, Any]] = []
+    pending: Dict[str, Dict[str, Any]] = {}
+    
+    for index, notification in enumerate(notifications, start=offset):
+        result: Dict[str, Any] = {'index': index, 'payment_id': None, 'result': 'ignored'}
+        results.append(result)
+        
+        try:
+            payment_data = check_shape(notification)
+        except WebhookRejected:
+            result['result'] = 'invalid'
+            continue
+        
+        if payment_data is None:
+            continue
+        
+        payment_id = result['payment_id'] = payment_data['id']
+        event = notification.get('event', ACTIVATION_EVENT)
+        if not activates(event, payment_data):
+            continue
+        
+        metadata = payment_data['metadata']
+        
+        key = event_key(event, payment_id)
+        if key in pending or seen_recently(key):
+            result['result'] = 'duplicate'
+            continue
+        
+        pending[key] = {
+            'result': result,
+            'event': event,
+            'payment_id': payment_id,
+            'email': metadata['email'],
+            'name': metadata.get('name', 'Участник'),
+            'payment_method_id': saved_payment_method(payment_data),
+            'renewal': bool(metadata.get('renewal')),
+            'amount': event_amount(payment_data),
+        }
+    
+    if not pending:
+        return results
+    
+    from psycopg2.extras import execute_values
+    
+    from billing import NEXT_BILLING_SQL
+    from db import get_connection
+    from events import record_events
+    from outbox import enqueue_emails
+    from promo import assign_codes
+    
+    telegram_link = os.environ.get('TELEGRAM_CHAT_LINK', 'https://t.me/nomad_hub')
+    
+    with get_connection() as conn:
+        cur = conn.cursor()
+        
+        try:
+            claimed = claim_events(cur, [(key, item['payment_id'], item['event']) for key, item in pending.items()])
+            
+            latest_by_email: Dict[str, Dict[str, Any]] = {}
+            for key, item in pending.items():
+                if key in claimed:
+                    latest_by_email[item['email']] = item
+                else:
+                    item['result']['result'] = 'duplicate'
+            
+            subscriber_ids: Dict[str, int] = {}
+            promo_codes: Dict[str, str] = {}
+            
+            if latest_by_email:
+                rows = execute_values(
+                    cur,
+                    """INSERT INTO subscribers (email, name, payment_id, next_billing_date, telegram_chat_link, payment_method_id)
+                       VALUES %s
+                       ON CONFLICT (email) DO UPDATE SET
+                       payment_id = EXCLUDED.payment_id,
+                       next_billing_date = EXCLUDED.next_billing_date,
+                       subscription_status = 'active',
+                       payment_method_id = COALESCE(EXCLUDED.payment_method_id, subscribers.payment_method_id),
+                       billing_attempts = 0,
+                       billing_locked_until = NULL
+                       RETURNING id, email, promo_code""",
+                    [
+                        (email, item['name'], item['payment_id'], item['renewal'], email, telegram_link, item['payment_method_id'])
+                        for email, item in latest_by_email.items()
+                    ],
+                    template=f'(%s, %s, %s, {NEXT_BILLING_SQL}, %s, %s)',
+                    page_size=WEBHOOK_BATCH_SIZE,
+                    fetch=True
+                )
+                for subscriber_id, email, promo_code in rows:
+                    subscriber_ids[email] = subscriber_id
+                    promo_codes[email] = promo_code
                 
-                <h3>Что дальше?</h3>
-                <ul>
-                    <li>Присоединяйтесь к Telegram-чату и знакомьтесь с сообществом</li>
-                    <li>Изучайте базу эксклюзивных проектов</li>
-                    <li>Смотрите записи вебинаров в архиве</li>
-                    <li>Пользуйтесь скидками от партнёров</li>
-                </ul>
+                without_code = [subscriber_ids[email] for email, code in promo_codes.items() if code is None]
+                if without_code:
+                    assigned = assign_codes(cur, without_code)
+                    for email, subscriber_id in subscriber_ids.items():
+                        if subscriber_id in assigned:
+                            promo_codes[email] = assigned[subscriber_id]
                 
-                <p>Если у вас есть вопросы, просто ответьте на это письмо!</p>
+                record_events(cur, [
+                    (item['payment_id'], 'succeeded', subscriber_ids[item['email']], item['amount'], {'event': item['event']})
+                    for key, item in pending.items() if key in claimed
+                ])
                 
-                <p style="margin-top: 32px;">С уважением,<br><strong>Команда НОМАД ХАБ</strong></p>
-            </body>
-            </html>
-            """
-        }]
-    }
+                enqueue_emails(cur, [
+                    ('welcome', email, item['name'], {'promo_code': promo_codes[email], 'telegram_link': telegram_link})
+                    for email, item in latest_by_email.items() if not item['renewal']
+                ])
+            
+            conn.commit()
+            
+            for key in pending:
+                remember(key)
+                if key in claimed:
+                    pending[key]['result']['result'] = 'processed'
+        
+        except Exception as e:
+            conn.rollback()
+            print(f"Webhook batch processing error: {e}")
+            for item in pending.values():
+                item['result']['result'] = 'error'
+        finally:
+            cur.close()
     
-    try:
-        response = requests.post(
-            'https://api.sendgrid.com/v3/mail/send',
-            json=message,
-            headers={
-                'Authorization': f'Bearer {api_key}',
-                'Content-Type': 'application/json'
-            }
-        )
-        if response.status_code == 202:
-            print(f"Welcome email sent to {email}")
-        else:
-            print(f"Email sending failed: {response.status_code} - {response.text}")
-    except Exception as e:
-        print(f"Email error: {e}")
+    return results
+
+
+def handle_drain_outbox(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Отправка накопленных писем из email_outbox, пополнение пула промокодов и партиции payment_events; вызывается по расписанию"""
+    if not is_admin(event):
+        return error(403, 'Forbidden')
+    
+    from db import get_connection, pool_stats
+    from events import events_stats, maintain_partitions
+    from http_client import http_stats
+    from ledger import ledger_stats
+    from mailer import send_batch
+    from ratelimit import prune_shared, ratelimit_stats
+    from webhook_auth import webhook_auth_stats
+    from outbox import drain_outbox, outbox_stats
+    from promo import promo_stats, refill_pool
+    
+    with get_connection() as conn:
+        result = drain_outbox(conn, send_batch)
+        promo_pool = refill_pool(conn)
+        partitions = maintain_partitions(conn)
+        pruned_buckets = prune_shared(conn)
+    
+    return json_response(200, {
+        'drain': result,
+        'totals': outbox_stats(),
+        'promo': {**promo_pool, **promo_stats()},
+        'webhooks': {**ledger_stats(), **webhook_auth_stats()},
+        'payment_events': {**partitions, **events_stats()},
+        'rate_limit': {**ratelimit_stats(), 'pruned_buckets': pruned_buckets},
+        'http': http_stats(),
+        'pool': pool_stats()
+    })
+
+
+def handle_run_billing(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Продление подписок с наступившей датой списания; вызывается по расписанию"""
+    if not is_admin(event):
+        return error(403, 'Forbidden')
+    
+    from billing import billing_stats, run_billing
+    from db import get_connection
+    
+    with get_connection() as conn:
+        result = run_billing(conn)
+    
+    return json_response(200 if 'error' not in result else 500, {'billing': result, 'totals': billing_stats()})
+
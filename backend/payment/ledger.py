@@ -0,0 +1,83 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Set, Tuple
+
+RECENT_EVENTS_LIMIT = int(os.environ.get('WEBHOOK_RECENT_EVENTS', '2000'))
+
+_lock = threading.Lock()
+_recent: 'OrderedDict[str, None]' = OrderedDict()
+_stats: Dict[str, int] = {'processed': 0, 'deduplicated_local': 0, 'deduplicated_db': 0}
+
+
+def event_key(event: str, payment_id: str) -> str:
+    return f'{event}:{payment_id}'
+
+
+def seen_recently(key: str) -> bool:
+    """Быстрая проверка без БД: событие уже обработано этим контейнером"""
+    with _lock:
+        if key in _recent:
+            _recent.move_to_end(key)
+            _stats['deduplicated_local'] += 1
+            return True
+    return False
+
+
+def remember(key: str) -> None:
+    with _lock:
+        _recent[key] = None
+        _recent.move_to_end(key)
+        while len(_recent) > RECENT_EVENTS_LIMIT:
+            _recent.popitem(last=False)
+
+
+def claim_event(cur: Any, key: str, payment_id: str, event: str) -> bool:
+    """
+    Запись события в processed_webhooks первой командой транзакции.
+    Повторная доставка ждёт на блокировке строки, пока первая не завершится,
+    и получает False — тяжёлую обработку можно пропустить.
+    """
+    cur.execute(
+        """INSERT INTO processed_webhooks (event_key, payment_id, event)
+           VALUES (%s, %s, %s)
+           ON CONFLICT (event_key) DO UPDATE SET
+           deliveries = processed_webhooks.deliveries + 1,
+           last_delivery_at = CURRENT_TIMESTAMP
+           RETURNING (xmax = 0) AS inserted""",
+        (key, payment_id, event)
+    )
+    inserted = cur.fetchone()[0]
+    with _lock:
+        _stats['processed' if inserted else 'deduplicated_db'] += 1
+    return inserted
+
+
+def claim_events(cur: Any, events: List[Tuple[str, str, str]]) -> Set[str]:
+    """Пакетный вариант claim_event для (event_key, payment_id, event); возвращает впервые записанные ключи"""
+    from psycopg2.extras import execute_values
+
+    if not events:
+        return set()
+    rows = execute_values(
+        cur,
+        """INSERT INTO processed_webhooks (event_key, payment_id, event)
+           VALUES %s
+           ON CONFLICT (event_key) DO UPDATE SET
+           deliveries = processed_webhooks.deliveries + 1,
+           last_delivery_at = CURRENT_TIMESTAMP
+           RETURNING event_key, (xmax = 0) AS inserted""",
+        events,
+        page_size=len(events),
+        fetch=True
+    )
+    claimed = {key for key, inserted in rows if inserted}
+    with _lock:
+        _stats['processed'] += len(claimed)
+        _stats['deduplicated_db'] += len(rows) - len(claimed)
+    return claimed
+
+
+def ledger_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,70 @@
+import os
+from typing import Any, Dict, List
+
+import requests
+
+from http_client import request
+from outbox import EmailSendError
+from templates import TEMPLATES
+
+MAX_PERSONALIZATIONS = 1000
+SENDER = {'email': 'welcome@nomad-hub.com', 'name': 'НОМАД ХАБ'}
+
+
+def _post(payload: Dict[str, Any]) -> requests.Response:
+    api_key = os.environ.get('SENDGRID_API_KEY')
+    if not api_key:
+        raise EmailSendError("SendGrid API key not configured")
+    try:
+        return request(
+            'sendgrid',
+            'POST',
+            'https://api.sendgrid.com/v3/mail/send',
+            json=payload,
+            headers={
+                'Authorization': f'Bearer {api_key}',
+                'Content-Type': 'application/json'
+            }
+        )
+    except requests.RequestException as e:
+        raise EmailSendError(f"Email error: {e}")
+
+
+def send_batch(template_name: str, messages: List[Dict[str, Any]]) -> Dict[int, str]:
+    """
+    Письма одного шаблона из outbox одним запросом SendGrid, не больше
+    MAX_PERSONALIZATIONS получателей. Если SendGrid отверг пачку целиком (4xx),
+    письма уходят по одному, чтобы один плохой адрес не задерживал остальных.
+    Возвращает ошибки по id сообщений; EmailSendError — не ушло ничего.
+    """
+    template = TEMPLATES.get(template_name)
+    if template is None:
+        raise EmailSendError(f"Unknown template {template_name}")
+
+    failures: Dict[int, str] = {}
+    for offset in range(0, len(messages), MAX_PERSONALIZATIONS):
+        chunk = messages[offset:offset + MAX_PERSONALIZATIONS]
+        response = _post({
+            'personalizations': [
+                template.personalization(message['email'], {**message['payload'], 'name': message['name']})
+                for message in chunk
+            ],
+            'from': SENDER,
+            'subject': template.subject,
+            'content': template.content,
+        })
+        if response.status_code == 202:
+            continue
+        if 400 <= response.status_code < 500 and response.status_code != 429 and len(chunk) > 1:
+            for message in chunk:
+                try:
+                    failures.update(send_batch(template_name, [message]))
+                except EmailSendError as e:
+                    failures[message['id']] = str(e)
+            continue
+        error = f"Email sending failed: {response.status_code} - {response.text}"
+        if offset == 0 and len(chunk) == len(messages):
+            raise EmailSendError(error)
+        failures.update({message['id']: error for message in chunk})
+
+    return failures
@@ -0,0 +1,168 @@
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from psycopg2.extras import execute_values
+
+BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '1000'))
+MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '6'))
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 3600
+STALE_LOCK_MINUTES = 10
+
+
+class EmailSendError(Exception):
+    """Почтовый провайдер не принял письмо"""
+
+
+_lock = threading.Lock()
+_stats: Dict[str, int] = {'enqueued': 0, 'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+
+
+def enqueue_email(cur: Any, template: str, email: str, name: str, payload: Dict[str, Any]) -> None:
+    """Постановка письма в outbox в текущей транзакции вызывающего"""
+    cur.execute(
+        "INSERT INTO email_outbox (template, email, name, payload) VALUES (%s, %s, %s, %s)",
+        (template, email, name, json.dumps(payload))
+    )
+    with _lock:
+        _stats['enqueued'] += 1
+
+
+def enqueue_emails(cur: Any, messages: List[Tuple[str, str, str, Dict[str, Any]]]) -> None:
+    """Пакетная постановка писем (template, email, name, payload) одной командой"""
+    if not messages:
+        return
+    execute_values(
+        cur,
+        "INSERT INTO email_outbox (template, email, name, payload) VALUES %s",
+        [(template, email, name, json.dumps(payload)) for template, email, name, payload in messages],
+        page_size=len(messages)
+    )
+    with _lock:
+        _stats['enqueued'] += len(messages)
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _claim(conn: Any, batch_size: int) -> List[Dict[str, Any]]:
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""UPDATE email_outbox SET status = 'sending', attempts = attempts + 1, locked_at = NOW()
+               WHERE id IN (
+                   SELECT id FROM email_outbox
+                   WHERE (status IN ('pending', 'retry') AND next_attempt_at <= NOW())
+                      OR (status = 'sending' AND locked_at < NOW() - INTERVAL '{STALE_LOCK_MINUTES} minutes')
+                   ORDER BY next_attempt_at
+                   LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+               )
+               RETURNING id, template, email, name, payload, attempts""",
+            (batch_size,)
+        )
+        rows = cur.fetchall()
+        conn.commit()
+    finally:
+        cur.close()
+
+    return [
+        {'id': row[0], 'template': row[1], 'email': row[2], 'name': row[3], 'payload': row[4] or {}, 'attempts': row[5]}
+        for row in rows
+    ]
+
+
+def _record(conn: Any, sent: List[int], failures: List[Dict[str, Any]]) -> None:
+    cur = conn.cursor()
+    try:
+        if sent:
+            cur.execute(
+                "UPDATE email_outbox SET status = 'sent', sent_at = NOW(), locked_at = NULL, last_error = NULL WHERE id = ANY(%s)",
+                (sent,)
+            )
+        if failures:
+            execute_values(
+                cur,
+                """UPDATE email_outbox AS o SET status = v.status, last_error = v.last_error, locked_at = NULL,
+                   next_attempt_at = NOW() + v.delay * INTERVAL '1 second'
+                   FROM (VALUES %s) AS v(id, status, last_error, delay)
+                   WHERE o.id = v.id""",
+                [(failure['id'], failure['status'], failure['error'][:1000], failure['delay']) for failure in failures],
+                template='(%s, %s, %s, %s::double precision)',
+                page_size=len(failures)
+            )
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def drain_outbox(conn: Any, send_batch: Callable[[str, List[Dict[str, Any]]], Dict[int, str]],
+                 max_batches: int = 10) -> Dict[str, Any]:
+    """
+    Отправка писем из outbox пачками по BATCH_SIZE: send_batch получает письма
+    одного шаблона и возвращает ошибки по id. Неудачные письма откладываются
+    с экспоненциальной задержкой, после MAX_ATTEMPTS — failed.
+    """
+    started = time.monotonic()
+    result = {'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'batches': 0}
+
+    for _ in range(max_batches):
+        messages = _claim(conn, BATCH_SIZE)
+        if not messages:
+            break
+        result['batches'] += 1
+        result['claimed'] += len(messages)
+
+        sent: List[int] = []
+        failures: List[Dict[str, Any]] = []
+
+        by_template: Dict[str, List[Dict[str, Any]]] = {}
+        for message in messages:
+            by_template.setdefault(message['template'], []).append(message)
+
+        for template, group in by_template.items():
+            try:
+                errors = send_batch(template, group)
+            except Exception as e:
+                errors = {message['id']: str(e) for message in group}
+
+            for message in group:
+                if message['id'] not in errors:
+                    sent.append(message['id'])
+                    continue
+                exhausted = message['attempts'] >= MAX_ATTEMPTS
+                failures.append({
+                    'id': message['id'],
+                    'status': 'failed' if exhausted else 'retry',
+                    'error': errors[message['id']],
+                    'delay': 0 if exhausted else _backoff(message['attempts']),
+                })
+
+        _record(conn, sent, failures)
+        result['sent'] += len(sent)
+        result['failed'] += sum(1 for failure in failures if failure['status'] == 'failed')
+        result['retried'] += sum(1 for failure in failures if failure['status'] == 'retry')
+
+        if len(messages) < BATCH_SIZE:
+            break
+
+    elapsed = time.monotonic() - started
+    result['duration_ms'] = round(elapsed * 1000, 1)
+    result['sent_per_second'] = round(result['sent'] / elapsed, 2) if elapsed > 0 else 0
+
+    with _lock:
+        for key in ('claimed', 'sent', 'retried', 'failed'):
+            _stats[key] += result[key]
+
+    return result
+
+
+def outbox_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,157 @@
+import os
+import secrets
+import threading
+import time
+from typing import Any, Dict, List
+
+from psycopg2.extras import execute_values
+
+from db import get_connection
+
+PROMO_CODE_MODE = os.environ.get('PROMO_CODE_MODE', 'pool')
+POOL_LOW_WATER = int(os.environ.get('PROMO_POOL_LOW_WATER', '200'))
+POOL_REFILL_BATCH = int(os.environ.get('PROMO_POOL_REFILL_BATCH', '1000'))
+POOL_CHECK_INTERVAL = float(os.environ.get('PROMO_POOL_CHECK_INTERVAL', '60'))
+
+PREFIX = 'NOMAD'
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+POOL_CODE_LENGTH = 8
+DETERMINISTIC_CODE_LENGTH = 7
+DETERMINISTIC_BITS = 5 * DETERMINISTIC_CODE_LENGTH
+DETERMINISTIC_MULTIPLIER = 0x5DEECE66D
+DETERMINISTIC_OFFSET = int(os.environ.get('PROMO_CODE_OFFSET', '0x2F1B3C5'), 0)
+
+_lock = threading.Lock()
+_refilling = threading.Event()
+_last_check = 0.0
+_stats: Dict[str, int] = {'allocated': 0, 'deterministic': 0, 'refills': 0, 'generated': 0}
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def deterministic_code(subscriber_id: int) -> str:
+    """
+    Промокод из id участника: биекция id по модулю 2^35, поэтому коды разных
+    участников не совпадают. На символ короче кодов из пула — пересечений нет.
+    """
+    mask = (1 << DETERMINISTIC_BITS) - 1
+    value = (subscriber_id * DETERMINISTIC_MULTIPLIER + DETERMINISTIC_OFFSET) & mask
+    return PREFIX + _encode(value, DETERMINISTIC_CODE_LENGTH)
+
+
+def _random_code() -> str:
+    return PREFIX + ''.join(secrets.choice(ALPHABET) for _ in range(POOL_CODE_LENGTH))
+
+
+def allocate_codes(cur: Any, count: int) -> List[str]:
+    """
+    Выдача свободных кодов из пула в транзакции вызывающего. SKIP LOCKED
+    не даёт параллельным вебхукам ждать друг друга; при откате коды
+    возвращаются в пул. Кодов может оказаться меньше, чем запрошено.
+    """
+    if count <= 0 or PROMO_CODE_MODE != 'pool':
+        return []
+    cur.execute(
+        """UPDATE promo_codes SET assigned_at = NOW()
+           WHERE code IN (
+               SELECT code FROM promo_codes
+               WHERE assigned_at IS NULL
+               LIMIT %s
+               FOR UPDATE SKIP LOCKED
+           )
+           RETURNING code""",
+        (count,)
+    )
+    codes = [row[0] for row in cur.fetchall()]
+    with _lock:
+        _stats['allocated'] += len(codes)
+    return codes
+
+
+def assign_codes(cur: Any, subscriber_ids: List[int]) -> Dict[int, str]:
+    """
+    Промокоды для новых участников: из пула, а если он пуст или выбран
+    детерминированный режим — по id. Коллизий и повторов не бывает.
+    """
+    codes = allocate_codes(cur, len(subscriber_ids))
+    fallbacks = len(subscriber_ids) - len(codes)
+    assigned: Dict[int, str] = {}
+    for subscriber_id in subscriber_ids:
+        assigned[subscriber_id] = codes.pop() if codes else deterministic_code(subscriber_id)
+
+    if fallbacks:
+        with _lock:
+            _stats['deterministic'] += fallbacks
+
+    if assigned:
+        execute_values(
+            cur,
+            """UPDATE subscribers AS s SET promo_code = v.promo_code
+               FROM (VALUES %s) AS v(id, promo_code)
+               WHERE s.id = v.id""",
+            list(assigned.items()),
+            page_size=len(assigned)
+        )
+
+    if PROMO_CODE_MODE == 'pool':
+        refill_in_background(force=fallbacks > 0)
+    return assigned
+
+
+def refill_pool(conn: Any) -> Dict[str, int]:
+    """Если свободных кодов меньше POOL_LOW_WATER, в пул добавляется POOL_REFILL_BATCH новых"""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT count(*) FROM promo_codes WHERE assigned_at IS NULL")
+        available = cur.fetchone()[0]
+        inserted = 0
+
+        if available < POOL_LOW_WATER:
+            rows = execute_values(
+                cur,
+                "INSERT INTO promo_codes (code) VALUES %s ON CONFLICT (code) DO NOTHING RETURNING code",
+                [(_random_code(),) for _ in range(POOL_REFILL_BATCH)],
+                page_size=POOL_REFILL_BATCH,
+                fetch=True
+            )
+            inserted = len(rows)
+            with _lock:
+                _stats['refills'] += 1
+                _stats['generated'] += inserted
+
+        conn.commit()
+        return {'available': available + inserted, 'generated': inserted}
+    finally:
+        cur.close()
+
+
+def refill_in_background(force: bool = False) -> None:
+    """Проверка пула не чаще раза в POOL_CHECK_INTERVAL, вне транзакции вебхука"""
+    global _last_check
+    now = time.monotonic()
+    if _refilling.is_set() or (not force and now - _last_check < POOL_CHECK_INTERVAL):
+        return
+    _refilling.set()
+    _last_check = now
+
+    def run() -> None:
+        try:
+            with get_connection() as conn:
+                refill_pool(conn)
+        except Exception as e:
+            print(f"Promo pool refill failed: {e}")
+        finally:
+            _refilling.clear()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def promo_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
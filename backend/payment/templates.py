@@ -0,0 +1,97 @@
+import html
+from string import Template
+from typing import Any, Dict, List, Mapping
+
+WELCOME_SUBJECT = 'Добро пожаловать в НОМАД ХАБ! 🚀'
+
+WELCOME_HTML = """<html>
+<body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+    <h1 style="color: #E07A5F;">Добро пожаловать в НОМАД ХАБ!</h1>
+    <p>Привет, $name! 👋</p>
+    <p>Спасибо за подписку на Core Member. Теперь у вас есть доступ ко всем возможностям клуба!</p>
+
+    <h2 style="color: #0F1A2B;">Ваша ссылка для вступления в закрытый чат:</h2>
+    <p><a href="$telegram_link" style="background: #E07A5F; color: white; padding: 12px 24px; text-decoration: none; border-radius: 8px; display: inline-block;">Вступить в Telegram-чат</a></p>
+
+    <h2 style="color: #0F1A2B;">Ваш личный код для скидок у партнёров:</h2>
+    <p style="font-size: 24px; font-weight: bold; color: #E07A5F; background: #F4F1DE; padding: 16px; border-radius: 8px; display: inline-block;">$promo_code</p>
+
+    <p>Используйте этот код для получения скидок 5-15% у наших партнёров!</p>
+
+    <hr style="border: none; border-top: 1px solid #ddd; margin: 32px 0;">
+
+    <h3>Что дальше?</h3>
+    <ul>
+        <li>Присоединяйтесь к Telegram-чату и знакомьтесь с сообществом</li>
+        <li>Изучайте базу эксклюзивных проектов</li>
+        <li>Смотрите записи вебинаров в архиве</li>
+        <li>Пользуйтесь скидками от партнёров</li>
+    </ul>
+
+    <p>Если у вас есть вопросы, просто ответьте на это письмо!</p>
+
+    <p style="margin-top: 32px;">С уважением,<br><strong>Команда НОМАД ХАБ</strong></p>
+</body>
+</html>
+"""
+
+WELCOME_TEXT = """Добро пожаловать в НОМАД ХАБ!
+
+Привет, $name!
+
+Спасибо за подписку на Core Member. Теперь у вас есть доступ ко всем возможностям клуба!
+
+Ссылка для вступления в закрытый чат: $telegram_link
+
+Ваш личный код для скидок у партнёров: $promo_code
+Используйте этот код для получения скидок 5-15% у наших партнёров!
+
+Что дальше?
+- Присоединяйтесь к Telegram-чату и знакомьтесь с сообществом
+- Изучайте базу эксклюзивных проектов
+- Смотрите записи вебинаров в архиве
+- Пользуйтесь скидками от партнёров
+
+Если у вас есть вопросы, просто ответьте на это письмо!
+
+С уважением,
+Команда НОМАД ХАБ
+"""
+
+
+class EmailTemplate:
+    """
+    Письмо, собранное один раз на контейнер. Тема и тела общие для всей пачки,
+    а значения получателя подставляет SendGrid через substitutions. В HTML идут
+    экранированные значения, в текстовую версию — как есть.
+    """
+
+    def __init__(self, subject: str, html_body: str, text_body: str):
+        fields = {
+            match.group('named') or match.group('braced')
+            for source in (subject, html_body, text_body)
+            for match in Template.pattern.finditer(source)
+            if match.group('named') or match.group('braced')
+        }
+        self.fields = sorted(fields)
+        self.subject = Template(subject).substitute({field: f'-{field}-' for field in self.fields})
+        self.content: List[Dict[str, str]] = [
+            {'type': 'text/plain', 'value': Template(text_body).substitute({field: f'-{field}-' for field in self.fields})},
+            {'type': 'text/html', 'value': Template(html_body).substitute({field: f'-{field}.html-' for field in self.fields})},
+        ]
+
+    def personalization(self, email: str, values: Mapping[str, Any]) -> Dict[str, Any]:
+        substitutions: Dict[str, str] = {}
+        for field in self.fields:
+            value = str(values.get(field) or '')
+            substitutions[f'-{field}-'] = value
+            substitutions[f'-{field}.html-'] = html.escape(value)
+        recipient = {'email': email}
+        if values.get('name'):
+            recipient['name'] = str(values['name'])
+        return {'to': [recipient], 'substitutions': substitutions}
+
+
+TEMPLATES: Dict[str, EmailTemplate] = {
+    'welcome': EmailTemplate(WELCOME_SUBJECT, WELCOME_HTML, WELCOME_TEXT),
+}
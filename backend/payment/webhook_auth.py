@@ -0,0 +1,175 @@
+import ipaddress
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+YOOKASSA_NETWORKS = (
+    '185.71.76.0/27', '185.71.77.0/27', '77.75.153.0/25', '77.75.156.11/32',
+    '77.75.156.35/32', '77.75.154.128/25', '2a02:5180::/32',
+)
+ALLOWED_NETWORKS = tuple(
+    ipaddress.ip_network(network.strip())
+    for network in os.environ.get('WEBHOOK_ALLOWED_NETWORKS', ','.join(YOOKASSA_NETWORKS)).split(',')
+    if network.strip()
+)
+VERIFY_MODES = {mode.strip() for mode in os.environ.get('WEBHOOK_VERIFY', 'ip').split(',')}
+VERIFY_CACHE_TTL = float(os.environ.get('WEBHOOK_VERIFY_CACHE_TTL', '60'))
+VERIFY_CACHE_SIZE = 1000
+KNOWN_EVENTS = {
+    'payment.succeeded', 'payment.waiting_for_capture', 'payment.canceled', 'refund.succeeded',
+}
+ACTIVATION_EVENT = 'payment.succeeded'
+PAYMENT_ID_PATTERN = re.compile(r'[A-Za-z0-9-]{1,64}')
+
+_lock = threading.Lock()
+_verified: 'OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]' = OrderedDict()
+_stats: Dict[str, int] = {
+    'accepted': 0, 'ignored_unknown': 0, 'rejected_malformed': 0, 'rejected_source': 0,
+    'rejected_unconfirmed': 0, 'api_fetches': 0, 'api_cache_hits': 0, 'api_errors': 0,
+}
+
+
+class WebhookRejected(Exception):
+    """Уведомление не прошло проверку; status — HTTP-код ответа"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _reject(counter: str, status: int, message: str) -> WebhookRejected:
+    with _lock:
+        _stats[counter] += 1
+    return WebhookRejected(status, message)
+
+
+def source_ip(event: Dict[str, Any]) -> Optional[str]:
+    """Адрес клиента из requestContext шлюза; X-Forwarded-For подделывается и не используется"""
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    return identity.get('sourceIp')
+
+
+def _allowed_source(address: Optional[str]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address or '')
+    except ValueError:
+        return False
+    return any(ip in network for network in ALLOWED_NETWORKS)
+
+
+def _fetch_payment(payment_id: str) -> Optional[Dict[str, Any]]:
+    """Платёж из API ЮKassa; ответы, включая 404, кэшируются на VERIFY_CACHE_TTL секунд"""
+    now = time.monotonic()
+    with _lock:
+        cached = _verified.get(payment_id)
+        if cached is not None and cached[0] > now:
+            _verified.move_to_end(payment_id)
+            _stats['api_cache_hits'] += 1
+            return cached[1]
+
+    import base64
+
+    import requests
+
+    from http_client import request
+
+    shop_id = os.environ.get('YUKASSA_SHOP_ID')
+    secret_key = os.environ.get('YUKASSA_SECRET_KEY')
+    if not shop_id or not secret_key:
+        raise _reject('api_errors', 503, 'Payment verification is not configured')
+
+    auth = base64.b64encode(f'{shop_id}:{secret_key}'.encode('utf-8')).decode('utf-8')
+    with _lock:
+        _stats['api_fetches'] += 1
+    try:
+        response = request(
+            'yookassa',
+            'GET',
+            f'https://api.yookassa.ru/v3/payments/{payment_id}',
+            headers={'Authorization': f'Basic {auth}'}
+        )
+    except requests.RequestException as e:
+        print(f"YooKassa verification failed: {e}")
+        raise _reject('api_errors', 503, 'Payment verification unavailable')
+
+    if response.status_code == 200:
+        payment = response.json()
+    elif response.status_code in (400, 404):
+        payment = None
+    else:
+        raise _reject('api_errors', 503, 'Payment verification unavailable')
+
+    with _lock:
+        _verified[payment_id] = (now + VERIFY_CACHE_TTL, payment)
+        _verified.move_to_end(payment_id)
+        while len(_verified) > VERIFY_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return payment
+
+
+def check_shape(data: Any) -> Optional[Dict[str, Any]]:
+    """
+    Дешёвая проверка формы уведомления без сети и БД. Битое тело — WebhookRejected
+    с кодом 400. Корректное уведомление о неизвестном событии (ЮKassa добавила
+    подписку) — None: его подтверждают 200, иначе ЮKassa будет повторять отправку.
+    metadata.email обязателен только для payment.succeeded: у возвратов его нет.
+    """
+    payment_data = data.get('object') if isinstance(data, dict) else None
+    notification = data.get('event', 'payment.succeeded') if isinstance(data, dict) else None
+    if (not isinstance(payment_data, dict) or not isinstance(notification, str)
+            or not isinstance(payment_data.get('id'), str)
+            or not PAYMENT_ID_PATTERN.fullmatch(payment_data['id'])):
+        raise _reject('rejected_malformed', 400, 'Malformed notification')
+
+    if notification not in KNOWN_EVENTS:
+        with _lock:
+            _stats['ignored_unknown'] += 1
+        return None
+
+    metadata = payment_data.get('metadata')
+    if (activates(notification, payment_data)
+            and (not isinstance(metadata, dict) or not metadata.get('email'))):
+        raise _reject('rejected_malformed', 400, 'Malformed notification')
+    return payment_data
+
+
+def activates(notification: str, payment_data: Dict[str, Any]) -> bool:
+    """Уведомление об успешной оплате, по которому активируется участник"""
+    return notification == ACTIVATION_EVENT and payment_data.get('status') == 'succeeded'
+
+
+def verify_notification(event: Dict[str, Any], data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Проверка уведомления ЮKassa до любых обращений к БД. Сначала check_shape.
+    Затем, в зависимости от WEBHOOK_VERIFY, проверяется адрес отправителя
+    по сетям ЮKassa (ip) и/или статус оплаты payment.succeeded перезапрашивается
+    из API (api).
+    Возвращает объект платежа или None для неизвестного события, которое нужно
+    пропустить. В режиме api это объект из API, а не из тела запроса.
+    """
+    payment_data = check_shape(data)
+    if payment_data is None:
+        return None
+
+    succeeded = activates(data.get('event', ACTIVATION_EVENT), payment_data)
+
+    if 'ip' in VERIFY_MODES and not _allowed_source(source_ip(event)):
+        raise _reject('rejected_source', 403, 'Forbidden')
+
+    if 'api' in VERIFY_MODES and succeeded:
+        payment_data = _fetch_payment(payment_data['id'])
+        if payment_data is None or payment_data.get('status') != 'succeeded':
+            raise _reject('rejected_unconfirmed', 403, 'Forbidden')
+
+    with _lock:
+        _stats['accepted'] += 1
+    return payment_data
+
+
+def webhook_auth_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
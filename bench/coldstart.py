@@ -0,0 +1,112 @@
+"""
+Бюджет холодного старта: в свежем интерпретаторе замеряется импорт index.py
+каждой функции и первый вызов preflight и отклонённого запроса, а также
+какие тяжёлые модули при этом загрузились. Отдельно — стоимость отложенных
+импортов, которую платит первый настоящий запрос.
+
+    python bench/coldstart.py --runs 10 --budget-ms 40 --output coldstart.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['requests', 'psycopg2', 'urllib3', 'concurrent.futures']
+
+FAST_PATHS: Dict[str, List[Dict[str, Any]]] = {
+    'payment': [
+        {'httpMethod': 'OPTIONS'},
+        {'httpMethod': 'POST', 'body': '{"action": "drain_outbox"}'},
+        {'httpMethod': 'POST', 'body': '{"action": "webhook", "object": {"id": "forged", "status": "succeeded", '
+                                        '"metadata": {"email": "x@example.com"}}}'},
+    ],
+    'partners': [{'httpMethod': 'OPTIONS'}, {'httpMethod': 'PUT'}],
+    'admin': [{'httpMethod': 'OPTIONS'}, {'httpMethod': 'GET', 'headers': {}}],
+    'add-partner': [{'httpMethod': 'OPTIONS'}, {'httpMethod': 'POST', 'headers': {}}],
+}
+DEFERRED: Dict[str, List[str]] = {
+    'payment': ['db', 'http_client', 'ledger', 'outbox', 'promo', 'billing', 'mailer'],
+    'partners': ['access', 'catalog', 'mirror', 'airtable'],
+    'admin': ['db'],
+    'add-partner': ['http_client'],
+}
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import index
+imported = time.perf_counter()
+for event in json.loads(sys.argv[1]):
+    index.handler(event, None)
+handled = time.perf_counter()
+loaded = [name for name in json.loads(sys.argv[2]) if name in sys.modules]
+for name in json.loads(sys.argv[3]):
+    __import__(name)
+deferred = time.perf_counter()
+sys.stderr.write(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'fast_path_ms': (handled - imported) * 1000,
+    'deferred_import_ms': (deferred - handled) * 1000,
+    'heavy_modules_loaded': loaded,
+}))
+"""
+
+
+def probe(function: str) -> Dict[str, Any]:
+    completed = subprocess.run(
+        [
+            sys.executable, '-c', PROBE,
+            json.dumps(FAST_PATHS[function]), json.dumps(HEAVY_MODULES), json.dumps(DEFERRED[function]),
+        ],
+        cwd=os.path.join(ROOT, 'backend', function),
+        env=dict(os.environ, TRACE_ENABLED='0', ADMIN_PASSWORD='coldstart'),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    return json.loads(completed.stderr.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бюджет холодного старта backend-функций')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=40.0, help='импорт + preflight + отказ, медиана')
+    parser.add_argument('--output', default='coldstart.json')
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {'budget_ms': args.budget_ms, 'functions': {}}
+    over_budget = []
+
+    for function in FAST_PATHS:
+        runs = [probe(function) for _ in range(args.runs)]
+        fast = [run['import_ms'] + run['fast_path_ms'] for run in runs]
+        result = {
+            'import_ms_median': round(statistics.median(run['import_ms'] for run in runs), 2),
+            'fast_path_total_ms_median': round(statistics.median(fast), 2),
+            'fast_path_total_ms_max': round(max(fast), 2),
+            'deferred_import_ms_median': round(statistics.median(run['deferred_import_ms'] for run in runs), 2),
+            'heavy_modules_loaded': runs[0]['heavy_modules_loaded'],
+        }
+        report['functions'][function] = result
+        if result['fast_path_total_ms_median'] > args.budget_ms:
+            over_budget.append(function)
+        print(
+            f"{function:12} fast path {result['fast_path_total_ms_median']:7.1f} ms"
+            f"  deferred {result['deferred_import_ms_median']:7.1f} ms"
+            f"  heavy on fast path: {', '.join(result['heavy_modules_loaded']) or '-'}"
+        )
+
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(report, output, indent=2)
+
+    if over_budget:
+        print(f"over budget ({args.budget_ms} ms): {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""
+Нагрузочный прогон облачных функций локально: каждый handler из
+backend/<функция>/index.py вызывается синтетическими событиями с заданной
+параллельностью. Postgres — локальная база со схемой из db_migrations,
+Airtable, ЮKassa и SendGrid — стабы в процессе с настраиваемыми задержками
+и долей ошибок. Результат пишется в JSON, --compare сравнивает с прошлым прогоном.
+
+    python bench/run.py --database-url postgresql://localhost/nomad_bench --migrate --seed 5000
+    python bench/run.py --functions partners --concurrency 16 --requests 500 --compare bench-results.json
+"""
+import argparse
+import glob
+import importlib.util
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, 'bench')
+SCHEMA = 't_p48299329_nomad_hub_landing'
+FUNCTIONS = ['payment', 'partners', 'admin', 'add-partner']
+UPSTREAM_NAMES = ['airtable', 'yookassa', 'sendgrid', 'partners']
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return round(ordered[index], 2)
+
+
+def _with_search_path(database_url: str) -> str:
+    separator = '&' if '?' in database_url else '?'
+    return f'{database_url}{separator}options=-csearch_path%3D{SCHEMA},public'
+
+
+def prepare_database(database_url: str, migrate: bool, seed: int) -> None:
+    """Схема из db_migrations в схеме платформы и синтетические участники"""
+    import psycopg2
+
+    from scenarios import SEED_SQL
+
+    conn = psycopg2.connect(database_url)
+    cur = conn.cursor()
+    try:
+        cur.execute(f'CREATE SCHEMA IF NOT EXISTS {SCHEMA}')
+        cur.execute(f'SET search_path TO {SCHEMA}, public')
+        if migrate:
+            for path in sorted(glob.glob(os.path.join(ROOT, 'db_migrations', 'V*.sql'))):
+                with open(path, encoding='utf-8') as migration:
+                    cur.execute(migration.read())
+                print(f'applied {os.path.basename(path)}')
+        if seed:
+            cur.execute(SEED_SQL, {'count': seed})
+            print(f'seeded {seed} subscribers')
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def run_worker(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Прогон сценариев одной функции в отдельном процессе, как в отдельном контейнере"""
+    from stubs import StubState, make_server, route_to_stubs
+    from scenarios import ADMIN_PASSWORD, SCENARIOS
+
+    function_dir = os.path.join(ROOT, 'backend', config['function'])
+    os.environ.update({
+        'ADMIN_PASSWORD': ADMIN_PASSWORD,
+        'AIRTABLE_TOKEN': 'bench',
+        'AIRTABLE_BASE_ID': 'appBench',
+        'YUKASSA_SHOP_ID': 'bench',
+        'YUKASSA_SECRET_KEY': 'bench',
+        'SENDGRID_API_KEY': 'bench',
+        'ACCESS_TOKEN_SECRET': 'bench',
+        'RATE_LIMIT_IP_PER_MINUTE': '0',
+        'RATE_LIMIT_EMAIL_PER_MINUTE': '0',
+    })
+    if config.get('database_url'):
+        os.environ['DATABASE_URL'] = _with_search_path(config['database_url'])
+
+    state = StubState(config['latency_ms'], config['error_rate'], config['partners'])
+    server = make_server(state)
+
+    sys.path.insert(0, function_dir)
+    started = time.perf_counter()
+    import index
+    import_ms = (time.perf_counter() - started) * 1000
+    if importlib.util.find_spec('http_client') is not None:
+        import http_client
+        route_to_stubs(http_client, server)
+
+    try:
+        import db
+        pool_stats = db.pool_stats
+    except ImportError:
+        pool_stats = None
+
+    results: Dict[str, Any] = {}
+    run_id = uuid.uuid4().hex[:8]
+
+    for name, make_event in SCENARIOS[config['function']]:
+        if config['scenarios'] and name not in config['scenarios']:
+            continue
+
+        for i in range(config['warmup']):
+            index.handler(make_event(-i - 1, run_id), None)
+
+        latencies: List[float] = []
+        statuses: Dict[str, int] = {}
+        exceptions: Dict[str, int] = {}
+        lock = threading.Lock()
+        calls_before = state.snapshot()
+        pool_before = pool_stats() if pool_stats else {}
+
+        def call(i: int) -> None:
+            event = make_event(i, run_id)
+            begin = time.perf_counter()
+            try:
+                response = index.handler(event, None)
+                outcome = str(response.get('statusCode'))
+            except Exception as e:
+                outcome = type(e).__name__
+                with lock:
+                    exceptions[outcome] = exceptions.get(outcome, 0) + 1
+                outcome = None
+            elapsed_ms = (time.perf_counter() - begin) * 1000
+            with lock:
+                latencies.append(elapsed_ms)
+                if outcome:
+                    statuses[outcome] = statuses.get(outcome, 0) + 1
+
+        wall_started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=config['concurrency']) as executor:
+            list(executor.map(call, range(config['requests'])))
+        wall = time.perf_counter() - wall_started
+
+        calls_after = state.snapshot()
+        pool_after = pool_stats() if pool_stats else {}
+        requests_made = len(latencies)
+        outbound = {
+            upstream: calls_after['calls'].get(upstream, 0) - calls_before['calls'].get(upstream, 0)
+            for upstream in UPSTREAM_NAMES
+        }
+
+        results[name] = {
+            'requests': requests_made,
+            'concurrency': config['concurrency'],
+            'throughput_rps': round(requests_made / wall, 2) if wall > 0 else 0,
+            'latency_ms': {
+                'p50': _percentile(latencies, 50),
+                'p95': _percentile(latencies, 95),
+                'p99': _percentile(latencies, 99),
+                'max': round(max(latencies), 2) if latencies else 0,
+            },
+            'statuses': statuses,
+            'exceptions': exceptions,
+            'db_connects': pool_after.get('connects', 0) - pool_before.get('connects', 0),
+            'db_connects_per_request': round(
+                (pool_after.get('connects', 0) - pool_before.get('connects', 0)) / requests_made, 4
+            ) if requests_made else 0,
+            'outbound_calls': {upstream: count for upstream, count in outbound.items() if count},
+            'outbound_calls_per_request': round(sum(outbound.values()) / requests_made, 3) if requests_made else 0,
+        }
+
+    server.shutdown()
+    return {'import_ms': round(import_ms, 2), 'scenarios': results}
+
+
+def _spawn(function: str, args: argparse.Namespace) -> Dict[str, Any]:
+    config = {
+        'function': function,
+        'database_url': args.database_url,
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'warmup': args.warmup,
+        'partners': args.partners,
+        'scenarios': args.scenarios,
+        'latency_ms': {upstream: args.latency_ms for upstream in UPSTREAM_NAMES},
+        'error_rate': {upstream: args.error_rate for upstream in UPSTREAM_NAMES},
+    }
+    for override in args.upstream:
+        upstream, latency, error_rate = (override.split(':') + ['', ''])[:3]
+        if latency:
+            config['latency_ms'][upstream] = float(latency)
+        if error_rate:
+            config['error_rate'][upstream] = float(error_rate)
+
+    with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+        env = dict(os.environ, BENCH_CONFIG=json.dumps(config), BENCH_OUTPUT=output.name)
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker'],
+            env=env,
+            stdout=subprocess.DEVNULL if not args.verbose else None,
+        )
+        if completed.returncode != 0:
+            return {'error': f'worker exited with {completed.returncode}'}
+        return json.load(output)
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    """Изменение p95 и пропускной способности относительно прошлого прогона"""
+    print(f"{'scenario':40} {'p95 ms':>18} {'rps':>18}")
+    for function, report in current['functions'].items():
+        for name, result in report.get('scenarios', {}).items():
+            before = previous.get('functions', {}).get(function, {}).get('scenarios', {}).get(name)
+            if not before:
+                continue
+            p95, p95_before = result['latency_ms']['p95'], before['latency_ms']['p95']
+            rps, rps_before = result['throughput_rps'], before['throughput_rps']
+            p95_delta = (p95 - p95_before) / p95_before * 100 if p95_before else 0
+            rps_delta = (rps - rps_before) / rps_before * 100 if rps_before else 0
+            print(f'{function + "." + name:40} {p95:>9.1f} ({p95_delta:+6.1f}%) {rps:>9.1f} ({rps_delta:+6.1f}%)')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Локальный нагрузочный прогон backend-функций')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--database-url', default=os.environ.get('BENCH_DATABASE_URL'))
+    parser.add_argument('--migrate', action='store_true', help='применить db_migrations перед прогоном')
+    parser.add_argument('--seed', type=int, default=0, help='число синтетических участников')
+    parser.add_argument('--functions', nargs='*', default=FUNCTIONS, choices=FUNCTIONS)
+    parser.add_argument('--scenarios', nargs='*', default=[])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='запросов на сценарий')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--partners', type=int, default=300, help='записей в стабе Airtable')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='задержка стабов по умолчанию')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 503 от стабов')
+    parser.add_argument('--upstream', action='append', default=[], metavar='NAME:LATENCY_MS:ERROR_RATE',
+                        help='переопределение для одного апстрима, например yookassa:200:0.05')
+    parser.add_argument('--output', default='bench-results.json')
+    parser.add_argument('--compare', help='JSON прошлого прогона')
+    parser.add_argument('--verbose', action='store_true', help='не скрывать вывод функций')
+    args = parser.parse_args()
+
+    sys.path.insert(0, BENCH_DIR)
+
+    if args.worker:
+        result = run_worker(json.loads(os.environ['BENCH_CONFIG']))
+        with open(os.environ['BENCH_OUTPUT'], 'w', encoding='utf-8') as output:
+            json.dump(result, output)
+        return
+
+    needs_db = any(function != 'add-partner' for function in args.functions)
+    if needs_db and not args.database_url:
+        parser.error('--database-url (или BENCH_DATABASE_URL) обязателен для payment, partners и admin')
+    if args.migrate or args.seed:
+        prepare_database(args.database_url, args.migrate, args.seed)
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+
+    report: Dict[str, Any] = {
+        'meta': {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': commit,
+            'python': sys.version.split()[0],
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'latency_ms': args.latency_ms,
+            'error_rate': args.error_rate,
+            'upstream_overrides': args.upstream,
+        },
+        'functions': {},
+    }
+
+    for function in args.functions:
+        print(f'running {function}...')
+        report['functions'][function] = _spawn(function, args)
+        for name, result in report['functions'][function].get('scenarios', {}).items():
+            latency = result['latency_ms']
+            print(
+                f"  {name:24} p50 {latency['p50']:8.1f}  p95 {latency['p95']:8.1f}  p99 {latency['p99']:8.1f} ms"
+                f"  {result['throughput_rps']:8.1f} rps  db {result['db_connects_per_request']:.3f}/req"
+                f"  out {result['outbound_calls_per_request']:.2f}/req  {result['statuses']}"
+            )
+
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(report, output, ensure_ascii=False, indent=2)
+    print(f'results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as previous:
+            compare(report, json.load(previous))
+
+
+if __name__ == '__main__':
+    main()
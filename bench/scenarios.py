@@ -0,0 +1,103 @@
+import json
+from typing import Any, Callable, Dict, List, Tuple
+
+ADMIN_PASSWORD = 'bench-admin'
+SEED_EMAIL = 'bench-{}@example.com'
+YOOKASSA_IP = '185.71.76.1'
+FORGED_IP = '203.0.113.7'
+
+Event = Dict[str, Any]
+Scenario = Tuple[str, Callable[[int, str], Event]]
+
+
+def _post(body: Dict[str, Any], headers: Dict[str, str] = None) -> Event:
+    return {'httpMethod': 'POST', 'headers': headers or {}, 'body': json.dumps(body)}
+
+
+def _get(params: Dict[str, str], headers: Dict[str, str] = None) -> Event:
+    return {'httpMethod': 'GET', 'headers': headers or {}, 'queryStringParameters': params}
+
+
+def _webhook(i: int, run_id: str, source_ip: str = YOOKASSA_IP) -> Event:
+    event = _post({
+        'action': 'webhook',
+        'event': 'payment.succeeded',
+        'object': {
+            'id': f'bench-{run_id}-{i}',
+            'status': 'succeeded',
+            'metadata': {'email': f'new-{run_id}-{i}@example.com', 'name': f'Bench {i}'},
+            'payment_method': {'id': f'pm-{run_id}-{i}', 'saved': True},
+        },
+    })
+    event['requestContext'] = {'identity': {'sourceIp': source_ip}}
+    return event
+
+
+def _webhook_batch(i: int, run_id: str) -> Event:
+    notifications = [json.loads(_webhook(i * 50 + n, f'{run_id}b')['body']) for n in range(50)]
+    return _post({'action': 'webhook_batch', 'notifications': notifications}, {'X-Admin-Password': ADMIN_PASSWORD})
+
+
+def _partner(i: int, run_id: str) -> Dict[str, str]:
+    return {
+        'name': f'Bench partner {run_id}-{i}',
+        'description': 'Партнёр для нагрузочного теста',
+        'category': 'Сервисы',
+        'offer': '-10%',
+        'promoCode': 'BENCH10',
+        'url': f'https://bench-{run_id}-{i}.example.com',
+    }
+
+
+ADMIN_HEADERS = {'Authorization': f'Bearer {ADMIN_PASSWORD}'}
+
+SCENARIOS: Dict[str, List[Scenario]] = {
+    'payment': [
+        ('create_payment', lambda i, run_id: _post({
+            'action': 'create_payment', 'email': f'checkout-{run_id}-{i}@example.com', 'name': 'Bench'
+        })),
+        ('webhook', _webhook),
+        ('webhook_duplicate', lambda i, run_id: _webhook(0, run_id)),
+        ('webhook_forged', lambda i, run_id: _webhook(i, run_id, FORGED_IP)),
+        ('webhook_batch_50', _webhook_batch),
+        ('drain_outbox', lambda i, run_id: _post({'action': 'drain_outbox'}, {'X-Admin-Password': ADMIN_PASSWORD})),
+    ],
+    'partners': [
+        ('catalog', lambda i, run_id: _get({})),
+        ('catalog_category', lambda i, run_id: _get({'category': 'Жильё', 'limit': '20'})),
+        ('search', lambda i, run_id: _get({'q': 'скидка', 'limit': '20'})),
+        ('access_check', lambda i, run_id: _post({'email': SEED_EMAIL.format(i % 1000)})),
+    ],
+    'admin': [
+        ('subscribers', lambda i, run_id: _get({'action': 'subscribers', 'limit': '50'}, ADMIN_HEADERS)),
+        ('subscribers_active', lambda i, run_id: _get({'action': 'subscribers', 'status': 'active', 'limit': '50'}, ADMIN_HEADERS)),
+        ('metrics', lambda i, run_id: _get({'action': 'metrics'}, ADMIN_HEADERS)),
+        ('revenue', lambda i, run_id: _get({'action': 'revenue', 'period': 'week'}, ADMIN_HEADERS)),
+        ('search', lambda i, run_id: _get({'action': 'search', 'q': f'bench-{i % 1000}', 'status': 'active'}, ADMIN_HEADERS)),
+    ],
+    'add-partner': [
+        ('single', lambda i, run_id: _post(_partner(i, run_id), {'X-Admin-Password': ADMIN_PASSWORD})),
+        ('bulk_50', lambda i, run_id: _post(
+            {'partners': [_partner(i * 50 + n, run_id) for n in range(50)]},
+            {'X-Admin-Password': ADMIN_PASSWORD}
+        )),
+    ],
+}
+
+SEED_SQL = """
+INSERT INTO subscribers (email, name, promo_code, subscription_status, payment_id, next_billing_date, created_at, payment_method_id)
+SELECT format('bench-%%s@example.com', n), format('Bench %%s', n), format('BENCH%%s', n),
+       CASE WHEN n %% 10 = 0 THEN 'cancelled' ELSE 'active' END,
+       format('seed-%%s', n), NOW() + (n %% 30) * INTERVAL '1 day',
+       NOW() - (n %% 90) * INTERVAL '1 day', format('pm-seed-%%s', n)
+FROM generate_series(0, %(count)s - 1) AS n
+ON CONFLICT (email) DO NOTHING;
+
+INSERT INTO payment_events (payment_id, event_type, subscriber_id, amount, occurred_at)
+SELECT s.payment_id, event_type, s.id, 990, s.created_at
+FROM subscribers s
+CROSS JOIN (VALUES ('created'), ('succeeded')) AS events(event_type)
+WHERE s.payment_id LIKE 'seed-%%'
+  AND NOT EXISTS (SELECT 1 FROM payments p WHERE p.payment_id = s.payment_id)
+ORDER BY s.id, event_type;
+"""
@@ -0,0 +1,154 @@
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import HTTPAdapter
+
+UPSTREAMS = {
+    'api.airtable.com': 'airtable',
+    'api.yookassa.ru': 'yookassa',
+    'api.sendgrid.com': 'sendgrid',
+    'functions.poehali.dev': 'partners',
+}
+
+CATEGORIES = ['Коворкинги', 'Жильё', 'Сервисы', 'Страховки', 'Транспорт']
+
+
+class StubState:
+    """Настройки задержек/ошибок по апстримам и счётчики вызовов"""
+
+    def __init__(self, latency_ms: Dict[str, float], error_rate: Dict[str, float], partners: int):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.partners = [
+            {
+                'id': f'rec{index:05d}',
+                'createdTime': '2025-01-01T00:00:00.000Z',
+                'fields': {
+                    'Name': f'Партнёр {index}',
+                    'Description': f'Скидка для участников клуба, предложение номер {index}',
+                    'Category': CATEGORIES[index % len(CATEGORIES)],
+                    'Offer': f'-{5 + index % 20}%',
+                    'PromoCode': f'NOMAD{index:04d}',
+                    'URL': f'https://partner{index}.example.com',
+                },
+            }
+            for index in range(partners)
+        ]
+        self.lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def count(self, upstream: str, failed: bool) -> None:
+        with self.lock:
+            self.calls[upstream] = self.calls.get(upstream, 0) + 1
+            if failed:
+                self.errors[upstream] = self.errors.get(upstream, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            return {'calls': dict(self.calls), 'errors': dict(self.errors)}
+
+
+def _airtable(state: StubState, method: str, path: str, query: Dict[str, Any], body: Any) -> Tuple[int, Any]:
+    if method == 'GET':
+        offset = int(query.get('offset', ['0'])[0] or 0)
+        page_size = int(query.get('pageSize', ['100'])[0])
+        records = state.partners[offset:offset + page_size]
+        page: Dict[str, Any] = {'records': records}
+        if offset + page_size < len(state.partners):
+            page['offset'] = str(offset + page_size)
+        return 200, page
+    records = body.get('records') or [{'fields': body.get('fields', {})}]
+    created = [{'id': f'rec{uuid.uuid4().hex[:14]}', 'fields': record['fields']} for record in records]
+    if 'records' not in body:
+        return 200, created[0]
+    return 200, {'records': created, 'createdRecords': [record['id'] for record in created]}
+
+
+def _yookassa(state: StubState, method: str, path: str, query: Dict[str, Any], body: Any) -> Tuple[int, Any]:
+    payment_id = str(uuid.uuid4())
+    status = 'succeeded' if body.get('payment_method_id') else 'pending'
+    return 200, {
+        'id': payment_id,
+        'status': status,
+        'amount': body.get('amount'),
+        'metadata': body.get('metadata', {}),
+        'confirmation': {'type': 'redirect', 'confirmation_url': f'https://yoomoney.example/checkout/{payment_id}'},
+    }
+
+
+ROUTES = {
+    'airtable': _airtable,
+    'yookassa': _yookassa,
+    'sendgrid': lambda state, method, path, query, body: (202, None),
+    'partners': lambda state, method, path, query, body: (200, {'partners': []}),
+}
+
+
+def make_server(state: StubState) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _serve(self) -> None:
+            upstream = self.headers.get('X-Bench-Upstream', 'unknown')
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length) if length else b''
+            parts = urlsplit(self.path)
+
+            latency = state.latency_ms.get(upstream, 0.0)
+            if latency:
+                time.sleep(random.uniform(0.5, 1.5) * latency / 1000)
+
+            failed = random.random() < state.error_rate.get(upstream, 0.0)
+            state.count(upstream, failed)
+            if failed:
+                status, payload = 503, {'error': 'injected failure'}
+            else:
+                body = json.loads(raw) if raw else {}
+                status, payload = ROUTES[upstream](state, self.command, parts.path, parse_qs(parts.query), body)
+
+            data = b'' if payload is None else json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _serve
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StubAdapter(HTTPAdapter):
+    """Перенаправляет запросы к внешнему хосту на локальный стаб, сохраняя путь и query"""
+
+    def __init__(self, base_url: str, upstream: str):
+        super().__init__(pool_maxsize=32)
+        self.base_url = base_url
+        self.upstream = upstream
+
+    def send(self, request: Any, **kwargs: Any) -> Any:
+        parts = urlsplit(request.url)
+        request.url = self.base_url + parts.path + (f'?{parts.query}' if parts.query else '')
+        request.headers['X-Bench-Upstream'] = self.upstream
+        return super().send(request, **kwargs)
+
+
+def route_to_stubs(http_client: Any, server: ThreadingHTTPServer) -> None:
+    """Подмена keep-alive сессий http_client функции: все внешние хосты ведут на стаб"""
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    for host, upstream in UPSTREAMS.items():
+        session = http_client.get_session(host)
+        session.mount('https://', StubAdapter(base_url, upstream))
@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS idx_subscribers_created_id ON subscribers(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_subscribers_status_created_id ON subscribers(subscription_status, created_at DESC, id DESC);
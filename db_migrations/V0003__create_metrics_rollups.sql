@@ -0,0 +1,101 @@
+CREATE TABLE IF NOT EXISTS metrics_daily (
+    day DATE PRIMARY KEY,
+    signups INTEGER NOT NULL DEFAULT 0,
+    payments_created INTEGER NOT NULL DEFAULT 0,
+    payments_completed INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS metrics_state_counts (
+    entity VARCHAR(20) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (entity, status)
+);
+
+CREATE OR REPLACE FUNCTION metrics_bump_state(p_entity VARCHAR, p_status VARCHAR, p_delta INTEGER) RETURNS void AS $$
+BEGIN
+    INSERT INTO metrics_state_counts (entity, status, total)
+    VALUES (p_entity, COALESCE(p_status, 'unknown'), p_delta)
+    ON CONFLICT (entity, status) DO UPDATE SET total = metrics_state_counts.total + EXCLUDED.total;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION metrics_track_subscribers() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO metrics_daily (day, signups)
+        VALUES (COALESCE(NEW.created_at, CURRENT_TIMESTAMP)::date, 1)
+        ON CONFLICT (day) DO UPDATE SET signups = metrics_daily.signups + 1;
+        PERFORM metrics_bump_state('subscribers', NEW.subscription_status, 1);
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF OLD.subscription_status IS DISTINCT FROM NEW.subscription_status THEN
+            PERFORM metrics_bump_state('subscribers', OLD.subscription_status, -1);
+            PERFORM metrics_bump_state('subscribers', NEW.subscription_status, 1);
+        END IF;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM metrics_bump_state('subscribers', OLD.subscription_status, -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION metrics_track_payments() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO metrics_daily (day, payments_created)
+        VALUES (COALESCE(NEW.created_at, CURRENT_TIMESTAMP)::date, 1)
+        ON CONFLICT (day) DO UPDATE SET payments_created = metrics_daily.payments_created + 1;
+        PERFORM metrics_bump_state('payments', NEW.status, 1);
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF OLD.status IS DISTINCT FROM NEW.status THEN
+            PERFORM metrics_bump_state('payments', OLD.status, -1);
+            PERFORM metrics_bump_state('payments', NEW.status, 1);
+            IF NEW.status = 'completed' THEN
+                INSERT INTO metrics_daily (day, payments_completed)
+                VALUES (COALESCE(NEW.completed_at, CURRENT_TIMESTAMP)::date, 1)
+                ON CONFLICT (day) DO UPDATE SET payments_completed = metrics_daily.payments_completed + 1;
+            END IF;
+        END IF;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM metrics_bump_state('payments', OLD.status, -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION metrics_rebuild() RETURNS void AS $$
+BEGIN
+    LOCK TABLE subscribers, payments IN SHARE MODE;
+    DELETE FROM metrics_daily;
+    DELETE FROM metrics_state_counts;
+
+    INSERT INTO metrics_daily (day, signups, payments_created, payments_completed)
+    SELECT day, SUM(signups), SUM(payments_created), SUM(payments_completed)
+    FROM (
+        SELECT created_at::date AS day, 1 AS signups, 0 AS payments_created, 0 AS payments_completed
+        FROM subscribers WHERE created_at IS NOT NULL
+        UNION ALL
+        SELECT created_at::date, 0, 1, 0 FROM payments WHERE created_at IS NOT NULL
+        UNION ALL
+        SELECT completed_at::date, 0, 0, 1 FROM payments WHERE status = 'completed' AND completed_at IS NOT NULL
+    ) events
+    GROUP BY day;
+
+    INSERT INTO metrics_state_counts (entity, status, total)
+    SELECT 'subscribers', COALESCE(subscription_status, 'unknown'), COUNT(*) FROM subscribers GROUP BY 2
+    UNION ALL
+    SELECT 'payments', COALESCE(status, 'unknown'), COUNT(*) FROM payments GROUP BY 2;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_metrics_subscribers ON subscribers;
+CREATE TRIGGER trg_metrics_subscribers
+    AFTER INSERT OR UPDATE OF subscription_status OR DELETE ON subscribers
+    FOR EACH ROW EXECUTE FUNCTION metrics_track_subscribers();
+
+DROP TRIGGER IF EXISTS trg_metrics_payments ON payments;
+CREATE TRIGGER trg_metrics_payments
+    AFTER INSERT OR UPDATE OF status OR DELETE ON payments
+    FOR EACH ROW EXECUTE FUNCTION metrics_track_payments();
+
+SELECT metrics_rebuild();
@@ -0,0 +1,14 @@
+CREATE INDEX IF NOT EXISTS idx_payments_completed_at ON payments(completed_at) WHERE status = 'completed';
+CREATE INDEX IF NOT EXISTS idx_payments_subscriber_completed ON payments(subscriber_id, completed_at) WHERE status = 'completed';
+
+CREATE TABLE IF NOT EXISTS revenue_rollups (
+    period VARCHAR(10) NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,
+    net_revenue BIGINT NOT NULL DEFAULT 0,
+    paying_subscribers INTEGER NOT NULL DEFAULT 0,
+    mrr BIGINT NOT NULL DEFAULT 0,
+    active_subscribers INTEGER NOT NULL DEFAULT 0,
+    churned_mrr BIGINT NOT NULL DEFAULT 0,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (period, bucket_start)
+);
@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS processed_webhooks (
+    event_key VARCHAR(255) PRIMARY KEY,
+    payment_id VARCHAR(255) NOT NULL,
+    event VARCHAR(100) NOT NULL,
+    deliveries INTEGER NOT NULL DEFAULT 1,
+    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_delivery_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_processed_webhooks_payment ON processed_webhooks(payment_id);
@@ -0,0 +1,15 @@
+CREATE OR REPLACE FUNCTION notify_subscriber_status() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR OLD.subscription_status IS DISTINCT FROM NEW.subscription_status THEN
+        PERFORM pg_notify('subscriber_status', lower(NEW.email));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notify_subscriber_status ON subscribers;
+CREATE TRIGGER trg_notify_subscriber_status
+    AFTER INSERT OR UPDATE OF subscription_status ON subscribers
+    FOR EACH ROW EXECUTE FUNCTION notify_subscriber_status();
+
+CREATE INDEX IF NOT EXISTS idx_subscribers_email_lower ON subscribers(lower(email)) INCLUDE (subscription_status);
@@ -0,0 +1,12 @@
+CREATE OR REPLACE FUNCTION notify_subscriber_status() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR OLD.subscription_status IS DISTINCT FROM NEW.subscription_status THEN
+        PERFORM pg_notify('subscriber_status', json_build_object(
+            'email', lower(NEW.email),
+            'id', NEW.id,
+            'status', NEW.subscription_status
+        )::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,35 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS partners (
+    airtable_id VARCHAR(32) PRIMARY KEY,
+    name VARCHAR(255) NOT NULL DEFAULT '',
+    logo VARCHAR(1000) NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    category VARCHAR(100) NOT NULL DEFAULT 'Быт',
+    offer TEXT NOT NULL DEFAULT '',
+    promo_code VARCHAR(100) NOT NULL DEFAULT '',
+    url VARCHAR(1000) NOT NULL DEFAULT '',
+    airtable_created_at TIMESTAMP,
+    deleted BOOLEAN NOT NULL DEFAULT FALSE,
+    synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    search_text TEXT GENERATED ALWAYS AS (name || ' ' || offer || ' ' || description) STORED,
+    search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', name), 'A') ||
+        setweight(to_tsvector('russian', offer), 'B') ||
+        setweight(to_tsvector('russian', description), 'C')
+    ) STORED
+);
+
+CREATE INDEX IF NOT EXISTS idx_partners_listing ON partners(airtable_created_at, airtable_id) WHERE NOT deleted;
+CREATE INDEX IF NOT EXISTS idx_partners_category ON partners(category, airtable_created_at, airtable_id) WHERE NOT deleted;
+CREATE INDEX IF NOT EXISTS idx_partners_search_vector ON partners USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_partners_search_trgm ON partners USING GIN (search_text gin_trgm_ops);
+
+CREATE TABLE IF NOT EXISTS partners_sync_state (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    watermark TIMESTAMP,
+    last_full_sync_at TIMESTAMP,
+    synced_at TIMESTAMP
+);
+
+INSERT INTO partners_sync_state (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,13 @@
+CREATE TABLE IF NOT EXISTS promo_codes (
+    code VARCHAR(50) PRIMARY KEY,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    assigned_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_promo_codes_available ON promo_codes(code) WHERE assigned_at IS NULL;
+
+INSERT INTO promo_codes (code, created_at, assigned_at)
+SELECT promo_code, created_at, created_at
+FROM subscribers
+WHERE promo_code IS NOT NULL
+ON CONFLICT (code) DO NOTHING;
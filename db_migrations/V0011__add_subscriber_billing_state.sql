@@ -0,0 +1,6 @@
+ALTER TABLE subscribers ADD COLUMN IF NOT EXISTS payment_method_id VARCHAR(255);
+ALTER TABLE subscribers ADD COLUMN IF NOT EXISTS billing_attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE subscribers ADD COLUMN IF NOT EXISTS billing_locked_until TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_subscribers_billing_due ON subscribers(subscription_status, next_billing_date)
+    WHERE subscription_status IN ('active', 'past_due');
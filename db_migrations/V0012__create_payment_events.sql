@@ -0,0 +1,95 @@
+CREATE TABLE IF NOT EXISTS payment_events (
+    id BIGSERIAL,
+    payment_id VARCHAR(255) NOT NULL,
+    event_type VARCHAR(30) NOT NULL,
+    subscriber_id INTEGER,
+    amount INTEGER,
+    metadata JSONB DEFAULT '{}'::jsonb,
+    occurred_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, occurred_at)
+) PARTITION BY RANGE (occurred_at);
+
+CREATE TABLE IF NOT EXISTS payment_events_default PARTITION OF payment_events DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_payment_events_payment ON payment_events(payment_id);
+CREATE INDEX IF NOT EXISTS idx_payment_events_succeeded ON payment_events(occurred_at, subscriber_id)
+    WHERE event_type = 'succeeded';
+
+CREATE OR REPLACE FUNCTION payment_events_ensure_partition(p_month DATE) RETURNS TEXT AS $$
+DECLARE
+    v_start DATE := date_trunc('month', p_month)::date;
+    v_end DATE := (date_trunc('month', p_month) + INTERVAL '1 month')::date;
+    v_name TEXT := 'payment_events_' || to_char(p_month, 'YYYY_MM');
+BEGIN
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE payment_events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', v_name);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM payment_events_default WHERE occurred_at >= %L AND occurred_at < %L RETURNING *)
+         INSERT INTO %I SELECT * FROM moved',
+        v_start, v_end, v_name
+    );
+    EXECUTE format('ALTER TABLE payment_events ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', v_name, v_start, v_end);
+    RETURN v_name;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION payment_events_detach_before(p_before DATE) RETURNS SETOF TEXT AS $$
+DECLARE
+    v_name TEXT;
+BEGIN
+    FOR v_name IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'payment_events'::regclass
+          AND c.relname ~ '^payment_events_[0-9]{4}_[0-9]{2}$'
+          AND to_date(right(c.relname, 7), 'YYYY_MM') + INTERVAL '1 month' <= p_before
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('ALTER TABLE payment_events DETACH PARTITION %I', v_name);
+        RETURN NEXT v_name;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT payment_events_ensure_partition(month::date)
+FROM generate_series(
+    date_trunc('month', LEAST((SELECT MIN(created_at) FROM payments), CURRENT_TIMESTAMP)),
+    date_trunc('month', CURRENT_TIMESTAMP) + INTERVAL '2 months',
+    INTERVAL '1 month'
+) AS month;
+
+INSERT INTO payment_events (payment_id, event_type, subscriber_id, amount, metadata, occurred_at)
+SELECT payment_id, 'created', subscriber_id, amount, metadata, COALESCE(created_at, CURRENT_TIMESTAMP)
+FROM payments
+WHERE payment_id IS NOT NULL
+UNION ALL
+SELECT payment_id, 'succeeded', subscriber_id, amount, '{}'::jsonb, COALESCE(completed_at, created_at, CURRENT_TIMESTAMP)
+FROM payments
+WHERE payment_id IS NOT NULL AND status = 'completed';
+
+CREATE OR REPLACE FUNCTION payment_events_project() RETURNS trigger AS $$
+BEGIN
+    IF NEW.event_type = 'created' THEN
+        INSERT INTO payments (payment_id, subscriber_id, amount, status, created_at, metadata)
+        VALUES (NEW.payment_id, NEW.subscriber_id, COALESCE(NEW.amount, 0), 'pending', NEW.occurred_at, NEW.metadata)
+        ON CONFLICT (payment_id) DO NOTHING;
+    ELSIF NEW.event_type = 'succeeded' THEN
+        UPDATE payments SET
+            status = 'completed',
+            subscriber_id = COALESCE(NEW.subscriber_id, payments.subscriber_id),
+            completed_at = NEW.occurred_at
+        WHERE payment_id = NEW.payment_id AND status IS DISTINCT FROM 'completed';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_payment_events_project ON payment_events;
+CREATE TRIGGER trg_payment_events_project
+    AFTER INSERT ON payment_events
+    FOR EACH ROW EXECUTE FUNCTION payment_events_project();
+
+DROP INDEX IF EXISTS idx_payments_status;
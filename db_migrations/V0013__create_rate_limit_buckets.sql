@@ -0,0 +1,26 @@
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+    bucket_key VARCHAR(320) PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_updated ON rate_limit_buckets(updated_at);
+
+CREATE OR REPLACE FUNCTION rate_limit_take(p_key VARCHAR, p_capacity REAL, p_per_second REAL) RETURNS REAL AS $$
+DECLARE
+    v_tokens REAL;
+BEGIN
+    INSERT INTO rate_limit_buckets AS b (bucket_key, tokens, updated_at)
+    VALUES (p_key, p_capacity, clock_timestamp())
+    ON CONFLICT (bucket_key) DO UPDATE SET
+        tokens = LEAST(p_capacity, b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at)::real * p_per_second),
+        updated_at = clock_timestamp()
+    RETURNING tokens INTO v_tokens;
+
+    IF v_tokens >= 1 THEN
+        UPDATE rate_limit_buckets SET tokens = tokens - 1 WHERE bucket_key = p_key;
+        RETURN 0;
+    END IF;
+    RETURN (1 - v_tokens) / p_per_second;
+END;
+$$ LANGUAGE plpgsql;
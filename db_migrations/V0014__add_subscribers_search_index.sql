@@ -0,0 +1,10 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE subscribers ADD COLUMN IF NOT EXISTS search_text TEXT GENERATED ALWAYS AS (
+    lower(email || ' ' || COALESCE(name, '') || ' ' || COALESCE(promo_code, ''))
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_subscribers_search_trgm ON subscribers USING GIN (search_text gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_subscribers_email_prefix ON subscribers(lower(email) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_subscribers_promo_prefix ON subscribers(lower(promo_code) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_subscribers_next_billing ON subscribers(next_billing_date, id);
@@ -0,0 +1 @@
+ALTER TABLE partners_sync_state ADD COLUMN IF NOT EXISTS lease_until TIMESTAMP;
@@ -0,0 +1,28 @@
+CREATE OR REPLACE FUNCTION payment_events_project() RETURNS trigger AS $$
+BEGIN
+    IF NEW.event_type = 'created' THEN
+        INSERT INTO payments (payment_id, subscriber_id, amount, status, created_at, metadata)
+        VALUES (NEW.payment_id, NEW.subscriber_id, COALESCE(NEW.amount, 0), 'pending', NEW.occurred_at, NEW.metadata)
+        ON CONFLICT (payment_id) DO NOTHING;
+
+        UPDATE payments SET
+            status = 'completed',
+            completed_at = succeeded.occurred_at
+        FROM (
+            SELECT MIN(occurred_at) AS occurred_at
+            FROM payment_events
+            WHERE payment_id = NEW.payment_id AND event_type = 'succeeded'
+        ) AS succeeded
+        WHERE payments.payment_id = NEW.payment_id
+          AND payments.status IS DISTINCT FROM 'completed'
+          AND succeeded.occurred_at IS NOT NULL;
+    ELSIF NEW.event_type = 'succeeded' THEN
+        UPDATE payments SET
+            status = 'completed',
+            subscriber_id = COALESCE(NEW.subscriber_id, payments.subscriber_id),
+            completed_at = NEW.occurred_at
+        WHERE payment_id = NEW.payment_id AND status IS DISTINCT FROM 'completed';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,11 @@
+CREATE UNLOGGED TABLE IF NOT EXISTS partners_sync_staging (
+    airtable_id VARCHAR(32) PRIMARY KEY,
+    name VARCHAR(255) NOT NULL DEFAULT '',
+    logo VARCHAR(1000) NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    category VARCHAR(100) NOT NULL DEFAULT 'Быт',
+    offer TEXT NOT NULL DEFAULT '',
+    promo_code VARCHAR(100) NOT NULL DEFAULT '',
+    url VARCHAR(1000) NOT NULL DEFAULT '',
+    airtable_created_at TIMESTAMP
+);
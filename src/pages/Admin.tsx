@@ -28,6 +28,8 @@ export default function Admin() {
   const [password, setPassword] = useState('');
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [subscribers, setSubscribers] = useState<Subscriber[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [metrics, setMetrics] = useState<Metrics | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
@@ -76,6 +78,7 @@ export default function Admin() {
         const metricsData = await metricsRes.json();
         
         setSubscribers(subscribersData.subscribers || []);
+        setNextCursor(subscribersData.next_cursor || null);
         setMetrics(metricsData.metrics || null);
       }
     } catch (err) {
@@ -85,6 +88,26 @@ export default function Admin() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await fetch(`${ADMIN_API_URL}?action=subscribers&cursor=${encodeURIComponent(nextCursor)}`, {
+        headers: { 'Authorization': `Bearer ${password}` }
+      });
+
+      if (response.ok) {
+        const data = await response.json();
+        setSubscribers((prev) => [...prev, ...(data.subscribers || [])]);
+        setNextCursor(data.next_cursor || null);
+      }
+    } catch (err) {
+      setError('Ошибка загрузки данных');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     if (isAuthenticated && password) {
       const interval = setInterval(() => {
@@ -240,6 +263,13 @@ export default function Admin() {
                   )}
                 </TableBody>
               </Table>
+              {nextCursor && (
+                <div className="flex justify-center mt-6">
+                  <Button onClick={loadMore} variant="outline" disabled={loadingMore}>
+                    {loadingMore ? 'Загрузка...' : 'Показать ещё'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </Card>
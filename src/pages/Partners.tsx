@@ -44,6 +44,9 @@ export default function Partners() {
       if (data.authorized) {
         setIsAuthorized(true);
         sessionStorage.setItem('partnerAuth', email);
+        if (data.token) {
+          sessionStorage.setItem('partnerToken', data.token);
+        }
         toast({
           title: 'Добро пожаловать!',
           description: 'Доступ к разделу партнёров открыт',
@@ -68,10 +71,28 @@ export default function Partners() {
 
   useEffect(() => {
     const savedAuth = sessionStorage.getItem('partnerAuth');
-    if (savedAuth) {
-      setEmail(savedAuth);
-      setIsAuthorized(true);
-    }
+    const savedToken = sessionStorage.getItem('partnerToken');
+    if (!savedAuth) return;
+
+    setEmail(savedAuth);
+    fetch('https://functions.poehali.dev/0ba101c6-edbb-4c53-947b-65f0d4c639ec', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ email: savedAuth, token: savedToken }),
+    })
+      .then((response) => response.json())
+      .then((data) => {
+        if (data.authorized) {
+          setIsAuthorized(true);
+          if (data.token) {
+            sessionStorage.setItem('partnerToken', data.token);
+          }
+        } else {
+          sessionStorage.removeItem('partnerAuth');
+          sessionStorage.removeItem('partnerToken');
+        }
+      })
+      .catch((error) => console.error('Failed to restore partner access:', error));
   }, []);
 
   useEffect(() => {
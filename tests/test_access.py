@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'partners'))
+
+import access  # noqa: E402
+
+
+@pytest.fixture
+def listener(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(access, '_drain_invalidations', lambda: None)
+    monkeypatch.setattr(access, '_listening_since', 1000.5)
+    monkeypatch.setattr(access, 'active_member_id', lambda email: lookups.append(email) or 7)
+    access._revoked.clear()
+    access._confirmed.clear()
+    yield lookups
+    access._revoked.clear()
+    access._confirmed.clear()
+
+
+def test_token_after_listener_start_needs_no_lookup(listener):
+    assert not access.is_revoked(7, 1001, 'member@example.com')
+    assert listener == []
+
+
+def test_older_token_is_confirmed_once(listener):
+    assert not access.is_revoked(7, 900, 'member@example.com')
+    assert not access.is_revoked(7, 950, 'member@example.com')
+    assert listener == ['member@example.com']
+
+
+def test_older_token_of_inactive_member_is_revoked(listener, monkeypatch):
+    monkeypatch.setattr(access, 'active_member_id', lambda email: None)
+
+    assert access.is_revoked(7, 900, 'member@example.com')
+    assert 7 not in access._confirmed
+
+
+def test_notify_in_the_same_second_revokes(listener):
+    access._apply_notification('{"id": 7, "email": "member@example.com", "status": "expired"}')
+    revoked_at = access._revoked[7]
+
+    assert access.is_revoked(7, int(revoked_at), 'member@example.com')
+    assert not access.is_revoked(7, int(revoked_at) + 1, 'member@example.com')
@@ -0,0 +1,28 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..', 'backend', 'add-partner')
+sys.path.insert(0, BACKEND)
+
+spec = importlib.util.spec_from_file_location('add_partner_index', os.path.join(BACKEND, 'index.py'))
+add_partner = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(add_partner)
+
+
+@pytest.mark.parametrize('body', ['"Coffee"', '42', 'null'])
+def test_scalar_body_is_rejected(monkeypatch, body):
+    monkeypatch.setenv('ADMIN_PASSWORD', 'secret')
+
+    response = add_partner.handler({'httpMethod': 'POST', 'headers': {'X-Admin-Password': 'secret'}, 'body': body}, None)
+
+    assert response['statusCode'] == 400
+
+
+def test_sync_hint_skipped_without_partners_url(monkeypatch):
+    monkeypatch.delenv('PARTNERS_API_URL', raising=False)
+    monkeypatch.setattr('http_client.get_session', lambda host: pytest.fail('called partners without a URL'))
+
+    add_partner.invalidate_partners_cache()
@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'payment'))
+
+import billing  # noqa: E402
+
+
+class FakeCursor:
+    def execute(self, query, vars=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor()
+
+    def commit(self):
+        self.commits += 1
+
+
+CHARGE = {
+    'subscriber': {'id': 7, 'amount': 990, 'email': 'member@example.com', 'period': '2026-10-17'},
+    'status': 'renewed',
+    'payment_id': 'renewal-payment',
+}
+
+
+def _record(monkeypatch, claimed):
+    updates, events = [], []
+    monkeypatch.setattr(billing, 'claim_events', lambda cur, keys: claimed)
+    monkeypatch.setattr(billing, 'execute_values', lambda cur, sql, rows, **kwargs: updates.append((sql, rows)) or [])
+    monkeypatch.setattr(billing, 'record_events', lambda cur, rows: events.extend(rows))
+    conn = FakeConnection()
+    counts = billing._record(conn, [dict(CHARGE)])
+    assert conn.commits == 1
+    return counts, updates, events
+
+
+def test_renewal_extends_billing_date_when_claimed(monkeypatch):
+    counts, updates, events = _record(monkeypatch, {'payment.succeeded:renewal-payment'})
+
+    assert counts['renewed'] == 1
+    assert [rows for sql, rows in updates if 'next_billing_date' in sql] == [[(7, 'renewal-payment')]]
+    assert [event[1] for event in events] == ['created', 'succeeded']
+
+
+def test_renewal_skipped_when_webhook_won_the_race(monkeypatch):
+    counts, updates, events = _record(monkeypatch, set())
+
+    assert counts['renewed'] == 0
+    assert not [sql for sql, rows in updates if 'next_billing_date' in sql]
+    assert [(event[0], event[1]) for event in events] == [('renewal-payment', 'created')]
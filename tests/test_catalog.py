@@ -0,0 +1,102 @@
+import os
+import sys
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'partners'))
+
+import catalog  # noqa: E402
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    state = {'body': '{"partners": []}', 'loads': 0, 'background': 0}
+
+    def load():
+        state['loads'] += 1
+        if isinstance(state['body'], Exception):
+            raise state['body']
+        return state['body']
+
+    monkeypatch.setattr(catalog, 'load_catalog_json', load)
+    monkeypatch.setattr(catalog, '_refresh_in_background', lambda: state.__setitem__('background', state['background'] + 1))
+    monkeypatch.setattr(catalog, '_cache', {'body': None, 'etag': None, 'last_modified': None, 'fetched_at': 0.0})
+    monkeypatch.setattr(catalog, '_stats', {key: 0 for key in catalog._stats})
+    return state
+
+
+def _age(seconds):
+    catalog._cache['fetched_at'] -= seconds
+
+
+def test_cold_cache_loads_synchronously(cache):
+    snapshot = catalog.get_catalog()
+
+    assert snapshot['body'] == '{"partners": []}'
+    assert snapshot['etag'].startswith('"') and snapshot['last_modified'].endswith('GMT')
+    assert (cache['loads'], cache['background']) == (1, 1)
+
+
+def test_fresh_cache_is_served_without_reload(cache):
+    catalog.get_catalog()
+    catalog.get_catalog()
+
+    assert cache['loads'] == 1
+    assert catalog.catalog_stats()['hits'] == 1
+
+
+def test_stale_cache_is_served_while_refreshing_in_background(cache):
+    first = catalog.get_catalog()
+    _age(catalog.CATALOG_TTL + 1)
+    cache['body'] = '{"partners": [1]}'
+
+    assert catalog.get_catalog() == first
+    assert cache['loads'] == 1
+    assert cache['background'] == 2
+    assert catalog.catalog_stats()['stale_hits'] == 1
+
+
+def test_expired_cache_is_reloaded(cache):
+    first = catalog.get_catalog()
+    _age(catalog.CATALOG_TTL + catalog.CATALOG_STALE_TTL + 1)
+    cache['body'] = '{"partners": [1]}'
+
+    second = catalog.get_catalog()
+
+    assert second['body'] == '{"partners": [1]}'
+    assert second['etag'] != first['etag']
+
+
+def test_unchanged_body_keeps_etag_and_last_modified(cache):
+    first = catalog.get_catalog()
+    catalog.invalidate()
+    _age(catalog.CATALOG_TTL + catalog.CATALOG_STALE_TTL)
+
+    assert catalog.get_catalog() == first
+    assert cache['loads'] == 2
+
+
+def test_failed_refresh_keeps_last_copy(cache):
+    first = catalog.get_catalog()
+    cache['body'] = psycopg2.OperationalError('connection refused')
+
+    assert catalog.refresh(sync=False) is False
+    assert catalog.get_catalog() == first
+    assert catalog.catalog_stats()['refresh_errors'] == 1
+
+
+@pytest.mark.parametrize('headers, expected', [
+    ({'If-None-Match': '"abc"'}, True),
+    ({'if-none-match': 'W/"abc", "other"'}, True),
+    ({'If-None-Match': '*'}, True),
+    ({'If-None-Match': '"other"'}, False),
+    ({'If-Modified-Since': 'Sat, 17 Oct 2026 10:00:00 GMT'}, True),
+    ({'If-Modified-Since': 'Sat, 17 Oct 2026 08:00:00 GMT'}, False),
+    ({'If-Modified-Since': 'not a date'}, False),
+    ({}, False),
+])
+def test_conditional_requests(headers, expected):
+    snapshot = {'etag': '"abc"', 'last_modified': 'Sat, 17 Oct 2026 09:00:00 GMT'}
+
+    assert catalog.is_not_modified(headers, snapshot) is expected
@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'payment'))
+
+import db  # noqa: E402
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    opened = []
+
+    def connect():
+        conn = FakeConnection()
+        opened.append(conn)
+        with db._lock:
+            db._stats['connects'] += 1
+        return conn
+
+    monkeypatch.setattr(db, '_connect', connect)
+    monkeypatch.setattr(db, '_idle', [])
+    monkeypatch.setattr(db, '_stats', {key: 0 for key in db._stats})
+    return opened
+
+
+def test_connection_is_reused_across_calls(pool):
+    with db.get_connection() as first:
+        pass
+    with db.get_connection() as second:
+        pass
+
+    assert first is second
+    assert first.rollbacks == 2
+    stats = db.pool_stats()
+    assert (stats['connects'], stats['reuses'], stats['in_use'], stats['idle']) == (1, 1, 0, 1)
+
+
+def test_broken_connection_is_discarded(pool):
+    with pytest.raises(psycopg2.OperationalError):
+        with db.get_connection():
+            raise psycopg2.OperationalError('server closed the connection')
+
+    with db.get_connection() as conn:
+        pass
+
+    assert pool[0].closed and conn is pool[1]
+    assert db.pool_stats()['stale_dropped'] == 1
+
+
+def test_connection_idle_too_long_is_replaced(pool, monkeypatch):
+    with db.get_connection():
+        pass
+    conn, released_at = db._idle[0]
+    db._idle[0] = (conn, released_at - db.MAX_IDLE_SECONDS - 1)
+
+    with db.get_connection() as fresh:
+        pass
+
+    assert fresh is not conn and conn.closed
+
+
+def test_exhausted_pool_raises_after_wait(pool, monkeypatch):
+    monkeypatch.setattr(db, 'POOL_WAIT_TIMEOUT', 0.01)
+    held = [db._acquire() for _ in range(db.POOL_MAX_SIZE)]
+    try:
+        assert db.saturated()
+        started = time.monotonic()
+        with pytest.raises(db.PoolExhausted):
+            db._acquire()
+        assert time.monotonic() - started < 1
+    finally:
+        for conn in held:
+            db._release(conn)
+
+    assert not db.saturated()
+    assert db.pool_stats()['exhausted'] == 1
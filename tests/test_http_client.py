@@ -0,0 +1,99 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'payment'))
+
+import http_client  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, kwargs))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def session(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(http_client, '_stats', {})
+    monkeypatch.setattr(http_client.time, 'sleep', sleeps.append)
+    monkeypatch.setattr(http_client.random, 'uniform', lambda low, high: 1.0)
+
+    def install(*outcomes):
+        fake = FakeSession(outcomes)
+        monkeypatch.setattr(http_client, 'get_session', lambda host: fake)
+        fake.sleeps = sleeps
+        return fake
+
+    return install
+
+
+def test_idempotent_request_retries_5xx(session):
+    fake = session(FakeResponse(503), FakeResponse(502), FakeResponse(200))
+
+    response = http_client.request('partners', 'GET', 'https://api.example.com/partners')
+
+    assert response.status_code == 200
+    assert fake.sleeps == [0.25, 0.5]
+    assert fake.calls[0][1]['timeout'] == (http_client.CONNECT_TIMEOUT, http_client.READ_TIMEOUT)
+    stats = http_client.http_stats()['partners']
+    assert stats['outcomes'] == {'503': 1, '502': 1, '200': 1}
+    assert stats['retries'] == 2
+
+
+def test_non_idempotent_request_is_not_retried(session):
+    fake = session(FakeResponse(503), requests.ConnectionError('reset'))
+
+    assert http_client.request('sendgrid', 'POST', 'https://api.example.com/send').status_code == 503
+    with pytest.raises(requests.ConnectionError):
+        http_client.request('sendgrid', 'POST', 'https://api.example.com/send')
+    assert fake.sleeps == []
+
+
+def test_rate_limit_is_retried_even_for_post(session):
+    fake = session(FakeResponse(429, {'Retry-After': '2'}), FakeResponse(202))
+
+    response = http_client.request('sendgrid', 'POST', 'https://api.example.com/send')
+
+    assert response.status_code == 202
+    assert fake.sleeps == [2.0]
+
+
+def test_long_retry_after_returns_response(session):
+    fake = session(FakeResponse(429, {'Retry-After': str(http_client.MAX_RETRY_SLEEP + 1)}))
+
+    assert http_client.request('yookassa', 'POST', 'https://api.example.com/payments').status_code == 429
+    assert fake.sleeps == []
+
+
+def test_idempotent_flag_overrides_method(session):
+    fake = session(requests.ReadTimeout('slow'), FakeResponse(200))
+
+    response = http_client.request('yookassa', 'POST', 'https://api.example.com/payments', idempotent=True)
+
+    assert response.status_code == 200
+    assert http_client.http_stats()['yookassa']['outcomes'] == {'ReadTimeout': 1, '200': 1}
+    assert len(fake.calls) == 2
+
+
+def test_retries_stop_after_max_retries(session):
+    fake = session(*[FakeResponse(500)] * (http_client.MAX_RETRIES + 1))
+
+    assert http_client.request('partners', 'GET', 'https://api.example.com/partners').status_code == 500
+    assert len(fake.calls) == http_client.MAX_RETRIES + 1
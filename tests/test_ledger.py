@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+
+import psycopg2.extras
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'payment'))
+
+import index  # noqa: E402
+import ledger  # noqa: E402
+
+YOOKASSA_SOURCE = {'requestContext': {'identity': {'sourceIp': '185.71.76.1'}}}
+PAYMENT = {
+    'event': 'payment.succeeded',
+    'object': {'id': 'pay-ledger-1', 'status': 'succeeded', 'metadata': {'email': 'member@example.com'}},
+}
+
+
+class ClaimCursor:
+    def __init__(self, inserted):
+        self.inserted = inserted
+
+    def execute(self, query, vars=None):
+        self.vars = vars
+
+    def fetchone(self):
+        return (self.inserted,)
+
+
+@pytest.fixture(autouse=True)
+def fresh_ledger(monkeypatch):
+    monkeypatch.setattr(ledger, '_recent', ledger.OrderedDict())
+    monkeypatch.setattr(ledger, '_stats', {key: 0 for key in ledger._stats})
+
+
+def test_recent_events_are_bounded_lru(monkeypatch):
+    monkeypatch.setattr(ledger, 'RECENT_EVENTS_LIMIT', 2)
+    ledger.remember('a')
+    ledger.remember('b')
+    assert ledger.seen_recently('a')
+    ledger.remember('c')
+
+    assert ledger.seen_recently('a') and ledger.seen_recently('c')
+    assert not ledger.seen_recently('b')
+
+
+def test_claim_event_reports_first_delivery_only():
+    assert ledger.claim_event(ClaimCursor(True), 'payment.succeeded:p1', 'p1', 'payment.succeeded')
+    assert not ledger.claim_event(ClaimCursor(False), 'payment.succeeded:p1', 'p1', 'payment.succeeded')
+    assert ledger.ledger_stats() == {'processed': 1, 'deduplicated_local': 0, 'deduplicated_db': 1}
+
+
+def test_claim_events_returns_newly_inserted_keys(monkeypatch):
+    monkeypatch.setattr(psycopg2.extras, 'execute_values', lambda cur, sql, rows, **kwargs: [
+        ('payment.succeeded:p1', True), ('payment.succeeded:p2', False),
+    ])
+
+    claimed = ledger.claim_events(object(), [
+        ('payment.succeeded:p1', 'p1', 'payment.succeeded'), ('payment.succeeded:p2', 'p2', 'payment.succeeded'),
+    ])
+
+    assert claimed == {'payment.succeeded:p1'}
+    assert ledger.ledger_stats()['deduplicated_db'] == 1
+
+
+def test_redelivery_seen_by_container_skips_the_database(monkeypatch):
+    monkeypatch.setattr(index, 'process_succeeded_payment', lambda *args: pytest.fail('processed a redelivery'))
+    ledger.remember(ledger.event_key('payment.succeeded', 'pay-ledger-1'))
+
+    response = index.handle_webhook(YOOKASSA_SOURCE, PAYMENT)
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body']) == {'status': 'ok', 'deduplicated': True}
@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'payment'))
+
+import mailer  # noqa: E402
+from outbox import EmailSendError  # noqa: E402
+from templates import EmailTemplate  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+def _message(n, email=None):
+    return {
+        'id': n,
+        'email': email or f'member{n}@example.com',
+        'name': f'Member {n}',
+        'payload': {'telegram_link': 'https://t.me/+invite', 'promo_code': f'NOMAD-{n}'},
+    }
+
+
+def _mock_post(monkeypatch, respond):
+    payloads = []
+
+    def post(payload):
+        payloads.append(payload)
+        return respond(payload)
+
+    monkeypatch.setattr(mailer, '_post', post)
+    return payloads
+
+
+def test_template_escapes_html_but_keeps_text_raw():
+    template = EmailTemplate('Hi $name', '<p>$name</p>', 'Hi $name')
+
+    personalization = template.personalization('a@example.com', {'name': 'Tom & <Jerry>'})
+
+    assert template.subject == 'Hi -name-'
+    assert [part['value'] for part in template.content] == ['Hi -name-', '<p>-name.html-</p>']
+    assert personalization['substitutions'] == {
+        '-name-': 'Tom & <Jerry>',
+        '-name.html-': 'Tom &amp; &lt;Jerry&gt;',
+    }
+    assert personalization['to'] == [{'email': 'a@example.com', 'name': 'Tom & <Jerry>'}]
+
+
+def test_batch_is_chunked(monkeypatch):
+    monkeypatch.setattr(mailer, 'MAX_PERSONALIZATIONS', 2)
+    payloads = _mock_post(monkeypatch, lambda payload: FakeResponse(202))
+
+    assert mailer.send_batch('welcome', [_message(n) for n in range(5)]) == {}
+    assert [len(payload['personalizations']) for payload in payloads] == [2, 2, 1]
+
+
+def test_rejected_batch_falls_back_to_single_sends(monkeypatch):
+    def respond(payload):
+        emails = [p['to'][0]['email'] for p in payload['personalizations']]
+        return FakeResponse(400, 'invalid email') if 'broken' in emails else FakeResponse(202)
+
+    payloads = _mock_post(monkeypatch, respond)
+    messages = [_message(1), _message(2, 'broken'), _message(3)]
+
+    failures = mailer.send_batch('welcome', messages)
+
+    assert list(failures) == [2]
+    assert 'invalid email' in failures[2]
+    assert [len(payload['personalizations']) for payload in payloads] == [3, 1, 1, 1]
+
+
+def test_rate_limited_batch_is_not_split(monkeypatch):
+    payloads = _mock_post(monkeypatch, lambda payload: FakeResponse(429, 'slow down'))
+
+    with pytest.raises(EmailSendError):
+        mailer.send_batch('welcome', [_message(1), _message(2)])
+    assert len(payloads) == 1
+
+
+def test_failed_later_chunk_reports_its_messages(monkeypatch):
+    monkeypatch.setattr(mailer, 'MAX_PERSONALIZATIONS', 2)
+    responses = iter([FakeResponse(202), FakeResponse(503, 'unavailable')])
+    _mock_post(monkeypatch, lambda payload: next(responses))
+
+    failures = mailer.send_batch('welcome', [_message(n) for n in range(4)])
+
+    assert sorted(failures) == [2, 3]
+
+
+def test_unknown_template_raises():
+    with pytest.raises(EmailSendError):
+        mailer.send_batch('missing', [_message(1)])
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'partners'))
+
+import airtable  # noqa: E402
+import mirror  # noqa: E402
+
+
+@pytest.fixture
+def sync(monkeypatch):
+    calls = {'staged': [], 'released': 0, 'applied': 0}
+    monkeypatch.setattr(mirror, '_claim_sync', lambda: (None, None, None))
+    monkeypatch.setattr(mirror, '_stage_page', lambda records: calls['staged'].append(records))
+    monkeypatch.setattr(mirror, '_release_sync', lambda: calls.__setitem__('released', calls['released'] + 1))
+
+    def apply(started_at, full):
+        calls['applied'] += 1
+        return sum(len(page) for page in calls['staged']), 0
+
+    monkeypatch.setattr(mirror, '_apply_staging', apply)
+    return calls
+
+
+def test_pages_are_staged_one_at_a_time(monkeypatch, sync):
+    pages = [[{'id': 'rec1'}], [{'id': 'rec2'}, {'id': 'rec3'}]]
+    monkeypatch.setattr(airtable, 'iter_pages', lambda formula: ((page, None) for page in pages))
+
+    result = mirror.sync_partners(force=True)
+
+    assert result == {'status': 'synced', 'mode': 'full', 'upserted': 3, 'deleted': 0}
+    assert sync['staged'] == pages
+    assert sync['released'] == 0
+
+
+@pytest.mark.parametrize('failure', [airtable.CatalogUnavailable('down'), KeyError('fields')])
+def test_lease_released_when_sync_fails(monkeypatch, sync, failure):
+    def pages(formula):
+        raise failure
+        yield
+
+    monkeypatch.setattr(airtable, 'iter_pages', pages)
+
+    if isinstance(failure, airtable.CatalogUnavailable):
+        assert mirror.sync_partners(force=True)['status'] == 'failed'
+    else:
+        with pytest.raises(KeyError):
+            mirror.sync_partners(force=True)
+
+    assert sync['released'] == 1
+    assert sync['applied'] == 0
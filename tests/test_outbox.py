@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'payment'))
+
+import outbox  # noqa: E402
+
+
+def _message(message_id, attempts=1, template='welcome'):
+    return {'id': message_id, 'template': template, 'email': f'{message_id}@example.com', 'name': 'Member',
+            'payload': {}, 'attempts': attempts}
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    state = {'batches': [], 'recorded': []}
+    monkeypatch.setattr(outbox, '_claim', lambda conn, size: state['batches'].pop(0) if state['batches'] else [])
+    monkeypatch.setattr(outbox, '_record', lambda conn, sent, failures: state['recorded'].append((sent, failures)))
+    monkeypatch.setattr(outbox.random, 'uniform', lambda low, high: 1.0)
+    return state
+
+
+@pytest.mark.parametrize('attempts, delay', [(1, 60), (2, 120), (4, 480), (7, 3600), (20, 3600)])
+def test_backoff_doubles_up_to_the_cap(monkeypatch, attempts, delay):
+    monkeypatch.setattr(outbox.random, 'uniform', lambda low, high: 1.0)
+
+    assert outbox._backoff(attempts) == delay
+
+
+def test_backoff_is_jittered():
+    delays = {outbox._backoff(3) for _ in range(20)}
+
+    assert all(0.8 * 240 <= delay <= 1.2 * 240 for delay in delays)
+    assert len(delays) > 1
+
+
+def test_failed_messages_are_retried_then_failed(queue):
+    queue['batches'] = [[_message(1), _message(2, attempts=2), _message(3, attempts=outbox.MAX_ATTEMPTS)]]
+
+    result = outbox.drain_outbox(object(), lambda template, group: {2: 'bounced', 3: 'bounced'})
+
+    sent, failures = queue['recorded'][0]
+    assert sent == [1]
+    assert failures == [
+        {'id': 2, 'status': 'retry', 'error': 'bounced', 'delay': 120},
+        {'id': 3, 'status': 'failed', 'error': 'bounced', 'delay': 0},
+    ]
+    assert (result['sent'], result['retried'], result['failed']) == (1, 1, 1)
+
+
+def test_send_error_fails_only_its_template(queue):
+    queue['batches'] = [[_message(1, template='welcome'), _message(2, template='other')]]
+
+    def send(template, group):
+        if template == 'other':
+            raise outbox.EmailSendError('Unknown template other')
+        return {}
+
+    outbox.drain_outbox(object(), send)
+
+    sent, failures = queue['recorded'][0]
+    assert sent == [1]
+    assert [(failure['id'], failure['status']) for failure in failures] == [(2, 'retry')]
+
+
+def test_draining_stops_after_a_short_batch(queue, monkeypatch):
+    monkeypatch.setattr(outbox, 'BATCH_SIZE', 2)
+    queue['batches'] = [[_message(1), _message(2)], [_message(3)], [_message(4)]]
+
+    result = outbox.drain_outbox(object(), lambda template, group: {})
+
+    assert (result['batches'], result['sent']) == (2, 3)
+    assert queue['batches'] == [[_message(4)]]
@@ -0,0 +1,101 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'payment'))
+
+import promo  # noqa: E402
+
+
+class PoolCursor:
+    def __init__(self, free_codes=(), available=0):
+        self.free_codes = list(free_codes)
+        self.available = available
+        self.queries = []
+
+    def execute(self, query, vars=None):
+        self.queries.append(query)
+        self.limit = vars[0] if vars else None
+
+    def fetchall(self):
+        codes, self.free_codes = self.free_codes[:self.limit], self.free_codes[self.limit:]
+        return [(code,) for code in codes]
+
+    def fetchone(self):
+        return (self.available,)
+
+    def close(self):
+        pass
+
+
+class PoolConnection:
+    def __init__(self, cursor):
+        self.cur = cursor
+        self.commits = 0
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    state = {'updates': [], 'refills': []}
+    monkeypatch.setattr(promo, 'PROMO_CODE_MODE', 'pool')
+    monkeypatch.setattr(promo, '_stats', {key: 0 for key in promo._stats})
+    monkeypatch.setattr(promo, 'execute_values', lambda cur, sql, rows, **kwargs: state['updates'].append(rows) or [
+        row for row in rows
+    ])
+    monkeypatch.setattr(promo, 'refill_in_background', lambda force=False: state['refills'].append(force))
+    return state
+
+
+def test_deterministic_codes_are_unique_and_stable():
+    codes = [promo.deterministic_code(subscriber_id) for subscriber_id in range(1, 100001)]
+
+    assert len(set(codes)) == len(codes)
+    assert codes[41] == promo.deterministic_code(42)
+    assert all(len(code) == len(promo.PREFIX) + promo.DETERMINISTIC_CODE_LENGTH for code in codes)
+    assert all(set(code[len(promo.PREFIX):]) <= set(promo.ALPHABET) for code in codes)
+
+
+def test_deterministic_and_pool_codes_never_collide():
+    pool_code = promo._random_code()
+
+    assert len(pool_code) == len(promo.PREFIX) + promo.POOL_CODE_LENGTH
+    assert len(pool_code) != len(promo.deterministic_code(1))
+
+
+def test_empty_pool_falls_back_to_deterministic_codes(pool):
+    cur = PoolCursor(free_codes=['NOMADPOOL0001'])
+
+    assigned = promo.assign_codes(cur, [1, 2, 3])
+
+    assert sorted(assigned.values()) == sorted(['NOMADPOOL0001', promo.deterministic_code(2), promo.deterministic_code(3)])
+    assert pool['updates'] == [list(assigned.items())]
+    assert promo.promo_stats()['deterministic'] == 2
+    assert pool['refills'] == [True]
+
+
+def test_deterministic_mode_skips_the_pool(pool, monkeypatch):
+    monkeypatch.setattr(promo, 'PROMO_CODE_MODE', 'deterministic')
+    cur = PoolCursor(free_codes=['NOMADPOOL0001'])
+
+    assigned = promo.assign_codes(cur, [5])
+
+    assert assigned == {5: promo.deterministic_code(5)}
+    assert cur.queries == [] and pool['refills'] == []
+
+
+@pytest.mark.parametrize('available, generated', [(0, 3), (promo.POOL_LOW_WATER, 0)])
+def test_refill_only_below_low_water(pool, monkeypatch, available, generated):
+    monkeypatch.setattr(promo, 'POOL_REFILL_BATCH', 3)
+    conn = PoolConnection(PoolCursor(available=available))
+
+    result = promo.refill_pool(conn)
+
+    assert result == {'available': available + generated, 'generated': generated}
+    assert conn.commits == 1
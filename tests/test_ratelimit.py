@@ -0,0 +1,79 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'payment'))
+
+import ratelimit  # noqa: E402
+
+
+def _event(ip='203.0.113.7'):
+    return {'requestContext': {'identity': {'sourceIp': ip}}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(ratelimit, '_buckets', ratelimit.OrderedDict())
+    monkeypatch.setattr(ratelimit, '_stats', {key: 0 for key in ratelimit._stats})
+    monkeypatch.setattr(ratelimit, 'SHARED', False)
+    monkeypatch.setattr(ratelimit, 'LIMITS', {'ip': (3.0, 3.0 / 60), 'email': (2.0, 2.0 / 60)})
+    monkeypatch.delitem(sys.modules, 'db', raising=False)
+    return now
+
+
+def test_bucket_allows_capacity_then_limits(clock):
+    assert [ratelimit.check(_event(), 'access') for _ in range(3)] == [0, 0, 0]
+
+    assert ratelimit.check(_event(), 'access') == 20
+    assert ratelimit.check(_event('203.0.113.8'), 'access') == 0
+
+
+def test_bucket_refills_over_time(clock):
+    for _ in range(3):
+        ratelimit.check(_event(), 'access')
+
+    clock[0] += 20
+
+    assert ratelimit.check(_event(), 'access') == 0
+    assert ratelimit.check(_event(), 'access') == 20
+
+
+def test_email_is_limited_across_addresses(clock):
+    results = [ratelimit.check(_event(f'203.0.113.{n}'), 'payment', ' Member@Example.com ') for n in range(3)]
+
+    assert results == [0, 0, 30]
+    assert ratelimit.ratelimit_stats()['limited_local'] == 1
+
+
+def test_buckets_are_bounded(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, 'MAX_BUCKETS', 2)
+
+    for n in range(5):
+        ratelimit.check(_event(f'203.0.113.{n}'), 'access')
+
+    assert list(ratelimit._buckets) == ['access:ip:203.0.113.3', 'access:ip:203.0.113.4']
+
+
+def test_shed_when_pool_is_saturated(clock, monkeypatch):
+    assert not ratelimit.shed()
+
+    monkeypatch.setitem(sys.modules, 'db', types.SimpleNamespace(saturated=lambda: True))
+    response = ratelimit.throttle(_event(), 'access')
+
+    assert response['statusCode'] == 503
+    assert response['headers']['Retry-After'] == str(ratelimit.SHED_RETRY_AFTER)
+    assert ratelimit.ratelimit_stats()['shed'] == 1
+
+
+def test_throttle_answers_429_with_retry_after(clock):
+    for _ in range(3):
+        assert ratelimit.throttle(_event(), 'access') is None
+
+    response = ratelimit.throttle(_event(), 'access')
+
+    assert response['statusCode'] == 429
+    assert response['headers']['Retry-After'] == '20'
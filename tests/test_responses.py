@@ -0,0 +1,22 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'payment'))
+
+import responses  # noqa: E402
+
+
+def test_admin_password_matches(monkeypatch):
+    monkeypatch.setenv('ADMIN_PASSWORD', 'secret')
+
+    assert responses.admin_password_matches('secret')
+    assert not responses.admin_password_matches('secreT')
+    assert not responses.admin_password_matches('')
+    assert not responses.admin_password_matches(None)
+
+
+def test_admin_password_unset_denies_everyone(monkeypatch):
+    monkeypatch.delenv('ADMIN_PASSWORD', raising=False)
+
+    assert not responses.admin_password_matches('')
+    assert not responses.admin_password_matches('anything')
@@ -0,0 +1,116 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'admin'))
+
+import revenue  # noqa: E402
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 10, 17, 15, 30)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakeCursor:
+    """Считает бакеты REVENUE_QUERY и хранит revenue_rollups в памяти"""
+
+    def __init__(self, rollups=None):
+        self.connection = FakeConnection()
+        self.rollups = dict(rollups or {})
+        self.computed = []
+        self.inserted = []
+        self._rows = []
+
+    def execute(self, query, vars=None):
+        if query is revenue.REVENUE_QUERY:
+            self.computed.append((vars['start'], vars['last']))
+            self._rows = [
+                (start, 1000, 1, 990, 1, 0)
+                for start in _range(vars['step'], vars['start'], vars['last'])
+            ]
+        else:
+            period, since, until = vars
+            self._rows = [row for (p, start), row in self.rollups.items() if p == period and since <= start < until]
+
+    def executemany(self, query, vars_list):
+        self.inserted.extend(vars_list)
+
+    def fetchall(self):
+        return self._rows
+
+
+def _range(step, start, last):
+    period = {'1 day': 'day', '1 week': 'week', '1 month': 'month'}[step]
+    while start <= last:
+        yield start
+        start = revenue._shift(period, start, 1)
+
+
+@pytest.fixture(autouse=True)
+def frozen(monkeypatch):
+    monkeypatch.setattr(revenue, 'datetime', FrozenDatetime)
+    monkeypatch.setattr(revenue, '_closed_buckets', {})
+
+
+def test_bucket_start():
+    moment = datetime(2026, 10, 17, 15, 30)
+
+    assert revenue._bucket_start('day', moment) == datetime(2026, 10, 17)
+    assert revenue._bucket_start('week', moment) == datetime(2026, 10, 12)
+    assert revenue._bucket_start('month', moment) == datetime(2026, 10, 1)
+
+
+def test_shift_months_across_years():
+    assert revenue._shift('month', datetime(2026, 1, 1), -1) == datetime(2025, 12, 1)
+    assert revenue._shift('month', datetime(2026, 11, 1), 2) == datetime(2027, 1, 1)
+    assert revenue._shift('week', datetime(2026, 10, 12), -1) == datetime(2026, 10, 5)
+
+
+def test_closed_buckets_are_computed_once_and_stored():
+    cur = FakeCursor()
+
+    series = revenue.revenue_series(cur, 'month', 3)
+
+    assert [item['date'] for item in series] == [
+        '2026-08-01T00:00:00', '2026-09-01T00:00:00', '2026-10-01T00:00:00',
+    ]
+    assert series[0]['arpu'] == 990
+    assert cur.computed == [
+        (datetime(2026, 8, 1), datetime(2026, 9, 1)),
+        (datetime(2026, 10, 1), datetime(2026, 10, 1)),
+    ]
+    assert [row[1] for row in cur.inserted] == [datetime(2026, 8, 1), datetime(2026, 9, 1)]
+    assert cur.connection.commits == 1
+
+
+def test_closed_buckets_come_from_memory_then_rollups():
+    revenue.revenue_series(FakeCursor(), 'month', 3)
+    cur = FakeCursor()
+
+    revenue.revenue_series(cur, 'month', 3)
+
+    assert cur.computed == [(datetime(2026, 10, 1), datetime(2026, 10, 1))]
+    assert cur.inserted == []
+
+    revenue._closed_buckets.clear()
+    cur = FakeCursor({
+        ('day', datetime(2026, 10, 16)): (datetime(2026, 10, 16), 500, 1, 990, 2, 0),
+    })
+
+    series = revenue.revenue_series(cur, 'day', 2)
+
+    assert series[0]['net_revenue'] == 500
+    assert series[0]['arpu'] == 495
+    assert cur.computed == [(datetime(2026, 10, 17), datetime(2026, 10, 17))]
@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'partners'))
+
+import tokens  # noqa: E402
+
+
+def _issue(monkeypatch):
+    monkeypatch.setenv('ACCESS_TOKEN_SECRET', 'test-secret')
+    return tokens.issue_token(42, 'member@example.com')
+
+
+def test_valid_token_round_trips(monkeypatch):
+    claims = tokens.verify_token(_issue(monkeypatch))
+
+    assert claims['sid'] == 42
+    assert claims['em'] == 'member@example.com'
+
+
+def test_tampered_token_is_rejected(monkeypatch):
+    payload, signature = _issue(monkeypatch).split('.')
+    forged = tokens._b64encode(b'{"sid":1,"em":"x@example.com","st":"active","iat":0,"exp":9999999999}')
+    flipped = ('B' if signature.startswith('A') else 'A') + signature[1:]
+
+    assert tokens.verify_token(f'{forged}.{signature}') is None
+    assert tokens.verify_token(f'{payload}.{flipped}') is None
+    assert tokens.verify_token(f'{payload}.{signature}.extra') is None
+
+
+def test_non_ascii_token_is_rejected(monkeypatch):
+    _issue(monkeypatch)
+
+    assert tokens.verify_token('é.abc') is None
+    assert tokens.verify_token('abc.é') is None
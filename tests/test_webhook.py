@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'payment'))
+
+import index  # noqa: E402
+
+YOOKASSA_SOURCE = {'requestContext': {'identity': {'sourceIp': '185.71.76.1'}}}
+PAYMENT = {
+    'event': 'payment.succeeded',
+    'object': {'id': 'pay-1', 'status': 'succeeded', 'metadata': {'email': 'member@example.com'}},
+}
+
+
+def test_failed_activation_is_retried_by_yookassa(monkeypatch):
+    def fail(*args):
+        raise RuntimeError('connection reset')
+
+    monkeypatch.setattr(index, 'process_succeeded_payment', fail)
+
+    response = index.handle_webhook(YOOKASSA_SOURCE, PAYMENT)
+
+    assert response['statusCode'] == 500
+
+
+def test_batch_with_failed_items_is_not_acknowledged(monkeypatch):
+    monkeypatch.setattr(index, 'is_admin', lambda event: True)
+    monkeypatch.setattr(index, 'process_webhook_batch', lambda notifications, offset: [
+        {'index': offset, 'payment_id': 'pay-1', 'result': 'error'},
+    ])
+
+    response = index.handle_webhook_batch({}, {'notifications': [PAYMENT]})
+
+    assert response['statusCode'] == 500
+    assert json.loads(response['body'])['summary'] == {'error': 1}
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, query, vars=None):
+        self.executed.append((query, vars))
+
+    def fetchone(self):
+        return 7, 'NOMAD-CODE'
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.cur = RecordingCursor()
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_webhook_renewal_extends_from_current_billing_date(monkeypatch):
+    from contextlib import contextmanager
+
+    import db
+    import events
+    import ledger
+    import outbox
+
+    conn = RecordingConnection()
+    monkeypatch.setattr(db, 'get_connection', contextmanager(lambda: (yield conn)))
+    monkeypatch.setattr(ledger, 'claim_event', lambda cur, key, payment_id, event: True)
+    monkeypatch.setattr(events, 'record_events', lambda cur, rows: None)
+    monkeypatch.setattr(outbox, 'enqueue_email', lambda *args: pytest.fail('renewal queued a welcome email'))
+
+    deduplicated = index.process_succeeded_payment(
+        'payment.succeeded:pay-1', 'payment.succeeded', 'pay-1', 'member@example.com', 'Member', renewal=True
+    )
+
+    assert deduplicated is False
+    query, params = conn.cur.executed[0]
+    assert 'SELECT next_billing_date FROM subscribers WHERE email = %s' in query
+    assert params[3:5] == (True, 'member@example.com')
@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'payment'))
+
+import index  # noqa: E402
+import webhook_auth  # noqa: E402
+
+
+def test_unknown_event_is_acknowledged():
+    response = index.handle_webhook({}, {'event': 'payout.succeeded', 'object': {'id': 'po-1'}})
+
+    assert response['statusCode'] == 200
+    assert '"ignored"' in response['body']
+
+
+@pytest.mark.parametrize('data', [
+    {'event': 'payment.succeeded', 'object': 'not-an-object'},
+    {'event': ['payment.succeeded'], 'object': {'id': 'pay-1'}},
+    {'event': 'payment.succeeded', 'object': {'id': 'pay 1'}},
+    {'event': 'payment.succeeded', 'object': {'id': 'pay-1', 'status': 'succeeded', 'metadata': []}},
+])
+def test_malformed_notification_is_rejected(data):
+    with pytest.raises(webhook_auth.WebhookRejected) as rejected:
+        webhook_auth.check_shape(data)
+
+    assert rejected.value.status == 400
+
+
+def test_batch_marks_bad_entries_invalid():
+    results = index.process_webhook_batch([
+        None,
+        {'object': 'not-an-object'},
+        {'object': {'id': 'pay-1', 'status': 'succeeded', 'metadata': 'member@example.com'}},
+        {'event': 'payout.succeeded', 'object': {'id': 'po-1'}},
+        {'object': {'id': 'pay-2', 'status': 'pending'}},
+    ], 10)
+
+    assert [(item['index'], item['result']) for item in results] == [
+        (10, 'invalid'), (11, 'invalid'), (12, 'invalid'), (13, 'ignored'), (14, 'ignored'),
+    ]
+    assert results[4]['payment_id'] == 'pay-2'
+
+
+REFUND = {
+    'event': 'refund.succeeded',
+    'object': {
+        'id': '216749f7-0016-50be-b000-078d43a63ae4',
+        'payment_id': '216749da-000f-50be-b000-096747fad91e',
+        'status': 'succeeded',
+        'amount': {'value': '990.00', 'currency': 'RUB'},
+    },
+}
+YOOKASSA_SOURCE = {'requestContext': {'identity': {'sourceIp': '185.71.76.1'}}}
+
+
+def test_refund_is_acknowledged_without_activation(monkeypatch):
+    monkeypatch.setattr(index, 'process_succeeded_payment', lambda *args: pytest.fail('refund activated a member'))
+    refund = {**REFUND, 'object': {**REFUND['object'], 'metadata': {'email': 'member@example.com'}}}
+
+    for data in (REFUND, refund):
+        response = index.handle_webhook(YOOKASSA_SOURCE, data)
+
+        assert response['statusCode'] == 200
+
+
+def test_batch_skips_refunds():
+    results = index.process_webhook_batch([REFUND], 0)
+
+    assert results == [{'index': 0, 'payment_id': REFUND['object']['id'], 'result': 'ignored'}]